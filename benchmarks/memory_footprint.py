@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Measures the memory held by a parsed SSH config using tracemalloc.
+
+Usage: python benchmarks/memory_footprint.py [--hosts 50000]
+"""
+
+import argparse
+import gc
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from ssh_config_parser import SSHConfigParser  # noqa: E402
+
+
+def write_config(path: Path, host_count: int) -> None:
+    with path.open("w", encoding="utf-8") as f:
+        f.write("# Generated for memory measurements\n")
+        f.write("ServerAliveInterval 30\n\n")
+        for i in range(host_count):
+            f.write(f"Host node-{i} node-{i}.example.internal\n")
+            f.write(f"    HostName 10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}\n")
+            f.write(f"    User deploy{i % 7}\n")
+            f.write(f"    Port {2200 + i % 50}\n")
+            f.write("    IdentityFile ~/.ssh/id_ed25519\n")
+            if i % 5 == 0:
+                f.write("    # managed by inventory generator\n")
+                f.write("    ForwardAgent yes\n")
+            f.write("\n")
+
+
+def measure(host_count: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "config"
+        write_config(path, host_count)
+        file_size = path.stat().st_size
+
+        gc.collect()
+        tracemalloc.start()
+        parser = SSHConfigParser(path)
+        # Keep the user's parse cache and backups out of the measurement.
+        parser.parse_cache = None
+        parser.auto_backup_enabled = False
+        parser.parse()
+        gc.collect()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        hosts = len(parser.config.hosts)
+        return {
+            "hosts": hosts,
+            "file_bytes": file_size,
+            "resident_bytes": current,
+            "peak_bytes": peak,
+            "bytes_per_host": current // max(hosts, 1),
+        }
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--hosts", type=int, default=50000)
+    args = ap.parse_args()
+
+    result = measure(args.hosts)
+    mib = 1024 * 1024
+    print(f"hosts:           {result['hosts']}")
+    print(f"file size:       {result['file_bytes'] / mib:.1f} MiB")
+    print(f"resident (traced): {result['resident_bytes'] / mib:.1f} MiB")
+    print(f"peak (traced):   {result['peak_bytes'] / mib:.1f} MiB")
+    print(f"per host:        {result['bytes_per_host']} B")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""Times the parser and model on synthetic configs and records the results.
+
+Each operation is timed ``--repeat`` times per config size (fresh setup
+before every run; minimum and median are kept) and then run once more under
+tracemalloc for its peak allocation. Results are written as JSON, by default
+to benchmarks/results/<commit>.json; ``--compare`` prints the ratio against
+an earlier result file. No display is needed.
+
+Usage: python benchmarks/run_benchmarks.py [--sizes 1000,10000,100000]
+       [--repeat 5] [--only parse,write] [--output FILE] [--compare BASELINE]
+       [--max-regression 1.25]
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(_ROOT / "src"))
+
+import host_search  # noqa: E402
+import ssh_config_tokenizer  # noqa: E402
+from ssh_config_parser import BatchEdit, SSHConfigParser  # noqa: E402
+from ssh_config_validator import IdentityFileCache  # noqa: E402
+from synthetic_config import write_config  # noqa: E402
+
+# A benchmark returns the operation to time, after doing its per-run setup,
+# and how many calls of interest that operation makes.
+Benchmark = Callable[["Workload"], Tuple[Callable[[], object], int]]
+
+_QUERIES = ["node-1234", "deploy", "fra1", "id_rsa", "no-such-host"]
+# Typed into the search index along with _QUERIES.
+_FIELD_QUERIES = ["nd1234", "user:deploy port:2222", "key:id_ed -tag:old"]
+
+
+class Workload:
+    """A generated config plus a parsed model shared by the benchmarks that
+    only read or lightly edit it."""
+
+    def __init__(self, directory: Path, hosts: int, fanout: int) -> None:
+        self.path = write_config(directory, hosts, fanout)
+        self.rng = random.Random(hosts)
+        self.parser = self.fresh_parser()
+        self.parser.parse()
+        self.aliases = [
+            p for h in self.parser.config.hosts for p in h.patterns if "*" not in p
+        ]
+        self._toggle = 0
+
+    def fresh_parser(self) -> SSHConfigParser:
+        parser = SSHConfigParser(self.path)
+        parser.parse_cache = None
+        parser.auto_backup_enabled = False
+        return parser
+
+    def edit_one_host(self) -> None:
+        """Changes one option of a random host so the model is dirty."""
+        hosts = self.parser.config.hosts
+        host = hosts[self.rng.randrange(len(hosts))]
+        self._toggle += 1
+        host.set_option("Port", str(40000 + self._toggle))
+
+
+def bench_parse(w: Workload):
+    parser = w.fresh_parser()
+    return parser.parse, 1
+
+
+def bench_tokenize(w: Workload):
+    lines = w.path.read_text(encoding="utf-8").split("\n")
+    ssh_config_tokenizer._cache.clear()
+
+    def run():
+        tokenize = ssh_config_tokenizer.tokenize
+        for line in lines:
+            tokenize(line)
+
+    return run, len(lines)
+
+
+def bench_parse_cached(w: Workload):
+    parser = SSHConfigParser(w.path)
+    return parser.load_cached, 1
+
+
+def bench_parse_incremental(w: Workload):
+    parser = w.parser
+    lines = w.path.read_text(encoding="utf-8").split("\n")
+    index = len(lines) // 2
+    lines[index] = f"# touched {time.perf_counter_ns()}"
+    w.path.write_text("\n".join(lines), encoding="utf-8")
+    return lambda: parser.parse(incremental=True), 1
+
+
+def bench_generate_content(w: Workload):
+    w.edit_one_host()
+    return w.parser._generate_content, 1
+
+
+def bench_write(w: Workload):
+    w.edit_one_host()
+    return lambda: w.parser.write(backup=False), 1
+
+
+def bench_apply_batch(w: Workload):
+    # Batches refuse unsaved changes, such as the edits made by other
+    # benchmarks on the shared model.
+    w.parser.parse(incremental=True)
+    w._toggle += 1
+    edit = BatchEdit("set", "ServerAliveInterval", str(w._toggle))
+    return lambda: w.parser.apply_batch("node-*", [edit], backup=False), 1
+
+
+def bench_validate(w: Workload):
+    w.parser._validator = None
+    w.parser.identity_cache = IdentityFileCache()
+    return w.parser.validate, 1
+
+
+def bench_validate_incremental(w: Workload):
+    w.parser.validate()
+    w.edit_one_host()
+    return w.parser.validate, 1
+
+
+def bench_is_dirty(w: Workload):
+    w.edit_one_host()
+    config = w.parser.config
+    calls = 1000
+
+    def run():
+        for _ in range(calls):
+            config.is_dirty()
+
+    return run, calls
+
+
+def bench_get_host(w: Workload):
+    config = w.parser.config
+    aliases = [w.rng.choice(w.aliases) for _ in range(1000)] + ["missing-host"]
+
+    def run():
+        for alias in aliases:
+            config.get_host(alias)
+
+    return run, len(aliases)
+
+
+def bench_effective_options(w: Workload):
+    """Resolves the options of random aliases and one unknown name, which
+    go through the config's wildcard blocks; the matcher is built, and the
+    Match exec result cached, by a first lookup outside the timing."""
+    config = w.parser.config
+    aliases = [w.rng.choice(w.aliases) for _ in range(200)] + ["missing-host"]
+    config.effective_options(aliases[0])
+
+    def run():
+        for alias in aliases:
+            config.effective_options(alias)
+
+    return run, len(aliases)
+
+
+def bench_filter_hosts(w: Workload):
+    hosts = list(w.parser.config.hosts)
+
+    def run():
+        for query in _QUERIES:
+            host_search.filter_hosts(hosts, query)
+
+    return run, len(_QUERIES)
+
+
+def bench_search_typing(w: Workload):
+    """Types each query one character at a time into an indexed search, as
+    the host list does; the index is warm, as it is after the first key."""
+    index = host_search.SearchIndex()
+    index.set_hosts(w.parser.config.hosts)
+    index.filter("x")
+    keystrokes = [
+        query[:n]
+        for query in _QUERIES + _FIELD_QUERIES
+        for n in range(1, len(query) + 1)
+    ]
+
+    def run():
+        for query in keystrokes:
+            index.filter(query)
+
+    return run, len(keystrokes)
+
+
+def bench_search_first_chunk(w: Workload):
+    """Time until a background search has its first chunk of results for
+    each query, typed from scratch (nothing to narrow)."""
+    index = host_search.SearchIndex()
+    index.set_hosts(w.parser.config.hosts)
+    index.filter("x")
+    queries = _QUERIES + _FIELD_QUERIES
+
+    def run():
+        for query in queries:
+            next(index.prepare(query).run(), None)
+
+    return run, len(queries)
+
+
+BENCHMARKS: Dict[str, Benchmark] = {
+    "parse": bench_parse,
+    "tokenize": bench_tokenize,
+    "parse_cached": bench_parse_cached,
+    "parse_incremental": bench_parse_incremental,
+    "generate_content": bench_generate_content,
+    "write": bench_write,
+    "apply_batch": bench_apply_batch,
+    "validate": bench_validate,
+    "validate_incremental": bench_validate_incremental,
+    "is_dirty": bench_is_dirty,
+    "get_host": bench_get_host,
+    "effective_options": bench_effective_options,
+    "filter_hosts": bench_filter_hosts,
+    "search_typing": bench_search_typing,
+    "search_first_chunk": bench_search_first_chunk,
+}
+
+
+def run_benchmark(name: str, w: Workload, repeat: int) -> dict:
+    times: List[float] = []
+    calls = 1
+    for _ in range(repeat):
+        op, calls = BENCHMARKS[name](w)
+        gc.collect()
+        start = time.perf_counter()
+        op()
+        times.append(time.perf_counter() - start)
+
+    op, calls = BENCHMARKS[name](w)
+    gc.collect()
+    tracemalloc.start()
+    op()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "op": name,
+        "calls": calls,
+        "repeat": repeat,
+        "min_s": min(times),
+        "median_s": statistics.median(times),
+        "per_call_s": statistics.median(times) / calls,
+        "peak_bytes": peak,
+    }
+
+
+def _git_commit() -> str:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=_ROOT,
+            capture_output=True,
+            text=True,
+            timeout=10,
+        )
+        return out.stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+
+def compare(current: dict, baseline: dict) -> float:
+    """Prints median ratios current/baseline; returns the largest one."""
+    before = {(r["hosts"], r["op"]): r for r in baseline["results"]}
+    worst = 0.0
+    print(f"\ncompared with {baseline['meta'].get('commit', '?')}:")
+    for r in current["results"]:
+        old = before.get((r["hosts"], r["op"]))
+        if old is None or not old["median_s"]:
+            continue
+        ratio = r["median_s"] / old["median_s"]
+        worst = max(worst, ratio)
+        print(f"  {r['hosts']:>7} {r['op']:<22} {ratio:6.2f}x")
+    return worst
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", default="1000,10000,100000")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--fanout", type=int, default=20)
+    ap.add_argument("--only", default="", help="comma-separated benchmark names")
+    ap.add_argument("--output", type=Path)
+    ap.add_argument("--compare", type=Path, help="earlier result file")
+    ap.add_argument(
+        "--max-regression",
+        type=float,
+        help="exit with status 1 when a median exceeds the baseline by this ratio",
+    )
+    args = ap.parse_args()
+
+    names = [n for n in args.only.split(",") if n] or list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        ap.error(f"unknown benchmarks: {', '.join(unknown)}")
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+
+    commit = _git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "repeat": args.repeat,
+            "fanout": args.fanout,
+        },
+        "results": [],
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Keep the parse cache away from the user's real cache directory.
+        os.environ["XDG_CACHE_HOME"] = str(Path(tmp) / "cache")
+        for hosts in sizes:
+            w = Workload(Path(tmp) / f"hosts-{hosts}", hosts, args.fanout)
+            if "parse_cached" in names:
+                SSHConfigParser(w.path).parse()
+            for name in names:
+                result = run_benchmark(name, w, args.repeat)
+                result["hosts"] = hosts
+                report["results"].append(result)
+                print(
+                    f"{hosts:>7} {name:<22} median {result['median_s'] * 1e3:10.2f} ms"
+                    f"  per call {result['per_call_s'] * 1e6:10.1f} us"
+                    f"  peak {result['peak_bytes'] / 1048576:8.1f} MiB",
+                    flush=True,
+                )
+
+    output = args.output or _ROOT / "benchmarks" / "results" / f"{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    print(f"\nwrote {output}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        worst = compare(report, baseline)
+        if args.max_regression and worst > args.max_regression:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
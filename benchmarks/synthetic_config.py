@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Generates realistic synthetic SSH configs for benchmarks.
+
+Usage: python benchmarks/synthetic_config.py DIR [--hosts 10000] [--fanout 20]
+"""
+
+import argparse
+import random
+import sys
+from pathlib import Path
+
+_USERS = ["deploy", "admin", "ubuntu", "ec2-user", "git", "root", "ops"]
+_KEYS = ["id_ed25519", "id_rsa", "deploy_ed25519", "ci_key", "legacy_rsa"]
+_SITES = ["fra1", "ams3", "nyc2", "sfo1", "sgp1", "lon1"]
+
+
+def _host_block(rng: random.Random, i: int) -> list:
+    site = _SITES[i % len(_SITES)]
+    lines = []
+    if i % 4 == 0:
+        lines.append(f"# {site} node {i}, owner team-{i % 13}")
+    lines.append(f"Host node-{i} node-{i}.{site}.example.internal")
+    lines.append(f"    HostName 10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}")
+    lines.append(f"    User {_USERS[i % len(_USERS)]}")
+    if i % 3:
+        lines.append(f"    Port {2200 + rng.randrange(60)}")
+    lines.append(f"    IdentityFile ~/.ssh/{_KEYS[i % len(_KEYS)]}")
+    if i % 7 == 0:
+        lines.append("    # bastion required")
+        lines.append(f"    ProxyJump bastion.{site}.example.internal")
+    if i % 11 == 0:
+        lines.append(f"    LocalForward {8000 + i % 1000} localhost:80")
+    if i % 17 == 0:
+        lines.append("    ForwardAgent yes")
+    lines.append("")
+    return lines
+
+
+def _wildcard_block(i: int) -> list:
+    site = _SITES[i % len(_SITES)]
+    return [
+        f"# defaults for {site}",
+        f"Host *.{site}.example.internal {site}-*",
+        "    ServerAliveInterval 30",
+        "    ControlMaster auto",
+        "    ControlPath ~/.ssh/cm-%r@%h:%p",
+        "",
+    ]
+
+
+def write_config(directory: Path, host_count: int, fanout: int = 20, seed: int = 1):
+    """Writes ``config`` into ``directory`` and returns its path.
+
+    About a fifth of the hosts go to ``fanout`` fragments under ``conf.d``
+    pulled in by one wildcard Include. The main config has global options,
+    comment lines, a wildcard block every 250 hosts, one Match block and a
+    trailing ``Host *``.
+    """
+    rng = random.Random(seed)
+    directory.mkdir(parents=True, exist_ok=True)
+    fragment_dir = directory / "conf.d"
+    fragment_dir.mkdir(exist_ok=True)
+
+    included = host_count // 5 if fanout else 0
+    main_count = host_count - included
+    lines = [
+        "# Generated by benchmarks/synthetic_config.py",
+        "ServerAliveCountMax 3",
+        "AddKeysToAgent yes",
+        "",
+    ]
+    if fanout:
+        lines += ["Include conf.d/*.conf", ""]
+    for i in range(main_count):
+        if i % 250 == 0:
+            lines += _wildcard_block(i // 250)
+        lines += _host_block(rng, i)
+    lines += [
+        "Match host *.internal exec \"test -n $SSH_AUTH_SOCK\"",
+        "    ForwardAgent no",
+        "",
+        "Host *",
+        "    IdentitiesOnly yes",
+        "    HashKnownHosts yes",
+    ]
+    path = directory / "config"
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    for f in range(fanout):
+        chunk = range(main_count + f, host_count, fanout)
+        body = [f"# fragment {f:03d}"]
+        for i in chunk:
+            body += _host_block(rng, i)
+        (fragment_dir / f"{f:03d}.conf").write_text(
+            "\n".join(body) + "\n", encoding="utf-8"
+        )
+    return path
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("directory", type=Path)
+    ap.add_argument("--hosts", type=int, default=10000)
+    ap.add_argument("--fanout", type=int, default=20)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    print(write_config(args.directory, args.hosts, args.fanout, args.seed))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
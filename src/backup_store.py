@@ -0,0 +1,207 @@
+"""Content-addressed, compressed store of SSH config backups."""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+_INDEX_VERSION = 2
+
+
+def default_backup_dir() -> Path:
+    base = os.environ.get("XDG_CONFIG_HOME") or os.path.join(
+        os.path.expanduser("~"), ".config"
+    )
+    return Path(base) / "ssh-studio" / "backups"
+
+
+@dataclass(slots=True)
+class Snapshot:
+    """One backup of a file: when it was taken and the digest of its content."""
+
+    source: str
+    digest: str
+    timestamp: float
+    size: int
+
+    @property
+    def created(self) -> datetime:
+        return datetime.fromtimestamp(self.timestamp)
+
+
+class BackupStore:
+    """Keeps snapshots of config files under ``directory``.
+
+    Each source file has a directory of its own, named after the digest of
+    its path, holding ``index.json`` with the file's snapshots and their
+    timestamps, and the content of each snapshot stored once per SHA-256
+    digest, gzip-compressed, in ``objects/``. Taking a snapshot therefore
+    only reads and writes the history of that one file. Taking a snapshot
+    of content identical to the latest snapshot of the same file records
+    nothing. On each snapshot the retention policy is applied to the file:
+    at most ``max_count`` snapshots are kept and those older than
+    ``max_age_days`` are dropped, the newest one always being kept. Objects
+    no snapshot refers to any more are deleted.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[Path] = None,
+        max_count: Optional[int] = 50,
+        max_age_days: Optional[float] = None,
+    ) -> None:
+        self.directory = Path(directory) if directory else default_backup_dir()
+        self.max_count = max_count
+        self.max_age_days = max_age_days
+        # Snapshots of each source loaded so far, oldest first.
+        self._indexes: Dict[str, List[Snapshot]] = {}
+
+    def _source_dir(self, source: str) -> Path:
+        key = hashlib.sha256(source.encode("utf-8")).hexdigest()[:32]
+        return self.directory / key
+
+    def _index_path(self, source: str) -> Path:
+        return self._source_dir(source) / "index.json"
+
+    def _object_path(self, source: str, digest: str) -> Path:
+        return self._source_dir(source) / "objects" / digest[:2] / f"{digest[2:]}.gz"
+
+    def _load_index(self, source: str) -> List[Snapshot]:
+        entries = self._indexes.get(source)
+        if entries is None:
+            entries = self._read_index(self._index_path(source))
+            entries.sort(key=lambda s: s.timestamp)
+            self._indexes[source] = entries
+        return entries
+
+    def _read_index(self, path: Path) -> List[Snapshot]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return [Snapshot(**entry) for entry in data["snapshots"]]
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning("Ignoring unreadable backup index %s: %s", path, e)
+            return []
+
+    def _save_index(self, source: str) -> None:
+        data = {
+            "version": _INDEX_VERSION,
+            "source": source,
+            "snapshots": [asdict(s) for s in self._load_index(source)],
+        }
+        self._write_atomic(
+            self._index_path(source), json.dumps(data, indent=1).encode("utf-8")
+        )
+
+    def _sources(self) -> List[str]:
+        """Every source with snapshots on disk or loaded in this session."""
+        sources = dict.fromkeys(self._indexes)
+        for path in self.directory.glob("*/index.json"):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    sources[json.load(f)["source"]] = None
+            except (OSError, ValueError, KeyError, TypeError):
+                continue
+        return list(sources)
+
+    def _write_atomic(self, path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def snapshots(self, source: Optional[Union[Path, str]] = None) -> List[Snapshot]:
+        """Returns the snapshots, of ``source`` only when given, newest first."""
+        if source is not None:
+            return self._load_index(str(source))[::-1]
+        entries = [s for src in self._sources() for s in self._load_index(src)]
+        return sorted(entries, key=lambda s: s.timestamp, reverse=True)
+
+    def add(
+        self, source: Union[Path, str], content: Optional[bytes] = None
+    ) -> Snapshot:
+        """Snapshots ``source``, reading it unless ``content`` is given."""
+        source = str(source)
+        if content is None:
+            with open(source, "rb") as f:
+                content = f.read()
+        digest = hashlib.sha256(content).hexdigest()
+        entries = self._load_index(source)
+        if entries and entries[-1].digest == digest:
+            return entries[-1]
+
+        obj = self._object_path(source, digest)
+        if not obj.exists():
+            self._write_atomic(obj, gzip.compress(content, mtime=0))
+        snapshot = Snapshot(source, digest, time.time(), len(content))
+        entries.append(snapshot)
+        self._apply_retention(source)
+        self._save_index(source)
+        return snapshot
+
+    def read(self, snapshot: Snapshot) -> bytes:
+        with open(self._object_path(snapshot.source, snapshot.digest), "rb") as f:
+            content = gzip.decompress(f.read())
+        if hashlib.sha256(content).hexdigest() != snapshot.digest:
+            raise ValueError(f"Backup object {snapshot.digest} is corrupted")
+        return content
+
+    def prune(self) -> List[Snapshot]:
+        """Applies the retention policy to every file and returns the
+        dropped snapshots."""
+        dropped: List[Snapshot] = []
+        for source in self._sources():
+            removed = self._apply_retention(source)
+            if removed:
+                self._save_index(source)
+                dropped.extend(removed)
+        return dropped
+
+    def _apply_retention(self, source: str) -> List[Snapshot]:
+        cutoff = (
+            time.time() - self.max_age_days * 86400
+            if self.max_age_days is not None
+            else None
+        )
+        entries = self._load_index(source)
+        dropped: List[Snapshot] = []
+        for position, snap in enumerate(reversed(entries)):
+            if position == 0:
+                continue
+            if (self.max_count is not None and position >= self.max_count) or (
+                cutoff is not None and snap.timestamp < cutoff
+            ):
+                dropped.append(snap)
+        if not dropped:
+            return dropped
+
+        gone = {id(s) for s in dropped}
+        entries[:] = [s for s in entries if id(s) not in gone]
+        live = {s.digest for s in entries}
+        for digest in {s.digest for s in dropped} - live:
+            try:
+                os.unlink(self._object_path(source, digest))
+            except OSError:
+                pass
+        return dropped
@@ -0,0 +1,119 @@
+"""Watches the SSH config files for changes made by other programs."""
+
+import fnmatch
+import glob
+import logging
+import os
+from pathlib import Path
+from typing import Callable, Dict, List, Set
+
+from gi.repository import Gio, GLib
+
+logger = logging.getLogger(__name__)
+
+# Events arriving within this window after the first one are delivered
+# together, so a tool rewriting several files produces one refresh.
+_COALESCE_MS = 150
+
+_IGNORED_EVENTS = (
+    Gio.FileMonitorEvent.ATTRIBUTE_CHANGED,
+    Gio.FileMonitorEvent.PRE_UNMOUNT,
+    Gio.FileMonitorEvent.UNMOUNTED,
+)
+
+
+def _pattern_dir(pattern: str) -> Path:
+    """The deepest directory of an Include pattern that has no wildcards."""
+    parent = Path(pattern).parent
+    while glob.has_magic(str(parent)) and parent != parent.parent:
+        parent = parent.parent
+    return parent
+
+
+class ConfigMonitor:
+    """Monitors the main config, every resolved included file and the
+    directories Include patterns are expanded in.
+
+    Events are coalesced for ``_COALESCE_MS`` and ``callback`` is then
+    called once on the main loop with the affected paths. Directory events
+    are only passed on for files matching one of the Include patterns, so
+    unrelated files next to the config (``known_hosts``, keys) are ignored.
+    Call :meth:`sync` after every parse so the watched set follows the
+    include graph.
+    """
+
+    def __init__(self, parser, callback: Callable[[List[Path]], None]) -> None:
+        self.parser = parser
+        self.callback = callback
+        self._file_monitors: Dict[Path, Gio.FileMonitor] = {}
+        self._dir_monitors: Dict[Path, Gio.FileMonitor] = {}
+        self._patterns: List[str] = []
+        self._pending: Dict[Path, None] = {}
+        self._flush_source = 0
+
+    def sync(self) -> None:
+        files, patterns = self.parser.watched_paths()
+        self._patterns = patterns
+        self._update(
+            self._file_monitors,
+            set(files),
+            lambda f: f.monitor_file(Gio.FileMonitorFlags.WATCH_MOVES, None),
+        )
+        self._update(
+            self._dir_monitors,
+            {_pattern_dir(p) for p in patterns},
+            lambda f: f.monitor_directory(Gio.FileMonitorFlags.WATCH_MOVES, None),
+        )
+
+    def _update(
+        self,
+        monitors: Dict[Path, Gio.FileMonitor],
+        wanted: Set[Path],
+        create: Callable[[Gio.File], Gio.FileMonitor],
+    ) -> None:
+        for path in [p for p in monitors if p not in wanted]:
+            monitors.pop(path).cancel()
+        for path in wanted:
+            if path in monitors:
+                continue
+            try:
+                monitor = create(Gio.File.new_for_path(str(path)))
+                monitor.connect("changed", self._on_changed)
+                monitors[path] = monitor
+            except Exception as e:
+                logger.debug("Cannot monitor %s: %s", path, e)
+
+    def stop(self) -> None:
+        for monitors in (self._file_monitors, self._dir_monitors):
+            for monitor in monitors.values():
+                monitor.cancel()
+            monitors.clear()
+        if self._flush_source:
+            GLib.source_remove(self._flush_source)
+            self._flush_source = 0
+        self._pending.clear()
+
+    def _on_changed(self, monitor, file, other_file, event_type) -> None:
+        if event_type in _IGNORED_EVENTS:
+            return
+        for changed in (file, other_file):
+            path = changed.get_path() if changed is not None else None
+            if path and self._is_relevant(Path(path)):
+                self._pending[Path(path)] = None
+        if self._pending and not self._flush_source:
+            self._flush_source = GLib.timeout_add(_COALESCE_MS, self._flush)
+
+    def _is_relevant(self, path: Path) -> bool:
+        if path in self._file_monitors:
+            return True
+        text = os.fspath(path)
+        return any(fnmatch.fnmatchcase(text, p) for p in self._patterns)
+
+    def _flush(self) -> bool:
+        self._flush_source = 0
+        paths, self._pending = list(self._pending), {}
+        try:
+            self.callback(paths)
+        except Exception as e:
+            logger.warning("Failed to apply config file changes: %s", e)
+        return False
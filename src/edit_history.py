@@ -0,0 +1,511 @@
+"""Undo/redo history of edits to an :class:`SSHConfig`, independent of GTK.
+
+Edits are recorded as small operations (option insert/remove/change,
+pattern change, raw text change, host insert/remove/move) that know how to
+apply and revert themselves. Hosts are addressed by their index in
+``config.hosts`` rather than by object, so the history stays valid when an
+incremental re-parse after a save replaces the host objects. Operations are
+grouped into transactions, which are what undo and redo act on; the history
+is capped by an estimate of the memory its operations hold.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from typing import TYPE_CHECKING, Callable, Deque, Iterator, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from ssh_config_parser import SSHConfig, SSHHost
+
+try:
+    from ssh_studio.ssh_config_parser import SSHOption
+except ImportError:
+    from ssh_config_parser import SSHOption
+
+# ``(key, value, indentation)`` of one option.
+OptionTuple = Tuple[str, str, str]
+
+# Consecutive edits of the same fields of one host within this many
+# seconds are merged into one transaction, so typing a value is undone as
+# a whole.
+_COALESCE_SECONDS = 1.0
+
+_OP_OVERHEAD = 64
+
+
+def _lines_size(lines) -> int:
+    return sum(len(line) for line in lines)
+
+
+def _options_size(options) -> int:
+    return sum(len(k) + len(v) + len(i) for k, v, i in options)
+
+
+@dataclass(slots=True, frozen=True)
+class HostState:
+    """The editable content of a host: what undo needs to compare against."""
+
+    patterns: Tuple[str, ...]
+    options: Tuple[OptionTuple, ...]
+    raw_lines: Tuple[str, ...]
+
+    @classmethod
+    def of(cls, host: "SSHHost") -> "HostState":
+        return cls(
+            tuple(host.patterns),
+            tuple((o.key, o.value, o.indentation) for o in host.options),
+            tuple(host.raw_lines),
+        )
+
+
+class _Op:
+    __slots__ = ()
+
+    def apply(self, config: "SSHConfig") -> None:
+        raise NotImplementedError
+
+    def revert(self, config: "SSHConfig") -> None:
+        raise NotImplementedError
+
+    def size(self) -> int:
+        return _OP_OVERHEAD
+
+    # The host index the user should see after undoing or redoing the op.
+    index = -1
+
+
+class _PatternsOp(_Op):
+    __slots__ = ("index", "old", "new")
+
+    def __init__(self, index: int, old: Tuple[str, ...], new: Tuple[str, ...]):
+        self.index, self.old, self.new = index, old, new
+
+    def apply(self, config):
+        config.hosts[self.index].patterns = list(self.new)
+
+    def revert(self, config):
+        config.hosts[self.index].patterns = list(self.old)
+
+    def size(self):
+        return _OP_OVERHEAD + _lines_size(self.old) + _lines_size(self.new)
+
+
+class _OptionOp(_Op):
+    """Inserts (``old`` is None), removes (``new`` is None) or replaces the
+    option at ``position`` of host ``index``."""
+
+    __slots__ = ("index", "position", "old", "new")
+
+    def __init__(
+        self,
+        index: int,
+        position: int,
+        old: Optional[OptionTuple],
+        new: Optional[OptionTuple],
+    ):
+        self.index, self.position, self.old, self.new = index, position, old, new
+
+    @staticmethod
+    def _put(host, position, before, after):
+        options = host.options
+        if before is None:
+            options.insert(position, SSHOption(*after))
+        elif after is None:
+            del options[position]
+        else:
+            options[position] = SSHOption(*after)
+
+    def apply(self, config):
+        self._put(config.hosts[self.index], self.position, self.old, self.new)
+
+    def revert(self, config):
+        self._put(config.hosts[self.index], self.position, self.new, self.old)
+
+    def size(self):
+        return _OP_OVERHEAD + _options_size(
+            [o for o in (self.old, self.new) if o is not None]
+        )
+
+
+class _RawOp(_Op):
+    __slots__ = ("index", "old", "new")
+
+    def __init__(self, index: int, old: Tuple[str, ...], new: Tuple[str, ...]):
+        self.index, self.old, self.new = index, old, new
+
+    def apply(self, config):
+        config.hosts[self.index].raw_lines = list(self.new)
+
+    def revert(self, config):
+        config.hosts[self.index].raw_lines = list(self.old)
+
+    def size(self):
+        return _OP_OVERHEAD + _lines_size(self.old) + _lines_size(self.new)
+
+
+class _HostOp(_Op):
+    """Inserts (``insert``) or removes the host at ``index``. The host
+    object removed last is kept to be put back."""
+
+    __slots__ = ("index", "host", "insert")
+
+    def __init__(self, index: int, host: "SSHHost", insert: bool):
+        self.index, self.host, self.insert = index, host, insert
+
+    def _add(self, config):
+        config.hosts.insert(self.index, self.host)
+
+    def _remove(self, config):
+        self.host = config.hosts[self.index]
+        del config.hosts[self.index]
+
+    def apply(self, config):
+        self._add(config) if self.insert else self._remove(config)
+
+    def revert(self, config):
+        self._remove(config) if self.insert else self._add(config)
+
+    def size(self):
+        state = HostState.of(self.host)
+        return (
+            _OP_OVERHEAD * (2 + len(state.options))
+            + _lines_size(state.patterns)
+            + _options_size(state.options)
+            + _lines_size(state.raw_lines)
+        )
+
+
+class _MoveOp(_Op):
+    __slots__ = ("source", "index")
+
+    def __init__(self, source: int, index: int):
+        self.source, self.index = source, index
+
+    @staticmethod
+    def _move(config, source, dest):
+        hosts = config.hosts
+        host = hosts.pop(source)
+        hosts.insert(dest, host)
+
+    def apply(self, config):
+        self._move(config, self.source, self.index)
+
+    def revert(self, config):
+        self._move(config, self.index, self.source)
+
+
+class Transaction:
+    """A group of operations undone and redone together."""
+
+    __slots__ = ("label", "ops", "size", "merge_key", "time")
+
+    def __init__(self, label: str) -> None:
+        self.label = label
+        self.ops: List[_Op] = []
+        self.size = 0
+        self.merge_key: Optional[tuple] = None
+        self.time = time.monotonic()
+
+    @property
+    def index(self) -> int:
+        """The host index affected last, or -1."""
+        return self.ops[-1].index if self.ops else -1
+
+
+def _diff_ops(index: int, old: HostState, new: HostState) -> List[_Op]:
+    """Operations turning ``old`` into ``new``, in the order to apply them."""
+    ops: List[_Op] = []
+    if old.patterns != new.patterns:
+        ops.append(_PatternsOp(index, old.patterns, new.patterns))
+    if old.options != new.options:
+        opcodes = SequenceMatcher(
+            None, old.options, new.options, autojunk=False
+        ).get_opcodes()
+        # Later ranges first, so the positions of earlier ones stay valid.
+        for tag, i1, i2, j1, j2 in reversed(opcodes):
+            if tag == "equal":
+                continue
+            if tag == "replace" and i2 - i1 == j2 - j1:
+                for k in range(i2 - i1):
+                    ops.append(
+                        _OptionOp(index, i1 + k, old.options[i1 + k], new.options[j1 + k])
+                    )
+                continue
+            for k in range(i2 - 1, i1 - 1, -1):
+                ops.append(_OptionOp(index, k, old.options[k], None))
+            for k in range(j2 - j1):
+                ops.append(_OptionOp(index, i1 + k, None, new.options[j1 + k]))
+    if old.raw_lines != new.raw_lines:
+        ops.append(_RawOp(index, old.raw_lines, new.raw_lines))
+    return ops
+
+
+def _merge_key(ops: List[_Op]) -> Optional[tuple]:
+    targets = []
+    for op in ops:
+        if isinstance(op, _PatternsOp):
+            targets.append(("patterns",))
+        elif isinstance(op, _RawOp):
+            targets.append(("raw",))
+        elif isinstance(op, _OptionOp) and op.old is not None and op.new is not None:
+            targets.append(("option", op.position))
+        else:
+            return None
+    return (ops[0].index, frozenset(targets))
+
+
+def _find(hosts, host) -> int:
+    for i, candidate in enumerate(hosts):
+        if candidate is host:
+            return i
+    return -1
+
+
+class EditHistory:
+    """Undo and redo stacks of transactions on the config returned by
+    ``get_config`` (e.g. ``lambda: parser.config``).
+
+    Structural edits go through :meth:`insert_host`, :meth:`remove_host`
+    and :meth:`move_host`. Edits made directly to a host are recorded by
+    :meth:`track`-ing the host first and calling :meth:`commit` afterwards,
+    which stores only the difference. Undo and redo cost the same whatever
+    the size of the config.
+    """
+
+    def __init__(
+        self,
+        get_config: Callable[[], "SSHConfig"],
+        max_bytes: int = 4 * 1024 * 1024,
+        max_transactions: int = 500,
+    ) -> None:
+        self._get_config = get_config
+        self.max_bytes = max_bytes
+        self.max_transactions = max_transactions
+        self._undo: Deque[Transaction] = deque()
+        self._redo: List[Transaction] = []
+        self._bytes = 0
+        self._open: Optional[Transaction] = None
+        self._tracked: Optional["SSHHost"] = None
+        self._tracked_index = -1
+        self._tracked_state: Optional[HostState] = None
+        # Label of the transactions recorded by commit() without one.
+        self.edit_label = "Edit host"
+
+    @property
+    def config(self) -> "SSHConfig":
+        return self._get_config()
+
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    def undo_label(self) -> Optional[str]:
+        return self._undo[-1].label if self._undo else None
+
+    def redo_label(self) -> Optional[str]:
+        return self._redo[-1].label if self._redo else None
+
+    def memory_used(self) -> int:
+        return self._bytes
+
+    def clear(self) -> None:
+        """Forgets all history, e.g. after the config was reloaded."""
+        self._undo.clear()
+        self._redo.clear()
+        self._bytes = 0
+        self._open = None
+        self.untrack()
+
+    @contextmanager
+    def transaction(self, label: str) -> Iterator[Transaction]:
+        """Groups the operations recorded inside the block into one undo
+        step. Nested blocks join the outermost one."""
+        if self._open is not None:
+            yield self._open
+            return
+        txn = self._open = Transaction(label)
+        try:
+            yield txn
+        finally:
+            self._open = None
+            if txn.ops:
+                self._push(txn)
+
+    def _record(self, ops: List[_Op], label: str, merge: bool = False) -> None:
+        if not ops:
+            return
+        if self._open is not None:
+            self._open.ops.extend(ops)
+            self._open.size += sum(op.size() for op in ops)
+            return
+        key = _merge_key(ops) if merge else None
+        last = self._undo[-1] if self._undo else None
+        now = time.monotonic()
+        if (
+            key is not None
+            and last is not None
+            and not self._redo
+            and last.merge_key == key
+            and now - last.time < _COALESCE_SECONDS
+        ):
+            # Keep the first "before" of each field: the merged transaction
+            # reverts to the state before the first of the merged edits.
+            added = sum(op.size() for op in ops)
+            for op, new in zip(last.ops, ops):
+                op.new = new.new
+            last.time = now
+            self._bytes += added - last.size
+            last.size = added
+            self._trim()
+            return
+        txn = Transaction(label)
+        txn.ops = ops
+        txn.size = sum(op.size() for op in ops)
+        txn.merge_key = key
+        self._push(txn)
+
+    def _push(self, txn: Transaction) -> None:
+        self._undo.append(txn)
+        self._bytes += txn.size
+        for dropped in self._redo:
+            self._bytes -= dropped.size
+        self._redo.clear()
+        self._trim()
+
+    def _trim(self) -> None:
+        while len(self._undo) > 1 and (
+            self._bytes > self.max_bytes or len(self._undo) > self.max_transactions
+        ):
+            self._bytes -= self._undo.popleft().size
+
+    # Structural edits
+
+    def insert_host(self, index: int, host: "SSHHost", label: str) -> None:
+        op = _HostOp(index, host, insert=True)
+        op.apply(self.config)
+        self._shift_tracked(index, 1)
+        self._record([op], label)
+
+    def remove_host(self, host: "SSHHost", label: str) -> int:
+        """Removes ``host`` and returns the index it had, or -1."""
+        index = _find(self.config.hosts, host)
+        if index < 0:
+            return -1
+        if host is self._tracked:
+            self.commit()
+            self.untrack()
+        op = _HostOp(index, host, insert=False)
+        op.apply(self.config)
+        self._shift_tracked(index, -1)
+        self._record([op], label)
+        return index
+
+    def move_host(self, source: int, dest: int, label: str) -> None:
+        """Moves the host at ``source`` so it ends up at index ``dest``."""
+        if source == dest:
+            return
+        op = _MoveOp(source, dest)
+        op.apply(self.config)
+        self._tracked_index = -1
+        self._record([op], label)
+
+    # Edits made directly to a host
+
+    def track(self, host: Optional["SSHHost"]) -> None:
+        """Remembers the state of ``host`` so :meth:`commit` can record what
+        changed since. Only one host is tracked at a time."""
+        if host is None:
+            self.untrack()
+            return
+        self._tracked = host
+        self._tracked_index = -1
+        self._tracked_state = HostState.of(host)
+
+    def untrack(self) -> None:
+        self._tracked = None
+        self._tracked_index = -1
+        self._tracked_state = None
+
+    def commit(self, label: Optional[str] = None) -> bool:
+        """Records the changes made to the tracked host since it was tracked
+        or last committed. Returns whether anything was recorded."""
+        host, before = self._tracked, self._tracked_state
+        if host is None or before is None:
+            return False
+        hosts = self.config.hosts
+        index = self._tracked_index
+        if not (0 <= index < len(hosts) and hosts[index] is host):
+            index = self._tracked_index = _find(hosts, host)
+        if index < 0:
+            return False
+        after = HostState.of(host)
+        if after == before:
+            return False
+        self._tracked_state = after
+        self._record(
+            _diff_ops(index, before, after), label or self.edit_label, merge=True
+        )
+        return True
+
+    def reattach(self) -> Optional["SSHHost"]:
+        """Points tracking at the host now at the tracked host's index when a
+        re-parse (e.g. after saving) replaced the tracked object, and returns
+        the tracked host. Tracking stops if that host has other patterns."""
+        host = self._tracked
+        if host is None:
+            return None
+        hosts = self.config.hosts
+        index = self._tracked_index
+        if 0 <= index < len(hosts) and hosts[index] is host:
+            return host
+        if _find(hosts, host) >= 0:
+            return host
+        if 0 <= index < len(hosts) and hosts[index].patterns == host.patterns:
+            self._tracked = hosts[index]
+            self._tracked_state = HostState.of(self._tracked)
+            return self._tracked
+        self.untrack()
+        return None
+
+    def _shift_tracked(self, index: int, delta: int) -> None:
+        if self._tracked_index >= index:
+            self._tracked_index += delta
+
+    # Undo and redo
+
+    def undo(self) -> Optional[Transaction]:
+        """Reverts the last transaction and returns it, or ``None``."""
+        self.commit()
+        if not self._undo:
+            return None
+        txn = self._undo.pop()
+        config = self.config
+        for op in reversed(txn.ops):
+            op.revert(config)
+        txn.merge_key = None
+        self._redo.append(txn)
+        self._retrack()
+        return txn
+
+    def redo(self) -> Optional[Transaction]:
+        """Re-applies the last undone transaction and returns it, or ``None``."""
+        if not self._redo:
+            return None
+        txn = self._redo.pop()
+        config = self.config
+        for op in txn.ops:
+            op.apply(config)
+        self._undo.append(txn)
+        self._retrack()
+        return txn
+
+    def _retrack(self) -> None:
+        if self._tracked is not None:
+            self._tracked_state = HostState.of(self._tracked)
+            self._tracked_index = -1
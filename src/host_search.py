@@ -0,0 +1,563 @@
+"""Host search used by the host list, independent of GTK.
+
+A query is a list of whitespace-separated terms, all of which must match:
+
+- ``deploy`` matches hosts whose alias, HostName, User or IdentityFile
+  contains the term, or whose alias contains its letters in order
+  (``prdb`` finds ``prod-db``); exact and prefix alias matches rank first.
+- ``field:value`` matches one field: ``host:``, ``hostname:``, ``user:``,
+  ``port:``, ``key:``, ``proxy:``, ``tag:`` or any option keyword
+  (``forwardagent:yes``). Values match as substrings, whole numbers exactly
+  and ``*``/``?`` as globs. ``field:`` alone matches hosts that set it.
+- ``-term`` excludes the hosts ``term`` matches (as a substring).
+- Quotes keep spaces and colons in a term: ``"web 1"``, ``"a:b"``.
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import logging
+import re
+import threading
+from functools import lru_cache
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from ssh_config_parser import SSHConfig, SSHHost
+
+try:
+    from ssh_studio.ssh_config_tokenizer import split_words
+except ImportError:
+    from ssh_config_tokenizer import split_words
+
+
+def searchable_text(host: "SSHHost") -> str:
+    """The lowercased text a query is matched against: the patterns (or the
+    Match header), HostName, User and IdentityFile."""
+    return (
+        (" ".join(host.patterns) or host.header)
+        + " "
+        + (host.get_option("HostName") or "")
+        + " "
+        + (host.get_option("User") or "")
+        + " "
+        + (host.get_option("IdentityFile") or "")
+    ).lower()
+
+
+def filter_hosts(hosts: List["SSHHost"], query: str) -> List["SSHHost"]:
+    """Returns the hosts whose searchable text contains ``query``, ignoring
+    case, in their original order."""
+    query = query.lower()
+    if not query:
+        return list(hosts)
+    return [host for host in hosts if query in searchable_text(host)]
+
+
+# Field names accepted in ``field:value`` besides option keywords, mapped
+# to the lowercased option keyword; ``None`` is the host's alias.
+FIELD_ALIASES: Dict[str, Optional[str]] = {
+    "host": None,
+    "alias": None,
+    "name": None,
+    "hostname": "hostname",
+    "addr": "hostname",
+    "user": "user",
+    "port": "port",
+    "key": "identityfile",
+    "identity": "identityfile",
+    "proxy": "proxyjump",
+    "tag": "tag",
+}
+
+_FIELD_RE = re.compile(r"[A-Za-z][A-Za-z0-9]*")
+
+# Term scores; a host's rank is the sum over its plain terms.
+_SCORE_ALIAS_EXACT = 100
+_SCORE_ALIAS_PREFIX = 80
+_SCORE_ALIAS = 60
+_SCORE_TEXT = 40
+_SCORE_FUZZY = 20
+
+
+class Term:
+    """One compiled query term."""
+
+    __slots__ = ("field", "value", "negate", "exact", "glob", "fuzzy")
+
+    def __init__(self, field: Optional[str], value: str, negate: bool) -> None:
+        # ``field`` is "" for plain terms, ``None`` for the alias and the
+        # lowercased option keyword otherwise.
+        self.field = field
+        self.value = value
+        self.negate = negate
+        self.glob = field != "" and any(c in value for c in "*?[")
+        self.exact = field != "" and value.isdigit()
+        self.fuzzy = None
+        if field == "" and not negate and len(value) > 1:
+            # ``a[^b]*b[^c]*c``: each step jumps to the next occurrence of the
+            # following letter, so a search never backtracks.
+            parts = [re.escape(value[0])]
+            for c in value[1:]:
+                parts.append(f"[^{re.escape(c)}]*{re.escape(c)}")
+            self.fuzzy = re.compile("".join(parts))
+
+    def refines(self, previous: "Term") -> bool:
+        """Whether every host this term matches is matched by ``previous``."""
+        if self.field != previous.field or self.negate != previous.negate:
+            return False
+        if self.negate or self.exact or self.glob or previous.exact or previous.glob:
+            return self.value == previous.value
+        return previous.value in self.value
+
+    def matches_values(self, values: Optional[str]) -> bool:
+        """Whether a field term matches a host's values of the field, given
+        lowercased and joined by newlines (``None`` when the host does not
+        set the field)."""
+        if values is None:
+            return False
+        value = self.value
+        if not value:
+            return True
+        if self.glob:
+            return any(fnmatch.fnmatchcase(v, value) for v in values.split("\n"))
+        if self.exact:
+            return value in values.split("\n")
+        return value in values
+
+
+class Query:
+    """A compiled search query; see the module docstring for the syntax."""
+
+    __slots__ = ("text", "terms", "ranked")
+
+    def __init__(self, text: str, terms: List[Term]) -> None:
+        self.text = text
+        self.terms = terms
+        self.ranked = any(t.field == "" and not t.negate for t in terms)
+
+    def refines(self, previous: Optional["Query"]) -> bool:
+        """Whether this query matches a subset of what ``previous`` matched,
+        so its results can be found among the previous ones."""
+        if previous is None or len(self.terms) < len(previous.terms):
+            return False
+        return all(t.refines(p) for t, p in zip(self.terms, previous.terms))
+
+
+def _unquote(word: str) -> str:
+    if len(word) >= 2 and word[0] in "\"'" and word[-1] == word[0]:
+        return word[1:-1]
+    return word
+
+
+@lru_cache(maxsize=256)
+def compile_query(text: str) -> Query:
+    """Parses a query once; repeated keystrokes reuse the result."""
+    terms: List[Term] = []
+    for word in split_words(text.lower()):
+        negate = word.startswith("-")
+        if negate:
+            word = word[1:]
+        if not word:
+            continue
+        field = ""
+        if word[0] not in "\"'":
+            name, sep, rest = word.partition(":")
+            if sep and _FIELD_RE.fullmatch(name):
+                field = FIELD_ALIASES.get(name, name)
+                word = rest
+        value = _unquote(word)
+        if not value and field == "":
+            continue
+        terms.append(Term(field, value, negate))
+    return Query(text, terms)
+
+
+class SearchIndex:
+    """Searches a host list with compiled queries.
+
+    The alias and searchable text of a host are computed once and kept
+    until the config reports the host as touched (through
+    :meth:`SSHConfig.add_listener`); the values of other fields are
+    gathered per field on first use. When a query refines the previous one
+    (typing more of a term, or adding terms), only the previous matches are
+    checked instead of every host.
+
+    Hosts that do not belong to a config are not watched; call
+    :meth:`invalidate` after changing them.
+    """
+
+    def __init__(self) -> None:
+        self._hosts: List["SSHHost"] = []
+        self._config: Optional["SSHConfig"] = None
+        self._cache: Dict[int, Tuple["SSHHost", str, str]] = {}
+        # Alias and text of ``_hosts[i]``, rebuilt from ``_cache`` after a
+        # change, and per-field values, rebuilt on demand.
+        self._aliases: Optional[List[str]] = None
+        self._padded: Optional[List[str]] = None
+        self._texts: Optional[List[str]] = None
+        self._positions: Optional[Dict[int, int]] = None
+        self._fields: Dict[Optional[str], List[Optional[str]]] = {}
+        self._last_query: Optional[Query] = None
+        self._last_matches: Optional[List[int]] = None
+
+    def set_hosts(self, hosts: List["SSHHost"]) -> None:
+        """Index ``hosts``, keeping the text of hosts indexed before."""
+        config = getattr(hosts, "_config", None)
+        if config is not self._config:
+            if self._config is not None:
+                self._config.remove_listener(self._on_change)
+            if config is not None:
+                config.add_listener(self._on_change)
+            self._config = config
+        cache = {}
+        for host in hosts:
+            entry = self._cache.get(id(host))
+            if entry is not None and entry[0] is host:
+                cache[id(host)] = entry
+        self._cache = cache
+        self._hosts = hosts
+        self.invalidate()
+
+    def invalidate(self, host: Optional["SSHHost"] = None) -> None:
+        """Recompute the entry of ``host``, or rebuild the index from the
+        cached entries when ``host`` is ``None`` (hosts added, removed or
+        reordered)."""
+        self._last_matches = None
+        if host is None:
+            self._drop_lists()
+            return
+        self._cache.pop(id(host), None)
+        if self._texts is None:
+            return
+        if self._positions is None:
+            self._positions = {id(h): i for i, h in enumerate(self._hosts)}
+        i = self._positions.get(id(host))
+        if i is None or i >= len(self._hosts) or self._hosts[i] is not host:
+            self._drop_lists()
+            return
+        _, alias, text = self._entry(host)
+        # Searches prepared earlier keep reading the old lists, so the
+        # changed entry goes into copies.
+        self._aliases = self._aliases[:]
+        self._aliases[i] = alias
+        self._padded = self._padded[:]
+        self._padded[i] = f" {alias} "
+        self._texts = self._texts[:]
+        self._texts[i] = text
+        fields = {}
+        for field, values in self._fields.items():
+            values = values[:]
+            values[i] = self._field_value(host, field, alias)
+            fields[field] = values
+        self._fields = fields
+
+    def _drop_lists(self) -> None:
+        self._aliases = None
+        self._texts = None
+        self._positions = None
+        self._fields = {}
+
+    def _on_change(self, host: Optional["SSHHost"]) -> None:
+        self.invalidate(host)
+
+    def _refresh(self) -> None:
+        texts = self._texts
+        if texts is not None and len(texts) == len(self._hosts):
+            return
+        cache = self._cache
+        aliases = []
+        texts = []
+        for host in self._hosts:
+            entry = cache.get(id(host))
+            if entry is None or entry[0] is not host:
+                entry = self._entry(host)
+            aliases.append(entry[1])
+            texts.append(entry[2])
+        self._aliases = aliases
+        self._padded = [f" {alias} " for alias in aliases]
+        self._texts = texts
+        self._positions = None
+        self._fields = {}
+        self._last_matches = None
+
+    def _entry(self, host: "SSHHost") -> Tuple["SSHHost", str, str]:
+        alias = (" ".join(host.patterns) or host.header).lower()
+        entry = self._cache[id(host)] = (host, alias, searchable_text(host))
+        return entry
+
+    @staticmethod
+    def _field_value(
+        host: "SSHHost", field: Optional[str], alias: str
+    ) -> Optional[str]:
+        if field is None:
+            return "\n".join(alias.split(" "))
+        positions = host._index().get(field)
+        if not positions:
+            return None
+        options = host.options
+        if len(positions) == 1:
+            return options[positions[0]].value.lower()
+        return "\n".join(options[i].value.lower() for i in positions)
+
+    def _field_values(self, field: Optional[str]) -> List[Optional[str]]:
+        values = self._fields.get(field)
+        if values is None:
+            value = self._field_value
+            values = [
+                value(host, field, alias)
+                for host, alias in zip(self._hosts, self._aliases)
+            ]
+            self._fields[field] = values
+        return values
+
+    def prepare(self, query: str) -> "Search":
+        """Compiles ``query`` and captures what evaluating it needs.
+
+        Reads the hosts, so call it on the thread that owns them; the
+        returned :class:`Search` only reads its own snapshot.
+        """
+        compiled = compile_query(query)
+        self._refresh()
+        candidates = None
+        if self._last_matches is not None and compiled.refines(self._last_query):
+            candidates = self._last_matches
+        fields = {
+            term.field: self._field_values(term.field)
+            for term in compiled.terms
+            if term.field != ""
+        }
+        return Search(
+            compiled,
+            list(self._hosts),
+            self._texts,
+            self._padded,
+            fields,
+            candidates,
+        )
+
+    def remember(self, search: "Search") -> None:
+        """Keep the matches of a finished search, so the next query can
+        narrow them, unless the hosts changed since it was prepared."""
+        if not search.complete or search.texts is not self._texts:
+            return
+        if search.query.terms:
+            self._last_query = search.query
+            self._last_matches = search.matches
+        else:
+            self._last_query = None
+            self._last_matches = None
+
+    def filter(self, query: str) -> List["SSHHost"]:
+        """The hosts matching ``query``, best first when it has plain terms
+        and in list order otherwise."""
+        search = self.prepare(query)
+        result = [host for chunk in search.run() for host in chunk]
+        self.remember(search)
+        return result
+
+
+class Search:
+    """One evaluation of a compiled query over a snapshot of the index.
+
+    Made by :meth:`SearchIndex.prepare`. :meth:`run` only reads the snapshot,
+    so it may run on a worker thread while the hosts are edited.
+    """
+
+    def __init__(
+        self,
+        query: Query,
+        hosts: List["SSHHost"],
+        texts: List[str],
+        padded: List[str],
+        fields: Dict[Optional[str], List[Optional[str]]],
+        candidates: Optional[List[int]],
+    ) -> None:
+        self.query = query
+        self.hosts = hosts
+        self.texts = texts
+        self.padded = padded
+        self.fields = fields
+        self.candidates = candidates
+        # Indices of the matching hosts in list order, filled by run().
+        self.matches: List[int] = []
+        self.complete = False
+
+    def run(
+        self,
+        first_chunk: int = 500,
+        chunk: int = 5000,
+        cancelled: Optional[Callable[[], bool]] = None,
+    ) -> Iterator[List["SSHHost"]]:
+        """Yields the matching hosts in chunks, the first one small.
+
+        Unranked results are yielded as each slice of hosts is checked, so
+        the first matches come before the scan ends; ranked results are
+        yielded best first once every host has been scored. Stops early,
+        leaving :attr:`complete` false, when ``cancelled()`` returns true.
+        """
+        hosts = self.hosts
+        candidates = self.candidates
+        if candidates is None:
+            candidates = range(len(hosts))
+        ranked = self.query.ranked
+        scores = [0] * len(hosts) if ranked else None
+        matches = self.matches
+
+        start = 0
+        size = first_chunk
+        while start < len(candidates):
+            if cancelled is not None and cancelled():
+                return
+            found = self._evaluate(candidates[start : start + size], scores)
+            matches.extend(found)
+            if found and not ranked:
+                yield [hosts[i] for i in found]
+            start += size
+            size = chunk
+
+        if ranked:
+            # Stable, so equal scores keep list order.
+            ordered = sorted(matches, key=scores.__getitem__, reverse=True)
+            start = 0
+            size = first_chunk
+            while start < len(ordered):
+                if cancelled is not None and cancelled():
+                    return
+                yield [hosts[i] for i in ordered[start : start + size]]
+                start += size
+                size = chunk
+        self.complete = True
+
+    def _evaluate(self, candidates, scores: Optional[List[int]]) -> List[int]:
+        texts = self.texts
+        for term in self.query.terms:
+            value = term.value
+            if term.field == "":
+                if term.negate:
+                    candidates = [i for i in candidates if value not in texts[i]]
+                else:
+                    candidates = self._match_plain(term, candidates, scores)
+            else:
+                values = self.fields[term.field]
+                if term.glob or term.exact:
+                    test = term.matches_values
+                    keep = not term.negate
+                    candidates = [i for i in candidates if test(values[i]) is keep]
+                elif not value:
+                    if term.negate:
+                        candidates = [i for i in candidates if values[i] is None]
+                    else:
+                        candidates = [i for i in candidates if values[i] is not None]
+                elif term.negate:
+                    candidates = [
+                        i
+                        for i in candidates
+                        if (v := values[i]) is None or value not in v
+                    ]
+                else:
+                    candidates = [
+                        i
+                        for i in candidates
+                        if (v := values[i]) is not None and value in v
+                    ]
+            if not candidates:
+                return []
+        return list(candidates)
+
+    def _match_plain(self, term: Term, candidates, scores: List[int]) -> List[int]:
+        """Candidates matching a plain term, adding its score to ``scores``.
+
+        A substring of the searchable text scores by where it falls in the
+        alias; otherwise the letters must appear in order in the alias, and
+        the tighter they are, the higher the score.
+        """
+        value = term.value
+        exact = f" {value} "
+        prefix = f" {value}"
+        fuzzy = term.fuzzy.search if term.fuzzy is not None else None
+        weight = _SCORE_FUZZY * len(value)
+        padded = self.padded
+        texts = self.texts
+        matched = []
+        for i in candidates:
+            if value in texts[i]:
+                alias = padded[i]
+                if exact in alias:
+                    scores[i] += _SCORE_ALIAS_EXACT
+                elif prefix in alias:
+                    scores[i] += _SCORE_ALIAS_PREFIX
+                elif value in alias:
+                    scores[i] += _SCORE_ALIAS
+                else:
+                    scores[i] += _SCORE_TEXT
+                matched.append(i)
+            elif fuzzy is not None:
+                match = fuzzy(padded[i])
+                if match is not None:
+                    scores[i] += weight // (match.end() - match.start())
+                    matched.append(i)
+        return matched
+
+
+class SearchWorker:
+    """Runs searches on one background thread, newest request first.
+
+    :meth:`submit` replaces any search still waiting and cancels the one
+    running; each search gets a generation number, and ``publish`` is
+    called on the worker thread with ``(generation, hosts, first, done)``
+    for every chunk of results, then once with ``done`` true and no hosts.
+    ``first`` marks the chunk that replaces the previous results. Callers
+    drop chunks whose generation is no longer :meth:`is_current`.
+    """
+
+    def __init__(
+        self, publish: Callable[[int, List["SSHHost"], bool, bool], None]
+    ) -> None:
+        self._publish = publish
+        self._condition = threading.Condition()
+        self._pending: Optional[Tuple[int, Search]] = None
+        self._generation = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, search: Search) -> int:
+        with self._condition:
+            self._generation += 1
+            self._pending = (self._generation, search)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="host-search", daemon=True
+                )
+                self._thread.start()
+            self._condition.notify()
+            return self._generation
+
+    def cancel(self) -> None:
+        """Drop the waiting search and stop the running one."""
+        with self._condition:
+            self._generation += 1
+            self._pending = None
+
+    def is_current(self, generation: int) -> bool:
+        return generation == self._generation
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while self._pending is None:
+                    self._condition.wait()
+                generation, search = self._pending
+                self._pending = None
+
+            def cancelled(generation=generation) -> bool:
+                return generation != self._generation
+
+            try:
+                first = True
+                for hosts in search.run(cancelled=cancelled):
+                    self._publish(generation, hosts, first, False)
+                    first = False
+                if search.complete:
+                    self._publish(generation, [], first, True)
+            except Exception as e:
+                logging.error(f"Host search failed: {e}")
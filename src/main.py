@@ -173,26 +173,48 @@ class SSHConfigStudioApp(Adw.Application):
         self._add_actions()
 
         self.parser = SSHConfigParser()
-        GLib.idle_add(self._parse_config_async)
+        GLib.idle_add(self._parse_config_async, True)
 
-    def _parse_config_async(self):
-        def worker():
+    def _parse_config_async(self, use_cache: bool = False):
+        """Parses the config on a worker thread and loads the host list.
+
+        With ``use_cache`` the list is first filled from the on-disk parse
+        cache; the worker then checks the cached files against their text.
+        Files that differ are reloaded on the main loop like any other
+        external change, so edits made to the cached hosts in the meantime
+        are not overwritten from the worker.
+        """
+
+        def update_ui():
             try:
-                if self.parser is not None:
-                    self.parser.parse()
-
-                def update_ui():
-                    try:
-                        if self.main_window and getattr(
-                            self.main_window, "host_list", None
-                        ):
-                            self.main_window.host_list.load_hosts(
-                                self.parser.config.hosts
-                            )
-                    except Exception:
-                        pass
-                    return False
+                if self.main_window and getattr(self.main_window, "host_list", None):
+                    self.main_window.history.clear()
+                    self.main_window.host_list.load_hosts(self.parser.config.hosts)
+                    self.main_window._watch_config_files()
+            except Exception:
+                pass
+            return False
 
+        def reload_stale(paths):
+            try:
+                self.parser.discard_cached(paths)
+                if self.main_window:
+                    self.main_window._on_config_files_changed(paths)
+            except Exception as e:
+                logging.error(f"Failed to reload SSH config: {e}")
+            return False
+
+        def worker():
+            try:
+                if self.parser is None:
+                    return
+                if use_cache and self.parser.load_cached():
+                    GLib.idle_add(update_ui)
+                    stale = self.parser.confirm_cached()
+                    if stale:
+                        GLib.idle_add(reload_stale, stale)
+                    return
+                self.parser.parse(incremental=True)
                 GLib.idle_add(update_ui)
             except Exception as e:
                 logging.error(f"Failed to initialize SSH config parser: {e}")
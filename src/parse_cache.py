@@ -0,0 +1,85 @@
+"""Persistent cache of parsed SSH config files."""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import marshal
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Layout of the cache entries themselves; the parser version is part of each
+# entry's key.
+_FORMAT_VERSION = 1
+
+
+def default_cache_dir() -> Path:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return Path(base) / "ssh-studio" / "parse"
+
+
+class ParseCache:
+    """Stores one marshalled payload per source file.
+
+    An entry is only returned when the file's path, its ``(inode, mtime,
+    size)`` key and the parser version all match what was stored, so a
+    stale entry is simply ignored and replaced by the next :meth:`store`.
+    Payloads must consist of builtin types only. Failures never propagate:
+    a cache that cannot be read or written behaves as empty.
+    """
+
+    def __init__(self, parser_version: int, directory: Optional[Path] = None):
+        self.parser_version = parser_version
+        self.directory = Path(directory) if directory else default_cache_dir()
+
+    def _entry_path(self, path: Path) -> Path:
+        name = hashlib.sha256(os.fsencode(str(path))).hexdigest()[:32]
+        return self.directory / f"{name}.bin"
+
+    def load(self, path: Path, key: Tuple[int, int, int]) -> Optional[object]:
+        try:
+            with open(self._entry_path(path), "rb") as f:
+                data = f.read()
+            fmt, version, source, stored_key, payload = marshal.loads(data)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if (
+            fmt != _FORMAT_VERSION
+            or version != self.parser_version
+            or source != str(path)
+            or tuple(stored_key) != tuple(key)
+        ):
+            return None
+        return payload
+
+    def store(self, path: Path, key: Tuple[int, int, int], payload: object) -> None:
+        entry = (_FORMAT_VERSION, self.parser_version, str(path), tuple(key), payload)
+        tmp_path = None
+        try:
+            data = marshal.dumps(entry)
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._entry_path(path))
+            tmp_path = None
+        except (OSError, ValueError) as e:
+            logger.debug("Failed to cache parse of %s: %s", path, e)
+        finally:
+            if tmp_path is not None:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+
+    def discard(self, path: Path) -> None:
+        try:
+            os.unlink(self._entry_path(path))
+        except OSError:
+            pass
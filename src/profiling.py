@@ -0,0 +1,220 @@
+"""Opt-in timing instrumentation.
+
+Spans are recorded only when enabled, either through the
+``SSH_STUDIO_PROFILE`` environment variable or the preference. The recent
+durations of each span are kept for percentiles, the recent spans
+themselves can be exported as a Chrome trace file, and the next run of a
+chosen span can be captured with cProfile.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ENV_VAR = "SSH_STUDIO_PROFILE"
+
+# Durations kept per span name, and spans kept for trace export.
+_HISTORY = 256
+_TRACE_EVENTS = 4096
+
+_enabled = os.environ.get(ENV_VAR, "") not in ("", "0")
+_lock = threading.Lock()
+_durations: Dict[str, Deque[float]] = {}
+_events: Deque[Tuple[str, int, int, int]] = deque(maxlen=_TRACE_EVENTS)
+_armed: Dict[str, None] = {}
+_known: Dict[str, None] = {}
+_profiling = threading.local()
+last_profile: Optional[Path] = None
+
+
+@dataclass(slots=True)
+class SpanStats:
+    """Timings of one span name, in seconds."""
+
+    name: str
+    count: int
+    last: float
+    p50: float
+    p90: float
+    p99: float
+    max: float
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def set_enabled(enabled: bool) -> None:
+    """Turns recording on or off; the environment variable forces it on."""
+    global _enabled
+    _enabled = bool(enabled) or os.environ.get(ENV_VAR, "") not in ("", "0")
+
+
+def output_dir() -> Path:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return Path(base) / "ssh-studio" / "profiles"
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Records the duration of the enclosed block under ``name``."""
+    if not _enabled:
+        yield
+        return
+    profiler = None
+    if name in _armed and not getattr(_profiling, "active", False):
+        with _lock:
+            if name in _armed:
+                del _armed[name]
+                profiler = cProfile.Profile()
+    if profiler is not None:
+        try:
+            profiler.enable()
+            _profiling.active = True
+        except ValueError as e:
+            logger.warning("Cannot profile %s: %s", name, e)
+            profiler = None
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _profiling.active = False
+        elapsed = time.perf_counter_ns() - start
+        with _lock:
+            history = _durations.get(name)
+            if history is None:
+                history = _durations[name] = deque(maxlen=_HISTORY)
+            history.append(elapsed / 1e9)
+            _events.append((name, start, elapsed, threading.get_ident()))
+        if profiler is not None:
+            _dump_profile(name, profiler)
+
+
+def timed(name: str) -> Callable:
+    """Decorator recording every call of the function as span ``name``."""
+
+    _known[name] = None
+
+    def decorate(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def profile_next(name: str) -> None:
+    """Captures the next run of span ``name`` with cProfile; the stats are
+    written to :func:`output_dir` and the path stored in ``last_profile``."""
+    with _lock:
+        _armed[name] = None
+
+
+def known_spans() -> List[str]:
+    """Returns every span name declared with :func:`timed` or recorded."""
+    with _lock:
+        names = dict(_known)
+        names.update(dict.fromkeys(_durations))
+    return sorted(names)
+
+
+def armed() -> List[str]:
+    with _lock:
+        return list(_armed)
+
+
+def _dump_profile(name: str, profiler: cProfile.Profile) -> None:
+    global last_profile
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    path = output_dir() / f"{name}-{stamp}.prof"
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(str(path))
+        last_profile = path
+        logger.info("Profile of %s written to %s", name, path)
+    except OSError as e:
+        logger.warning("Failed to write profile of %s: %s", name, e)
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summary() -> List[SpanStats]:
+    """Returns the statistics of every span recorded so far, by name."""
+    with _lock:
+        snapshot = {name: list(values) for name, values in _durations.items()}
+    stats = []
+    for name in sorted(snapshot):
+        values = snapshot[name]
+        ordered = sorted(values)
+        stats.append(
+            SpanStats(
+                name=name,
+                count=len(values),
+                last=values[-1],
+                p50=_percentile(ordered, 0.50),
+                p90=_percentile(ordered, 0.90),
+                p99=_percentile(ordered, 0.99),
+                max=ordered[-1],
+            )
+        )
+    return stats
+
+
+def export_trace(path: Optional[Path] = None) -> Path:
+    """Writes the recent spans as a Chrome trace (chrome://tracing, Perfetto)
+    and returns the file written."""
+    if path is None:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = output_dir() / f"trace-{stamp}.json"
+    with _lock:
+        events = list(_events)
+    trace = {
+        "traceEvents": [
+            {
+                "name": name,
+                "ph": "X",
+                "ts": start / 1000,
+                "dur": elapsed / 1000,
+                "pid": os.getpid(),
+                "tid": tid,
+            }
+            for name, start, elapsed, tid in events
+        ],
+        "displayTimeUnit": "ms",
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(trace, f)
+    return path
+
+
+def clear() -> None:
+    with _lock:
+        _durations.clear()
+        _events.clear()
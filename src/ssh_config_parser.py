@@ -2,136 +2,1284 @@
 
 from __future__ import annotations
 
+import bisect
 import fnmatch
+import gc
+import getpass
 import glob
+import hashlib
 import logging
 import os
 import re
-import shutil
+import shlex
+import socket
 import stat
+import subprocess
+import sys
 import tempfile
-from dataclasses import dataclass, field
-from datetime import datetime
+from collections import Counter
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from difflib import SequenceMatcher
 from pathlib import Path
-from typing import List, Optional, Dict
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    TextIO,
+    Tuple,
+    Union,
+)
+
+try:
+    from ssh_studio.backup_store import BackupStore, Snapshot, default_backup_dir
+except ImportError:
+    from backup_store import BackupStore, Snapshot, default_backup_dir
+
+try:
+    from ssh_studio.parse_cache import ParseCache
+except ImportError:
+    from parse_cache import ParseCache
+
+try:
+    from ssh_studio.ssh_config_validator import (
+        ConfigValidator,
+        Diagnostic,
+        IdentityFileCache,
+    )
+except ImportError:
+    from ssh_config_validator import ConfigValidator, Diagnostic, IdentityFileCache
+
+try:
+    from ssh_studio import profiling
+except ImportError:
+    import profiling
+
+try:
+    from ssh_studio import ssh_config_tokenizer as tokenizer
+except ImportError:
+    import ssh_config_tokenizer as tokenizer
 
 logger = logging.getLogger(__name__)
 
+_MAX_INCLUDE_DEPTH = 16
+_INCLUDE_WORKERS = 8
+_MATCH_EXEC_TIMEOUT = 10
+
+# Bump whenever parsing produces different hosts for the same text, so
+# entries in the on-disk parse cache written by older versions are ignored.
+PARSER_VERSION = 2
 
-@dataclass
+# Keys whose values accumulate across matching blocks instead of the first
+# obtained value winning.
+_MULTI_VALUE_KEYS = frozenset(
+    {
+        "identityfile",
+        "certificatefile",
+        "localforward",
+        "remoteforward",
+        "dynamicforward",
+        "sendenv",
+    }
+)
+
+
+@dataclass(slots=True)
 class SSHOption:
     key: str
     value: str
     indentation: str = "    "
 
+    def __post_init__(self) -> None:
+        self.key = sys.intern(self.key)
+        self.indentation = sys.intern(self.indentation)
+
     def __str__(self) -> str:
         return f"{self.indentation}{self.key} {self.value}".rstrip()
 
 
-@dataclass
+_KEY_LOWER: Dict[str, str] = {}
+
+
+def _lower_key(key: str) -> str:
+    lowered = _KEY_LOWER.get(key)
+    if lowered is None:
+        lowered = _KEY_LOWER[key] = key.lower()
+    return lowered
+
+
+class _OptionList(list):
+    """List of options that notifies its owner (a host or the config) of
+    every mutation."""
+
+    __slots__ = ("_owner",)
+
+    def __init__(self, owner: Union["SSHHost", "SSHConfig"], options=()) -> None:
+        super().__init__(options)
+        self._owner = owner
+
+    def _changed(self) -> None:
+        self._owner._options_changed()
+
+    def append(self, option) -> None:
+        super().append(option)
+        self._changed()
+
+    def extend(self, options) -> None:
+        super().extend(options)
+        self._changed()
+
+    def insert(self, index, option) -> None:
+        super().insert(index, option)
+        self._changed()
+
+    def remove(self, option) -> None:
+        super().remove(option)
+        self._changed()
+
+    def pop(self, index=-1):
+        option = super().pop(index)
+        self._changed()
+        return option
+
+    def clear(self) -> None:
+        super().clear()
+        self._changed()
+
+    def sort(self, *args, **kwargs) -> None:
+        super().sort(*args, **kwargs)
+        self._changed()
+
+    def reverse(self) -> None:
+        super().reverse()
+        self._changed()
+
+    def __setitem__(self, index, value) -> None:
+        super().__setitem__(index, value)
+        self._changed()
+
+    def __delitem__(self, index) -> None:
+        super().__delitem__(index)
+        self._changed()
+
+    def __iadd__(self, options):
+        result = super().__iadd__(options)
+        self._changed()
+        return result
+
+
+def _stat_key(st: os.stat_result) -> Tuple[int, int, int]:
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _digest(content: str) -> bytes:
+    return hashlib.sha256(content.encode("utf-8")).digest()
+
+
+def _longest_increasing(values: List[int]) -> Set[int]:
+    """The values of one longest strictly increasing subsequence; for block
+    indices in output order, the blocks that kept their relative place."""
+    tails: List[int] = []
+    links: List[Optional[int]] = []
+    ends: List[int] = []
+    for n, value in enumerate(values):
+        at = bisect.bisect_left(tails, value)
+        if at == len(tails):
+            tails.append(value)
+            ends.append(n)
+        else:
+            tails[at] = value
+            ends[at] = n
+        links.append(ends[at - 1] if at else None)
+    result: Set[int] = set()
+    n = ends[-1] if ends else None
+    while n is not None:
+        result.add(values[n])
+        n = links[n]
+    return result
+
+
+def _is_include_line(line: str) -> bool:
+    return tokenizer.tokenize(line)[0] == tokenizer.INCLUDE
+
+
 class SSHHost:
-    patterns: List[str] = field(default_factory=list)
-    options: List[SSHOption] = field(default_factory=list)
-    start_line: int = -1
-    end_line: int = -1
-    raw_lines: List[str] = field(default_factory=list)
+    """A Host block.
+
+    ``source_file`` is set for hosts read from an included file and is
+    ``None`` for hosts of the main config. Hosts produced by the parser do
+    not copy their text: ``raw_lines`` is sliced on demand from the shared
+    file lines (``_source``) using the block's ``start_line``/``end_line``.
+    Assigning ``raw_lines`` detaches the host and stores its own copy.
+    """
+
+    __slots__ = (
+        "_owner",
+        "_option_index",
+        "_patterns",
+        "_options",
+        "_raw",
+        "_source",
+        "_parsed_fingerprint",
+        "start_line",
+        "end_line",
+        "source_file",
+    )
+
+    def __init__(
+        self,
+        patterns: Optional[List[str]] = None,
+        options: Optional[List[SSHOption]] = None,
+        start_line: int = -1,
+        end_line: int = -1,
+        raw_lines: Optional[List[str]] = None,
+        source_file: Optional[Path] = None,
+    ) -> None:
+        self._owner: Optional[SSHConfig] = None
+        self._option_index: Optional[Dict[str, List[int]]] = None
+        self._patterns: List[str] = patterns if patterns is not None else []
+        self._options = _OptionList(self, options or ())
+        self.start_line = start_line
+        self.end_line = end_line
+        self._raw: Optional[List[str]] = raw_lines
+        self._source: Optional[List[str]] = None
+        self._parsed_fingerprint: Optional[int] = None
+        self.source_file = source_file
+
+    @property
+    def patterns(self) -> List[str]:
+        return self._patterns
+
+    @patterns.setter
+    def patterns(self, patterns: List[str]) -> None:
+        previous = self._patterns
+        self._patterns = patterns
+        if self._owner is not None:
+            self._owner._reindex_host(self, previous)
+            self._owner._touch(self)
+
+    @property
+    def raw_lines(self) -> List[str]:
+        if self._raw is not None:
+            return self._raw
+        source = self._source
+        if source is not None and self.start_line >= 0:
+            return [
+                line
+                for line in source[self.start_line : self.end_line + 1]
+                if not _is_include_line(line)
+            ]
+        self._raw = []
+        return self._raw
+
+    @raw_lines.setter
+    def raw_lines(self, lines: List[str]) -> None:
+        self._raw = lines
+        self._source = None
+        if self._owner is not None:
+            self._owner._touch(self)
+
+    @property
+    def header(self) -> str:
+        return f"Host {' '.join(self._patterns)}"
+
+    @property
+    def options(self) -> List[SSHOption]:
+        return self._options
+
+    @options.setter
+    def options(self, options: List[SSHOption]) -> None:
+        self._options = _OptionList(self, options)
+        self._options_changed()
+
+    def _options_changed(self) -> None:
+        self._option_index = None
+        if self._owner is not None:
+            self._owner._touch(self)
+
+    def __repr__(self) -> str:
+        return (
+            f"SSHHost(patterns={self._patterns!r}, options={list(self._options)!r}, "
+            f"start_line={self.start_line!r}, end_line={self.end_line!r}, "
+            f"raw_lines={self.raw_lines!r})"
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, SSHHost):
+            return NotImplemented
+        return (
+            self._patterns == other._patterns
+            and list(self._options) == list(other._options)
+            and self.start_line == other.start_line
+            and self.end_line == other.end_line
+            and self.raw_lines == other.raw_lines
+        )
+
+    __hash__ = None
+
+    def __deepcopy__(self, memo) -> "SSHHost":
+        clone = type(self)(
+            patterns=list(self._patterns),
+            options=[
+                SSHOption(key=o.key, value=o.value, indentation=o.indentation)
+                for o in self._options
+            ],
+            start_line=self.start_line,
+            end_line=self.end_line,
+            raw_lines=list(self.raw_lines),
+            source_file=self.source_file,
+        )
+        clone._parsed_fingerprint = self._parsed_fingerprint
+        memo[id(self)] = clone
+        return clone
 
     @classmethod
     def from_raw_lines(cls, lines: List[str]) -> "SSHHost":
+        """Parses the text of one block; a ``Match`` header yields an
+        :class:`SSHMatch`."""
         host = cls()
         found_host_line = False
         for line in lines:
-            stripped = line.strip()
-            if not stripped or stripped.startswith("#"):
-                host.raw_lines.append(line)
-                continue
-
-            if stripped.lower().startswith("host ") and not found_host_line:
-                patterns = stripped.split(None, 1)[1].split()
-                host.patterns = patterns
-                host.raw_lines.append(line)
+            kind, key, value, indentation = tokenizer.tokenize(line)
+            if kind == tokenizer.HOST or kind == tokenizer.MATCH:
+                if found_host_line:
+                    raise ValueError(
+                        "Multiple Host declarations found within a single raw host block."
+                    )
+                words = tokenizer.split_words(value)
+                if kind == tokenizer.MATCH:
+                    host = SSHMatch(
+                        criteria=words,
+                        options=list(host.options),
+                        raw_lines=host.raw_lines,
+                    )
+                else:
+                    host.patterns = words
                 found_host_line = True
-                continue
-            elif stripped.lower().startswith("host ") and found_host_line:
-                raise ValueError(
-                    "Multiple Host declarations found within a single raw host block."
-                )
-
-            m = re.match(r"^(\S+)\s+(.+)$", stripped)
-            if m:
-                key, value = m.group(1), m.group(2)
-                indentation = line[: len(line) - len(line.lstrip())]
+            elif kind == tokenizer.OPTION or kind == tokenizer.INCLUDE:
                 host.options.append(
                     SSHOption(key=key, value=value, indentation=indentation)
                 )
-                host.raw_lines.append(line)
-            else:
-                host.raw_lines.append(line)
+            host.raw_lines.append(line)
 
         if not found_host_line:
             raise ValueError("No Host declaration found in raw host block.")
 
         return host
 
+    def _fingerprint(self) -> int:
+        # Hosts parsed from a file they keep a reference to have no text of
+        # their own; once raw_lines is set, that text is part of the host.
+        raw = self._raw
+        return hash(
+            (
+                self.header,
+                tuple((o.key, o.value, o.indentation) for o in self._options),
+                tuple(raw) if raw is not None else None,
+            )
+        )
+
+    def _index(self) -> Dict[str, List[int]]:
+        index = self._option_index
+        if index is None:
+            index = {}
+            for i, opt in enumerate(self._options):
+                index.setdefault(_lower_key(opt.key), []).append(i)
+            self._option_index = index
+        return index
+
     def get_option(self, key: str) -> Optional[str]:
-        for opt in self.options:
-            if opt.key.lower() == key.lower():
-                return opt.value
+        positions = self._index().get(_lower_key(key))
+        if positions:
+            return self._options[positions[0]].value
         return None
 
     def set_option(self, key: str, value: str) -> None:
-        for opt in self.options:
-            if opt.key.lower() == key.lower():
-                opt.value = value
-                return
-        self.options.append(SSHOption(key=key, value=value))
+        index = self._index()
+        lowered = _lower_key(key)
+        positions = index.get(lowered)
+        if positions:
+            self._options[positions[0]].value = value
+        else:
+            list.append(self._options, SSHOption(key=key, value=value))
+            index[lowered] = [len(self._options) - 1]
+        if self._owner is not None:
+            self._owner._touch(self)
 
     def remove_option(self, key: str) -> bool:
-        for i, opt in enumerate(self.options):
-            if opt.key.lower() == key.lower():
-                del self.options[i]
-                return True
+        positions = self._index().get(_lower_key(key))
+        if not positions:
+            return False
+        del self._options[positions[0]]
+        return True
+
+
+class SSHMatch(SSHHost):
+    """A Match block.
+
+    ``criteria`` holds the words following ``Match``. The block has no Host
+    patterns, so it is never found by alias; it is matched by
+    :class:`HostMatcher` when resolving effective options.
+    """
+
+    __slots__ = ("criteria",)
+
+    def __init__(self, criteria: Optional[List[str]] = None, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.criteria: List[str] = criteria if criteria is not None else []
+
+    @property
+    def header(self) -> str:
+        return f"Match {' '.join(self.criteria)}"
+
+    def __repr__(self) -> str:
+        return f"SSHMatch(criteria={self.criteria!r}, " + super().__repr__()[8:]
+
+    def __eq__(self, other: object) -> bool:
+        result = super().__eq__(other)
+        if result is not True:
+            return result
+        return isinstance(other, SSHMatch) and self.criteria == other.criteria
+
+    __hash__ = None
+
+    def __deepcopy__(self, memo) -> "SSHMatch":
+        clone = super().__deepcopy__(memo)
+        clone.criteria = list(self.criteria)
+        return clone
+
+
+class _HostList(list):
+    """List of a config's hosts that keeps the alias index in step with
+    insertions, removals and reorders."""
+
+    __slots__ = ("_config",)
+
+    def __init__(self, config: "SSHConfig", hosts=()) -> None:
+        super().__init__(hosts)
+        self._config = config
+        for host in self:
+            host._owner = config
+
+    def _adopt(self, hosts) -> None:
+        for host in hosts:
+            host._owner = self._config
+
+    def _release(self, hosts) -> None:
+        for host in hosts:
+            if host._owner is self._config:
+                host._owner = None
+
+    def _changed(self, added=()) -> None:
+        self._config._alias_index = None
+        self._config._matcher = None
+        self._config._structure_changed(added)
+
+    def append(self, host) -> None:
+        super().append(host)
+        host._owner = self._config
+        self._config._index_host(host)
+        self._config._structure_changed((host,))
+
+    def extend(self, hosts) -> None:
+        hosts = list(hosts)
+        super().extend(hosts)
+        self._adopt(hosts)
+        for host in hosts:
+            self._config._index_host(host)
+        self._config._structure_changed(hosts)
+
+    def insert(self, index, host) -> None:
+        at_end = index >= len(self)
+        super().insert(index, host)
+        host._owner = self._config
+        if at_end:
+            self._config._index_host(host)
+        else:
+            self._config._index_host(host, only_if_new=True)
+        self._config._structure_changed((host,))
+
+    def remove(self, host) -> None:
+        for i, candidate in enumerate(self):
+            if candidate is host:
+                del self[i]
+                return
+        del self[super().index(host)]
+
+    def pop(self, index=-1):
+        host = super().pop(index)
+        self._release([host])
+        self._config._unindex_host(host, host.patterns)
+        self._config._structure_changed()
+        return host
+
+    def clear(self) -> None:
+        self._release(self)
+        super().clear()
+        self._changed()
+
+    def sort(self, *args, **kwargs) -> None:
+        super().sort(*args, **kwargs)
+        self._changed()
+
+    def reverse(self) -> None:
+        super().reverse()
+        self._changed()
+
+    def __setitem__(self, index, value) -> None:
+        if isinstance(index, slice):
+            value = list(value)
+            removed, added = self[index], value
+        else:
+            removed, added = [self[index]], [value]
+        self._release(removed)
+        super().__setitem__(index, value)
+        self._adopt(added)
+        self._changed(added)
+
+    def __delitem__(self, index) -> None:
+        removed = self[index] if isinstance(index, slice) else [self[index]]
+        super().__delitem__(index)
+        self._release(removed)
+        if isinstance(index, slice):
+            self._changed()
+        else:
+            self._config._unindex_host(removed[0], removed[0].patterns)
+            self._config._structure_changed()
+
+    def __iadd__(self, hosts):
+        self.extend(hosts)
+        return self
+
+
+@dataclass(slots=True)
+class BatchEdit:
+    """One operation of :meth:`SSHConfigParser.apply_batch`.
+
+    ``op`` is ``"set"`` (give ``key`` the value ``value``, adding it when
+    missing), ``"remove"`` (drop every ``key`` option) or ``"rename"``
+    (rename every ``key`` option to ``value``, keeping its value).
+    """
+
+    op: str
+    key: str
+    value: str = ""
+
+
+# A host, glob or predicate choosing the hosts a batch applies to.
+HostSelector = Union[str, Callable[[SSHHost], bool], Iterable[SSHHost]]
+
+
+@dataclass(slots=True)
+class IncludedFile:
+    """An included config file parsed into hosts.
+
+    ``includes`` holds the file's own Include directives as
+    ``(line_no, argument)`` pairs.
+    """
+
+    path: Path
+    lines: List[str]
+    global_options: List[SSHOption]
+    hosts: List[SSHHost]
+    includes: List[Tuple[int, str]]
+
+
+def _encode_parsed(
+    lines: List[str],
+    digest: bytes,
+    global_options: List[SSHOption],
+    hosts: List[SSHHost],
+    includes: List[Tuple[int, str]],
+) -> tuple:
+    """Flattens the parse of one file into builtin types for the parse cache."""
+    return (
+        lines,
+        digest,
+        tuple((o.key, o.value, o.indentation) for o in global_options),
+        [
+            (
+                isinstance(h, SSHMatch),
+                h.criteria if isinstance(h, SSHMatch) else h.patterns,
+                h.start_line,
+                h.end_line,
+                tuple((o.key, o.value, o.indentation) for o in h.options),
+            )
+            for h in hosts
+        ],
+        includes,
+    )
+
+
+def _decode_parsed(payload: tuple, source_file: Optional[Path] = None) -> tuple:
+    """Rebuilds ``(lines, digest, global_options, hosts, includes)`` from
+    :func:`_encode_parsed`; hosts reference ``lines`` for their text.
+
+    The option tuples are stored in the layout :meth:`SSHHost._fingerprint`
+    hashes, so the parsed fingerprint is taken from them directly.
+    """
+    lines, digest, global_options, blocks, includes = payload
+    hosts: List[SSHHost] = []
+    append = hosts.append
+    for is_match, words, start, end, options in blocks:
+        if is_match:
+            host: SSHHost = SSHMatch(criteria=words)
+            header = f"Match {' '.join(words)}"
+        else:
+            host = SSHHost(patterns=words)
+            header = f"Host {' '.join(words)}"
+        list.extend(host._options, [SSHOption(*o) for o in options])
+        host.start_line = start
+        host.end_line = end
+        host.source_file = source_file
+        host._source = lines
+        host._parsed_fingerprint = hash((header, options, None))
+        append(host)
+    return (
+        lines,
+        digest,
+        [SSHOption(*o) for o in global_options],
+        hosts,
+        [tuple(item) for item in includes],
+    )
+
+
+def _pattern_regex(pattern: str) -> str:
+    return re.escape(pattern).replace(r"\*", ".*").replace(r"\?", ".")
+
+
+def _compile_pattern_list(
+    text: str, lower: bool
+) -> Tuple[Optional[re.Pattern], Optional[re.Pattern]]:
+    """Compiles a comma-separated pattern list such as ``web*,!web-old`` into
+    a regex for its plain patterns and one for its negated patterns."""
+    positive: List[str] = []
+    negative: List[str] = []
+    for pattern in text.split(","):
+        pattern = pattern.strip()
+        if lower:
+            pattern = pattern.lower()
+        if pattern.startswith("!"):
+            negative.append(_pattern_regex(pattern[1:]))
+        elif pattern:
+            positive.append(_pattern_regex(pattern))
+
+    def build(parts: List[str]) -> Optional[re.Pattern]:
+        if not parts:
+            return None
+        return re.compile(f"(?:{'|'.join(parts)})\\Z", re.DOTALL)
+
+    return build(positive), build(negative)
+
+
+def _match_pattern_list(
+    compiled: Tuple[Optional[re.Pattern], Optional[re.Pattern]], value: str
+) -> bool:
+    positive, negative = compiled
+    if negative is not None and negative.match(value):
         return False
+    return positive is not None and positive.match(value) is not None
+
+
+def _compile_criteria(words: List[str]) -> List[Tuple[str, bool, object]]:
+    """Turns the words of a Match line into ``(keyword, negated, argument)``
+    triples; pattern-list arguments are compiled up front."""
+    text = " ".join(words)
+    try:
+        tokens = shlex.split(text)
+    except ValueError:
+        tokens = text.split()
+    criteria: List[Tuple[str, bool, object]] = []
+    i = 0
+    while i < len(tokens):
+        word = tokens[i]
+        i += 1
+        negated = word.startswith("!")
+        keyword = word.lstrip("!").lower()
+        if keyword in ("all", "canonical", "final"):
+            criteria.append((keyword, negated, None))
+            continue
+        arg = tokens[i] if i < len(tokens) else ""
+        i += 1
+        if keyword in ("host", "originalhost", "tagged"):
+            criteria.append((keyword, negated, _compile_pattern_list(arg, True)))
+        elif keyword in ("user", "localuser"):
+            criteria.append((keyword, negated, _compile_pattern_list(arg, False)))
+        else:
+            criteria.append((keyword, negated, arg))
+    return criteria
+
+
+def _local_user() -> str:
+    try:
+        return getpass.getuser()
+    except Exception:
+        return ""
+
+
+def _expand_tokens(text: str, tokens: Dict[str, str]) -> str:
+    return re.sub(r"%(.)", lambda m: tokens.get(m.group(1), m.group(0)), text)
+
+
+class _Wildcard:
+    """A wildcard Host pattern of a HostMatcher, split into its literal
+    prefix, its literal suffix and the part from the first wildcard to the
+    last, which is only compiled once a hostname has the right ends."""
+
+    __slots__ = ("head", "tail", "middle", "targets", "_match")
+
+    def __init__(self, pattern: str, targets: List[Tuple[int, bool]]) -> None:
+        self.head = re.match(r"[^*?]*", pattern).group()
+        self.tail = re.search(r"[^*?]*\Z", pattern).group()
+        self.middle = pattern[len(self.head) : len(pattern) - len(self.tail)]
+        self.targets = targets
+        self._match: Optional[Callable[[str], Optional[re.Match]]] = None
+
+    def matches(self, name: str) -> bool:
+        if len(name) < len(self.head) + len(self.tail):
+            return False
+        if not (name.startswith(self.head) and name.endswith(self.tail)):
+            return False
+        if self.middle == "*":
+            return True
+        if self._match is None:
+            self._match = re.compile(_pattern_regex(self.middle), re.DOTALL).fullmatch
+        middle = name[len(self.head) : len(name) - len(self.tail)]
+        return self._match(middle) is not None
+
+
+class HostMatcher:
+    """Finds the blocks that apply to a hostname.
+
+    ``blocks`` is a list of ``(block, options)`` in config order, where
+    ``block`` is the Host or Match block the options are conditional on, or
+    ``None`` for options that always apply. Host patterns are indexed once:
+    literal aliases go into a dict, and wildcard patterns are filed under
+    their literal prefix, or else their literal suffix, so a lookup only
+    tries the patterns filed under the hostname's own prefixes and
+    suffixes plus those with neither. Matching is case-insensitive and a
+    Host block matches when one of its patterns matches and none of its
+    negated (``!``) patterns do.
+
+    Match criteria are only evaluated when a lookup reaches a Match block
+    that could still contribute an option, and stop at the first failing
+    criterion. Results are memoized per lookup; ``exec`` results are kept
+    in ``exec_cache`` keyed by the expanded command.
+    """
+
+    __slots__ = (
+        "blocks",
+        "exec_cache",
+        "_always",
+        "_literals",
+        "_by_head",
+        "_by_tail",
+        "_unanchored",
+        "_head_sizes",
+        "_tail_sizes",
+        "_criteria",
+        "_has_final",
+    )
+
+    def __init__(
+        self,
+        blocks: List[Tuple[Optional[SSHHost], List[SSHOption]]],
+        exec_cache: Optional[Dict[str, bool]] = None,
+    ) -> None:
+        self.blocks = blocks
+        self.exec_cache: Dict[str, bool] = exec_cache if exec_cache is not None else {}
+        self._always: List[int] = []
+        self._literals: Dict[str, List[Tuple[int, bool]]] = {}
+        self._criteria: Dict[int, List[Tuple[str, bool, object]]] = {}
+        compiled: Dict[int, List[Tuple[str, bool, object]]] = {}
+        wildcards: Dict[str, List[Tuple[int, bool]]] = {}
+        for i, (block, _) in enumerate(blocks):
+            if block is None:
+                self._always.append(i)
+                continue
+            if isinstance(block, SSHMatch):
+                criteria = compiled.get(id(block))
+                if criteria is None:
+                    criteria = compiled[id(block)] = _compile_criteria(block.criteria)
+                self._criteria[i] = criteria
+                continue
+            for pattern in block.patterns:
+                negated = pattern.startswith("!")
+                if negated:
+                    pattern = pattern[1:]
+                pattern = pattern.lower()
+                if pattern == "*" and not negated:
+                    self._always.append(i)
+                elif "*" in pattern or "?" in pattern:
+                    wildcards.setdefault(pattern, []).append((i, negated))
+                else:
+                    self._literals.setdefault(pattern, []).append((i, negated))
+        self._by_head: Dict[str, List[_Wildcard]] = {}
+        self._by_tail: Dict[str, List[_Wildcard]] = {}
+        self._unanchored: List[_Wildcard] = []
+        for pattern, targets in wildcards.items():
+            wildcard = _Wildcard(pattern, targets)
+            if wildcard.head:
+                self._by_head.setdefault(wildcard.head, []).append(wildcard)
+            elif wildcard.tail:
+                self._by_tail.setdefault(wildcard.tail, []).append(wildcard)
+            else:
+                self._unanchored.append(wildcard)
+        # The distinct lengths of the literal ends, to slice the name with.
+        self._head_sizes = sorted({len(head) for head in self._by_head})
+        self._tail_sizes = sorted({len(tail) for tail in self._by_tail})
+        self._has_final = any(
+            keyword in ("canonical", "final")
+            for criteria in self._criteria.values()
+            for keyword, _, _ in criteria
+        )
+
+    def match(self, hostname: str) -> List[int]:
+        """Returns the indexes of the blocks that may apply in config order:
+        Host blocks whose patterns match and every Match block."""
+        name = hostname.lower()
+        positive = set(self._always)
+        positive.update(self._criteria)
+        negative = set()
+        hits = list(self._literals.get(name, ()))
+        candidates: List[_Wildcard] = list(self._unanchored)
+        for size in self._head_sizes:
+            if size > len(name):
+                break
+            candidates.extend(self._by_head.get(name[:size], ()))
+        for size in self._tail_sizes:
+            if size > len(name):
+                break
+            candidates.extend(self._by_tail.get(name[-size:], ()))
+        for wildcard in candidates:
+            if wildcard.matches(name):
+                hits.extend(wildcard.targets)
+        for i, negated in hits:
+            (negative if negated else positive).add(i)
+        return sorted(positive - negative)
+
+    def resolve(self, hostname: str) -> List[SSHOption]:
+        """Returns the options ``ssh`` would use for ``hostname``: the first
+        obtained value of each key, plus every distinct value of
+        accumulating keys such as IdentityFile and LocalForward.
+
+        When a Match block uses ``canonical`` or ``final``, the config is
+        applied a second time against the resolved HostName, as ``ssh``
+        does for its final pass.
+        """
+        original = hostname.lower()
+        seen = set()
+        accumulated = set()
+        values: Dict[str, str] = {}
+        result: List[SSHOption] = []
+        memo: Dict[Tuple, bool] = {}
+
+        def wanted(options: List[SSHOption]) -> bool:
+            for opt in options:
+                key = _lower_key(opt.key)
+                if key in _MULTI_VALUE_KEYS:
+                    if (key, opt.value) not in accumulated:
+                        return True
+                elif key not in seen:
+                    return True
+            return False
+
+        def apply(name: str, final: bool) -> None:
+            for i in self.match(name):
+                block, options = self.blocks[i]
+                criteria = self._criteria.get(i)
+                if criteria is not None:
+                    if not wanted(options):
+                        continue
+                    user = values.get("user") or _local_user()
+                    tag = values.get("tag", "")
+                    key = (id(block), name, final, user, tag)
+                    matched = memo.get(key)
+                    if matched is None:
+                        matched = memo[key] = self._evaluate(
+                            criteria, name, original, final, user, values
+                        )
+                    if not matched:
+                        continue
+                for opt in options:
+                    key = _lower_key(opt.key)
+                    if key in _MULTI_VALUE_KEYS:
+                        if (key, opt.value) not in accumulated:
+                            accumulated.add((key, opt.value))
+                            result.append(opt)
+                    elif key not in seen:
+                        seen.add(key)
+                        values[key] = opt.value
+                        result.append(opt)
+
+        apply(original, False)
+        if self._has_final:
+            target = values.get("hostname")
+            name = (
+                _expand_tokens(target, {"h": original, "%": "%"}).lower()
+                if target
+                else original
+            )
+            apply(name, True)
+        return result
+
+    def _evaluate(
+        self,
+        criteria: List[Tuple[str, bool, object]],
+        name: str,
+        original: str,
+        final: bool,
+        user: str,
+        values: Dict[str, str],
+    ) -> bool:
+        for keyword, negated, arg in criteria:
+            if keyword == "all":
+                matched = True
+            elif keyword in ("canonical", "final"):
+                matched = final
+            elif keyword == "host":
+                matched = _match_pattern_list(arg, name)
+            elif keyword == "originalhost":
+                matched = _match_pattern_list(arg, original)
+            elif keyword == "user":
+                matched = _match_pattern_list(arg, user)
+            elif keyword == "localuser":
+                matched = _match_pattern_list(arg, _local_user())
+            elif keyword == "tagged":
+                matched = _match_pattern_list(arg, values.get("tag", "").lower())
+            elif keyword == "exec":
+                matched = self._run_exec(
+                    _expand_tokens(
+                        arg,
+                        {
+                            "%": "%",
+                            "h": name,
+                            "n": original,
+                            "r": user,
+                            "u": _local_user(),
+                            "p": values.get("port", "22"),
+                            "d": str(Path.home()),
+                            "l": socket.gethostname(),
+                            "L": socket.gethostname().split(".")[0],
+                        },
+                    )
+                )
+            else:
+                logger.debug("Unsupported Match criterion: %s", keyword)
+                matched = False
+            if matched == negated:
+                return False
+        return True
+
+    def _run_exec(self, command: str) -> bool:
+        result = self.exec_cache.get(command)
+        if result is None:
+            try:
+                completed = subprocess.run(
+                    [os.environ.get("SHELL") or "/bin/sh", "-c", command],
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    timeout=_MATCH_EXEC_TIMEOUT,
+                )
+                result = completed.returncode == 0
+            except Exception as e:
+                logger.warning("Match exec failed for %r: %s", command, e)
+                result = False
+            self.exec_cache[command] = result
+        return result
 
 
-@dataclass
 class SSHConfig:
-    file_path: Path
-    hosts: List[SSHHost] = field(default_factory=list)
-    global_options: List[SSHOption] = field(default_factory=list)
-    include_directives: List[str] = field(default_factory=list)
-    includes_resolved: Dict[Path, List[str]] = field(default_factory=dict)
-    original_lines: List[str] = field(default_factory=list)
+    """The parsed main config.
 
-    def is_dirty(self) -> bool:
-        current_content_lines = []
-        for opt in self.global_options:
-            current_content_lines.append(str(opt))
-        if self.global_options and (
-            not current_content_lines or current_content_lines[-1].strip() != ""
-        ):
-            current_content_lines.append("")
-        for host in self.hosts:
-            current_content_lines.append(f"Host {' '.join(host.patterns)}")
-            for opt in host.options:
-                current_content_lines.append(str(opt))
-            current_content_lines.append("")
-        while current_content_lines and current_content_lines[-1] == "":
-            current_content_lines.pop()
-        for inc in self.include_directives:
-            current_content_lines.append(f"Include {inc}")
+    Mutations of hosts, their options and patterns, the host list and the
+    global options bump ``_generation`` and record the touched hosts, so
+    :meth:`is_dirty` and :meth:`changed_hosts` only look at what changed
+    since the config was last marked clean by the parser.
+    """
+
+    def __init__(
+        self,
+        file_path: Path,
+        hosts: Optional[List[SSHHost]] = None,
+        global_options: Optional[List[SSHOption]] = None,
+        include_directives: Optional[List[str]] = None,
+        includes_resolved: Optional[Dict[Path, List[str]]] = None,
+        original_lines: Optional[List[str]] = None,
+    ) -> None:
+        self.file_path = file_path
+        self._alias_index: Optional[Dict[str, List[SSHHost]]] = None
+        self._matcher: Optional[HostMatcher] = None
+        self._exec_cache: Dict[str, bool] = {}
+        self._listeners: List[Callable[[Optional[SSHHost]], None]] = []
+        self._hosts = _HostList(self, hosts or ())
+        self._global_options = _OptionList(self, global_options or ())
+        self._baseline: List[SSHHost] = []
+        self._baseline_globals: Optional[int] = None
+        self._dirty: Dict[int, SSHHost] = {id(h): h for h in self._hosts}
+        self._order_dirty = bool(self._hosts)
+        self._globals_dirty = bool(self._global_options)
+        self._generation = 0
+        self._clean_generation = -1
+        self.include_directives: List[str] = (
+            include_directives if include_directives is not None else []
+        )
+        self.includes_resolved: Dict[Path, List[str]] = (
+            includes_resolved if includes_resolved is not None else {}
+        )
+        self.original_lines: List[str] = (
+            original_lines if original_lines is not None else []
+        )
+        self.included_files: Dict[Path, IncludedFile] = {}
+        self.include_graph: Dict[Path, Dict[int, List[Path]]] = {}
+        self.included_hosts: List[SSHHost] = []
+
+    @property
+    def hosts(self) -> List[SSHHost]:
+        return self._hosts
+
+    @hosts.setter
+    def hosts(self, hosts: List[SSHHost]) -> None:
+        self._hosts._release(self._hosts)
+        self._hosts = _HostList(self, hosts)
+        self._alias_index = None
+        self._matcher = None
+        self._structure_changed(self._hosts)
+
+    @property
+    def global_options(self) -> List[SSHOption]:
+        return self._global_options
+
+    @global_options.setter
+    def global_options(self, options: List[SSHOption]) -> None:
+        self._global_options = _OptionList(self, options)
+        self._options_changed()
 
-        original_clean_lines = [line.rstrip("\n") for line in self.original_lines]
+    def __repr__(self) -> str:
+        return (
+            f"SSHConfig(file_path={self.file_path!r}, "
+            f"hosts=<{len(self._hosts)} hosts>, "
+            f"global_options={self.global_options!r}, "
+            f"include_directives={self.include_directives!r})"
+        )
+
+    def _aliases(self) -> Dict[str, List[SSHHost]]:
+        index = self._alias_index
+        if index is None:
+            index = {}
+            for host in self._hosts:
+                for pattern in host.patterns:
+                    bucket = index.get(pattern)
+                    if bucket is None:
+                        index[pattern] = [host]
+                    elif bucket[-1] is not host:
+                        bucket.append(host)
+            self._alias_index = index
+        return index
+
+    def _index_host(self, host: SSHHost, only_if_new: bool = False) -> None:
+        self._matcher = None
+        index = self._alias_index
+        if index is None:
+            return
+        for pattern in host.patterns:
+            bucket = index.get(pattern)
+            if bucket is None:
+                index[pattern] = [host]
+            elif only_if_new:
+                self._alias_index = None
+                return
+            elif bucket[-1] is not host:
+                bucket.append(host)
+
+    def _unindex_host(self, host: SSHHost, patterns: List[str]) -> None:
+        self._matcher = None
+        index = self._alias_index
+        if index is None:
+            return
+        for pattern in patterns:
+            bucket = index.get(pattern)
+            if not bucket:
+                continue
+            for i, candidate in enumerate(bucket):
+                if candidate is host:
+                    del bucket[i]
+                    break
+            if not bucket:
+                del index[pattern]
+
+    def _reindex_host(self, host: SSHHost, previous: List[str]) -> None:
+        self._unindex_host(host, previous)
+        self._index_host(host, only_if_new=True)
+
+    def _host_matcher(self) -> HostMatcher:
+        matcher = self._matcher
+        if matcher is None:
+            blocks: List[Tuple[Optional[SSHHost], List[SSHOption]]] = [
+                (None, self.global_options)
+            ]
+            for source, host, enclosing in self._walk_include_graph(
+                self.file_path, self._hosts
+            ):
+                if host is not None:
+                    blocks.append((host, host.options))
+                    continue
+                included = self.included_files[source]
+                if included.global_options:
+                    blocks.append((enclosing, included.global_options))
+            matcher = self._matcher = HostMatcher(blocks, self._exec_cache)
+        return matcher
+
+    def effective_options(self, hostname: str) -> List[SSHOption]:
+        """Returns the options that apply to ``hostname``, like ``ssh -G``.
+
+        Host and Match blocks from the config and its includes are matched
+        against the name with first-match-wins semantics; the returned
+        options are the config's own objects in the order they were
+        obtained. ``exec`` criteria run at most once per command for the
+        lifetime of the config.
+        """
+        return self._host_matcher().resolve(hostname)
+
+    def effective_option(self, hostname: str, key: str) -> Optional[str]:
+        lowered = _lower_key(key)
+        for opt in self.effective_options(hostname):
+            if _lower_key(opt.key) == lowered:
+                return opt.value
+        return None
+
+    def _walk_include_graph(
+        self,
+        path: Path,
+        hosts: List[SSHHost],
+        stack: Tuple[Path, ...] = (),
+        enclosing: Optional[SSHHost] = None,
+    ) -> Iterator[Tuple[Path, Optional[SSHHost], Optional[SSHHost]]]:
+        """Yields ``(file, host, enclosing)`` in the order OpenSSH reads the
+        config, expanding each Include directive at its position among the
+        file's hosts.
+
+        Entering an included file yields ``(file, None, enclosing)`` first,
+        ``enclosing`` being the Host block the Include sits in, which the
+        file's leading options are conditional on.
+        """
+        stack = stack + (path,)
+        edges = sorted(self.include_graph.get(path, {}).items())
+        pos = 0
+
+        def expand(
+            targets: List[Path], current: Optional[SSHHost]
+        ) -> Iterator[Tuple[Path, Optional[SSHHost], Optional[SSHHost]]]:
+            for target in targets:
+                if target in stack:
+                    logger.warning(
+                        "Include cycle detected: %s includes %s", path, target
+                    )
+                    continue
+                if len(stack) > _MAX_INCLUDE_DEPTH:
+                    logger.warning("Include depth exceeded at %s", target)
+                    continue
+                included = self.included_files.get(target)
+                if included is not None:
+                    yield target, None, current
+                    yield from self._walk_include_graph(
+                        target, included.hosts, stack, current
+                    )
+
+        current = enclosing
+        for host in hosts:
+            while pos < len(edges) and 0 <= edges[pos][0] < host.start_line:
+                yield from expand(edges[pos][1], current)
+                pos += 1
+            yield path, host, enclosing
+            current = host
+        for _, targets in edges[pos:]:
+            yield from expand(targets, current)
+
+    def add_listener(self, callback: Callable[[Optional[SSHHost]], None]) -> None:
+        """Registers ``callback`` to be called with a host whenever the host
+        is modified, and with ``None`` whenever the host list changes."""
+        self._listeners.append(callback)
 
-        while original_clean_lines and original_clean_lines[-1] == "":
-            original_clean_lines.pop()
+    def remove_listener(self, callback: Callable[[Optional[SSHHost]], None]) -> None:
+        try:
+            self._listeners.remove(callback)
+        except ValueError:
+            pass
+
+    def _touch(self, host: SSHHost) -> None:
+        self._generation += 1
+        self._dirty[id(host)] = host
+        for callback in self._listeners:
+            callback(host)
+
+    def _structure_changed(self, added: Iterable[SSHHost] = ()) -> None:
+        self._generation += 1
+        self._order_dirty = True
+        for host in added:
+            self._dirty[id(host)] = host
+        for callback in self._listeners:
+            callback(None)
+
+    def _options_changed(self) -> None:
+        self._generation += 1
+        self._globals_dirty = True
+
+    def _globals_fingerprint(self) -> int:
+        return hash(
+            tuple((o.key, o.value, o.indentation) for o in self._global_options)
+        )
+
+    def _mark_clean(self, baseline: List[SSHHost]) -> None:
+        """Records the current hosts and global options as the saved state."""
+        self._baseline = baseline
+        self._baseline_globals = self._globals_fingerprint()
+        self._dirty.clear()
+        self._order_dirty = False
+        self._globals_dirty = False
+        self._clean_generation = self._generation
 
-        return current_content_lines != original_clean_lines
+    def changed_hosts(self) -> List[SSHHost]:
+        """Returns the hosts added or modified since the config was last
+        parsed, in the order they were first touched."""
+        changed = []
+        for key, host in list(self._dirty.items()):
+            if host._owner is not self:
+                del self._dirty[key]
+            elif host._fingerprint() != host._parsed_fingerprint:
+                changed.append(host)
+            else:
+                del self._dirty[key]
+        return changed
+
+    def is_dirty(self) -> bool:
+        if self._generation == self._clean_generation:
+            return False
+        if self.changed_hosts():
+            return True
+        if self._order_dirty:
+            baseline = self._baseline
+            if len(baseline) != len(self._hosts) or any(
+                a is not b for a, b in zip(baseline, self._hosts)
+            ):
+                return True
+            self._order_dirty = False
+        if self._globals_dirty:
+            if self._globals_fingerprint() != self._baseline_globals:
+                return True
+            self._globals_dirty = False
+        self._clean_generation = self._generation
+        return False
 
     def get_host(self, alias: str) -> Optional[SSHHost]:
-        for h in self.hosts:
-            if alias in h.patterns:
-                return h
+        for host in self._aliases().get(alias, ()):
+            if alias in host.patterns:
+                return host
         return None
 
     def add_host(self, host: SSHHost) -> None:
@@ -145,192 +1293,915 @@ class SSHConfig:
             return False
 
 
+def _apply_edit(host: SSHHost, edit: BatchEdit) -> None:
+    lowered = _lower_key(edit.key)
+    if edit.op == "set":
+        host.set_option(edit.key, edit.value)
+    elif edit.op == "remove":
+        kept = [o for o in host.options if _lower_key(o.key) != lowered]
+        if len(kept) != len(host.options):
+            host.options = kept
+    else:
+        renamed = False
+        for option in host.options:
+            if _lower_key(option.key) == lowered:
+                option.key = sys.intern(edit.value)
+                renamed = True
+        if renamed:
+            host._options_changed()
+
+
 class SSHConfigParser:
     def __init__(self, config_path: Optional[Path] = None) -> None:
         self.config_path: Path = config_path or Path.home() / ".ssh" / "config"
         self.config: SSHConfig = SSHConfig(file_path=self.config_path)
-        self._have_backed_up_this_session: bool = False
         self.auto_backup_enabled: bool = True
         self.backup_dir: Optional[Path] = None
+        self.backup_max_count: Optional[int] = 50
+        self.backup_max_age_days: Optional[float] = None
+        self._backup_store: Optional[BackupStore] = None
+        self._blocks: List[SSHHost] = []
+        self._include_lines: List[Tuple[int, str]] = []
+        self._include_cache: Dict[
+            Path, Tuple[Tuple[int, int, int], IncludedFile]
+        ] = {}
+        # What the main config file held when last read or written: its stat
+        # identity, the digest of its text and the config generation that
+        # matches it.
+        self._disk_key: Optional[Tuple[int, int, int]] = None
+        self._disk_digest: Optional[bytes] = None
+        self._disk_generation: Optional[int] = None
+        self.identity_cache = IdentityFileCache()
+        self._validator: Optional[ConfigValidator] = None
+        # Set to None to disable the on-disk parse cache. ``_cached_key`` is
+        # the stat key the cache holds for the main config and
+        # ``_unconfirmed`` maps files filled in from the cache to the digest
+        # of the text they were parsed from.
+        self.parse_cache: Optional[ParseCache] = ParseCache(PARSER_VERSION)
+        self._cached_key: Optional[Tuple[int, int, int]] = None
+        self._unconfirmed: Dict[Path, bytes] = {}
+        # Absolute forms of the Include patterns expanded by the last
+        # include resolution.
+        self._include_patterns: Dict[str, None] = {}
 
-    def parse(self) -> SSHConfig:
+    @profiling.timed("parser.parse")
+    def parse(self, incremental: bool = False) -> SSHConfig:
         if not self.config_path.exists():
             logger.warning("SSH config file not found: %s", self.config_path)
             return self.config
 
         with self.config_path.open("r", encoding="utf-8") as f:
-            lines = f.readlines()
-        self.config.original_lines = [l.rstrip("\n") for l in lines]
+            disk_key = _stat_key(os.fstat(f.fileno()))
+            text = f.read()
+        lines = text.split("\n")
+        if lines[-1] == "":
+            lines.pop()
 
-        self._parse_main_lines(self.config.original_lines)
+        if (
+            incremental
+            and self.config.file_path == self.config_path
+            and self._blocks
+        ):
+            self._parse_incremental(lines)
+        else:
+            self.config.file_path = self.config_path
+            self.config.original_lines = lines
+            self._parse_main_lines(lines)
+        self.config._mark_clean(self._blocks)
+        self._disk_key = disk_key
+        self._disk_digest = _digest(text)
+        self._disk_generation = self.config._generation
+        self._unconfirmed.pop(self.config_path, None)
+        if self.parse_cache is not None and self._cached_key != disk_key:
+            self.parse_cache.store(
+                self.config_path,
+                disk_key,
+                _encode_parsed(
+                    lines,
+                    self._disk_digest,
+                    self.config.global_options,
+                    self._blocks,
+                    self._include_lines,
+                ),
+            )
+            self._cached_key = disk_key
         self._resolve_includes()
         return self.config
 
-    def write(self, backup: bool = True) -> None:
-        content = self._generate_content()
+    def load_cached(self) -> bool:
+        """Fills ``config`` from the on-disk parse cache without parsing.
 
-        if self.config_path.exists():
+        Returns ``False``, leaving the config untouched, when the cache has
+        no entry matching the main config's current ``(inode, mtime, size)``.
+        Included files are taken from the cache where possible and parsed
+        otherwise. Call :meth:`confirm_cached` afterwards, typically off the
+        main thread, to check the entries against the files' text.
+        """
+        if self.parse_cache is None:
+            return False
+        try:
+            disk_key = _stat_key(self.config_path.stat())
+        except OSError:
+            return False
+        # Unpacking creates every host at once; the cyclic collector would
+        # otherwise run repeatedly over objects that are all still alive.
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            payload = self.parse_cache.load(self.config_path, disk_key)
+            if payload is None:
+                return False
+            try:
+                lines, digest, global_options, hosts, includes = _decode_parsed(
+                    payload
+                )
+            except (TypeError, ValueError):
+                return False
+
+            self.config.file_path = self.config_path
+            self.config.original_lines = lines
+            self._apply_main_parse(global_options, hosts, includes)
+            self.config._mark_clean(self._blocks)
+            self._disk_key = self._cached_key = disk_key
+            self._disk_digest = digest
+            self._disk_generation = self.config._generation
+            self._unconfirmed[self.config_path] = digest
+            self._resolve_includes()
+        finally:
+            if collecting:
+                gc.enable()
+        return True
+
+    def confirm_cached(self) -> List[Path]:
+        """Re-reads the files that :meth:`load_cached` took from the cache
+        and compares their text with the digest stored alongside.
+
+        Returns the files whose text no longer matches. Only files are read
+        and the config is left as it is, so this can run off the main thread
+        while the cached config is in use; pass the result to
+        :meth:`discard_cached` on the thread that owns the config.
+        """
+        pending, self._unconfirmed = self._unconfirmed, {}
+        stale: List[Path] = []
+        for path, digest in pending.items():
+            try:
+                with path.open("r", encoding="utf-8") as f:
+                    text = f.read()
+            except OSError:
+                text = None
+            if text is None or _digest(text) != digest:
+                stale.append(path)
+        return stale
+
+    def discard_cached(self, paths: Iterable[Path]) -> None:
+        """Drops the cached results for ``paths`` so that the next
+        :meth:`refresh` re-reads those files and replaces them."""
+        for path in paths:
+            if self.parse_cache is not None:
+                self.parse_cache.discard(path)
+            self._include_cache.pop(path, None)
+            if path == self.config_path:
+                self._cached_key = self._disk_key = None
+
+    def refresh(self) -> List[Path]:
+        """Picks up changes made to the config files by other programs.
+
+        The main config is re-parsed incrementally only when its
+        ``(inode, mtime, size)`` differs from what was last read or written,
+        and included files are only read again when theirs differ. Returns
+        the files whose content changed, or that appeared or disappeared
+        from the include graph; an empty list means the config is as it was.
+        """
+        try:
+            disk_key = _stat_key(self.config_path.stat())
+        except OSError:
+            return []
+        changed: List[Path] = []
+        previous = self.config.included_files
+        if disk_key != self._disk_key:
+            digest = self._disk_digest
+            self.parse(incremental=True)
+            if self._disk_digest != digest:
+                changed.append(self.config_path)
+        else:
+            self._resolve_includes()
+        current = self.config.included_files
+        changed.extend(
+            path
+            for path in dict.fromkeys([*previous, *current])
+            if previous.get(path) is not current.get(path)
+        )
+        return changed
+
+    def watched_paths(self) -> Tuple[List[Path], List[str]]:
+        """Returns the files a change to which affects the config (the main
+        config and every resolved included file) and the absolute Include
+        patterns, whose directories must be watched for files that start or
+        stop matching."""
+        return (
+            [self.config_path, *self.config.included_files],
+            list(self._include_patterns),
+        )
+
+    def iter_hosts(
+        self, source: Optional[Union[Path, str, TextIO]] = None
+    ) -> Iterator[SSHHost]:
+        """Yields each Host block as soon as it ends, reading line by line.
+
+        ``source`` is a path or an open text stream (e.g. ``sys.stdin``) and
+        defaults to ``config_path``. Nothing is stored on ``self.config`` and
+        Include directives are not followed, so memory stays bounded by the
+        largest single block.
+        """
+        if source is None or isinstance(source, (str, Path)):
+            path = Path(source) if source is not None else self.config_path
+            with path.open("r", encoding="utf-8") as f:
+                yield from self._iter_stream_hosts(f)
+        else:
+            yield from self._iter_stream_hosts(source)
+
+    def _iter_stream_hosts(self, stream: TextIO) -> Iterator[SSHHost]:
+        lines = (line.rstrip("\n") for line in stream)
+        for kind, item in self._scan(lines):
+            if kind == "host":
+                yield item
+
+    def write(self, backup: bool = True, verify: bool = False) -> None:
+        """Writes the config if its content differs from the file.
+
+        When the file's stat identity still matches what was last read or
+        written, the check is done without reading it: nothing is generated
+        if the config has not changed since, otherwise only the digest of
+        the new content is compared. ``verify`` is passed to
+        :meth:`_atomic_write`.
+        """
+        generation = self.config._generation
+        try:
+            disk_key: Optional[Tuple[int, int, int]] = _stat_key(
+                self.config_path.stat()
+            )
+        except OSError:
+            disk_key = None
+        known = disk_key is not None and disk_key == self._disk_key
+        if known and generation == self._disk_generation:
+            return
+
+        content = self._generate_content()
+        digest = _digest(content)
+        if known:
+            if digest == self._disk_digest:
+                self._disk_generation = generation
+                return
+        elif disk_key is not None:
             try:
                 with self.config_path.open("r", encoding="utf-8") as f:
-                    current = f.read()
-                if current == content:
-                    return
+                    if _digest(f.read()) == digest:
+                        return
             except Exception:
                 pass
 
         effective_backup = (
             backup and self.auto_backup_enabled and self.config_path.exists()
         )
-        if effective_backup and not self._have_backed_up_this_session:
+        if effective_backup:
             self._backup_file()
-            self._have_backed_up_this_session = True
 
-        self._atomic_write(content)
+        self._atomic_write(content, verify=verify)
+        self._disk_generation = generation
+
+    @profiling.timed("parser.apply_batch")
+    def apply_batch(
+        self,
+        selector: HostSelector,
+        edits: Iterable[BatchEdit],
+        backup: bool = True,
+    ) -> List[SSHHost]:
+        """Applies ``edits`` to every main-config host chosen by ``selector``
+        and saves the result with one write and one incremental re-parse.
+
+        ``selector`` is a glob matched against the host patterns, a predicate
+        or the hosts themselves. Returns the hosts that changed, as re-parsed.
+        If the write fails the hosts get their previous options back and the
+        error is raised.
+
+        The write saves the whole config, so a config with unsaved changes
+        is refused with ``ValueError`` rather than saving them along.
+        """
+        edits = list(edits)
+        for edit in edits:
+            if edit.op not in ("set", "remove", "rename"):
+                raise ValueError(f"Unknown batch operation: {edit.op}")
+            if not edit.key or (edit.op != "remove" and not edit.value):
+                raise ValueError(f"Incomplete batch operation: {edit.op}")
+        if self.config.is_dirty():
+            raise ValueError("The config has unsaved changes; save them first")
+
+        if isinstance(selector, str):
+            selected = [
+                h
+                for h in self.config.hosts
+                if any(fnmatch.fnmatchcase(p, selector) for p in h.patterns)
+            ]
+        elif callable(selector):
+            selected = [h for h in self.config.hosts if selector(h)]
+        else:
+            wanted = {id(h) for h in selector}
+            selected = [h for h in self.config.hosts if id(h) in wanted]
+
+        saved: List[Tuple[SSHHost, List[SSHOption]]] = []
+        for host in selected:
+            before = [
+                SSHOption(key=o.key, value=o.value, indentation=o.indentation)
+                for o in host.options
+            ]
+            for edit in edits:
+                _apply_edit(host, edit)
+            if [(o.key, o.value) for o in host.options] != [
+                (o.key, o.value) for o in before
+            ]:
+                saved.append((host, before))
+        if not saved:
+            return []
+
+        # The config was clean, so each host is written as one block and
+        # comes back from the re-parse at the same position.
+        changed = {id(host) for host, _ in saved}
+        positions = [i for i, h in enumerate(self.config.hosts) if id(h) in changed]
+        try:
+            self.write(backup=backup)
+        except Exception:
+            for host, before in saved:
+                host.options = before
+            raise
+        self.parse(incremental=True)
+        hosts = self.config.hosts
+        return [hosts[i] for i in positions if i < len(hosts)]
 
     def validate(self) -> List[str]:
-        errors: List[str] = []
-        seen: Dict[str, SSHHost] = {}
-        for host in self.config.hosts:
-            for pat in host.patterns:
-                if pat in seen:
-                    errors.append(f"Duplicate host alias: {pat}")
-                else:
-                    seen[pat] = host
-        for host in self.config.hosts:
-            port = host.get_option("Port")
-            if port:
-                try:
-                    p = int(port)
-                    if p < 1 or p > 65535:
-                        errors.append(
-                            f"Invalid port for host {host.patterns[0]}: {port}"
-                        )
-                except ValueError:
-                    errors.append(
-                        f"Port is not an integer for host {host.patterns[0]}: {port}"
-                    )
-        for host in self.config.hosts:
-            ident = host.get_option("IdentityFile")
-            if ident:
-                path = Path(ident).expanduser()
-                if not path.is_absolute():
-                    path = Path.home() / ".ssh" / ident
-                if not path.exists():
-                    errors.append(
-                        f"IdentityFile not found for host {host.patterns[0]}: {ident}"
-                    )
-        return errors
+        return [d.message for d in self.diagnostics()]
+
+    def diagnostics(self) -> List[Diagnostic]:
+        """Returns the config's diagnostics, re-checking only the hosts that
+        changed since the last call."""
+        validator = self._validator
+        if validator is None or validator.config is not self.config:
+            validator = self._validator = ConfigValidator(
+                self.config, self.identity_cache
+            )
+        return validator.diagnostics()
 
     def _parse_main_lines(self, lines: List[str]) -> None:
-        self.config.hosts.clear()
-        self.config.global_options.clear()
-        self.config.include_directives.clear()
+        self._apply_main_parse(*self._parse_span(lines, 0, len(lines)))
 
-        current_host: Optional[SSHHost] = None
-        in_host = False
+    def _apply_main_parse(
+        self,
+        global_options: List[SSHOption],
+        hosts: List[SSHHost],
+        includes: List[Tuple[int, str]],
+    ) -> None:
+        self.config.global_options[:] = global_options
+        self.config.hosts[:] = hosts
+        self.config.include_directives[:] = [arg for _, arg in includes]
+        self._blocks = list(hosts)
+        self._include_lines = includes
 
-        for idx, line in enumerate(lines):
-            stripped = line.strip()
-            if not stripped or stripped.startswith("#"):
-                if in_host and current_host is not None:
-                    current_host.raw_lines.append(line)
-                continue
+    def _parse_incremental(self, lines: List[str]) -> None:
+        """Re-parse only the host blocks touched by the difference between
+        ``original_lines`` and ``lines``; untouched, unmodified hosts are kept."""
+        old = self.config.original_lines
+        blocks = self._blocks
+        n_old, n_new = len(old), len(lines)
+        limit = min(n_old, n_new)
+        prefix = 0
+        while prefix < limit and old[prefix] == lines[prefix]:
+            prefix += 1
+        suffix = 0
+        while (
+            suffix < limit - prefix
+            and old[n_old - 1 - suffix] == lines[n_new - 1 - suffix]
+        ):
+            suffix += 1
+        delta = n_new - n_old
 
-            if stripped.lower().startswith("include "):
-                include_arg = stripped.split(None, 1)[1]
-                self.config.include_directives.append(include_arg)
-                continue
+        if prefix == n_old == n_new:
+            i0 = i1 = len(blocks)
+            span_start = span_end_old = n_old
+        else:
+            starts = [h.start_line for h in blocks]
+            ends = [h.end_line for h in blocks]
+            i0 = bisect.bisect_left(ends, prefix - 1)
+            i1 = max(i0, bisect.bisect_left(starts, n_old - suffix))
+            span_start = blocks[i0].start_line if i0 > 0 else 0
+            span_end_old = blocks[i1].start_line if i1 < len(blocks) else n_old
 
-            if stripped.lower().startswith("host "):
-                if current_host is not None:
-                    current_host.end_line = idx - 1
-                    self.config.hosts.append(current_host)
-                patterns = stripped.split(None, 1)[1].split()
-                current_host = SSHHost(
-                    patterns=patterns, start_line=idx, raw_lines=[line]
-                )
-                in_host = True
-                continue
+        live = {id(h) for h in self.config.hosts}
+
+        def reuse(host: SSHHost, shift: int) -> SSHHost:
+            start, end = host.start_line + shift, host.end_line + shift
+            if id(host) in live and host._fingerprint() == host._parsed_fingerprint:
+                host.start_line, host.end_line = start, end
+                host._raw = None
+                host._source = lines
+                return host
+            _, fresh, _ = self._parse_span(lines, start, end + 1)
+            return fresh[0]
+
+        head = [reuse(h, 0) for h in blocks[:i0]]
+        tail = [reuse(h, delta) for h in blocks[i1:]]
+        span_globals, span_hosts, span_includes = self._parse_span(
+            lines, span_start, span_end_old + delta
+        )
 
-            m = re.match(r"^(\S+)\s+(.+)$", stripped)
-            if m:
-                key, value = m.group(1), m.group(2)
-                indentation = line[: len(line) - len(line.lstrip())]
+        first_block = blocks[0].start_line if blocks else n_old
+        includes = [
+            (idx, arg)
+            for idx, arg in self._include_lines
+            if first_block <= idx < span_start
+        ]
+        if span_start > 0:
+            span_globals, _, preamble_includes = self._parse_span(
+                lines, 0, first_block
+            )
+            includes = preamble_includes + includes
+        includes += span_includes
+        includes += [
+            (idx + delta, arg)
+            for idx, arg in self._include_lines
+            if idx >= span_end_old
+        ]
+
+        hosts = head + span_hosts + tail
+        self.config.original_lines = lines
+        self.config.global_options[:] = span_globals
+        self.config.hosts[:] = hosts
+        self.config.include_directives[:] = [arg for _, arg in includes]
+        self._blocks = list(hosts)
+        self._include_lines = includes
+
+    def _parse_span(
+        self, lines: List[str], start: int, end: int
+    ) -> Tuple[List[SSHOption], List[SSHHost], List[Tuple[int, str]]]:
+        global_options: List[SSHOption] = []
+        hosts: List[SSHHost] = []
+        includes: List[Tuple[int, str]] = []
+
+        for kind, item in self._scan(lines[start:end], start, source=lines):
+            if kind == "host":
+                item._parsed_fingerprint = item._fingerprint()
+                hosts.append(item)
+            elif kind == "option":
+                global_options.append(item)
+            else:
+                includes.append(item)
+        return global_options, hosts, includes
+
+    def _scan(
+        self,
+        lines: Iterable[str],
+        start: int = 0,
+        source: Optional[List[str]] = None,
+    ) -> Iterator[Tuple[str, object]]:
+        """Yields ``("option", SSHOption)`` for options before the first Host,
+        ``("include", (line_no, arg))`` for Include directives and
+        ``("host", SSHHost)`` for each Host or Match block once its last line
+        is read.
+
+        Hosts reference ``source`` for their text when given, otherwise they
+        keep their own ``raw_lines``.
+        """
+        current_host: Optional[SSHHost] = None
+        raw: Optional[List[str]] = None
+        idx = start - 1
+
+        tokenize = tokenizer.tokenize
+        for idx, line in enumerate(lines, start):
+            kind, key, value, indentation = tokenize(line)
+            if kind == tokenizer.OPTION:
                 opt = SSHOption(key=key, value=value, indentation=indentation)
-                if in_host and current_host is not None:
+                if current_host is not None:
                     current_host.options.append(opt)
-                    current_host.raw_lines.append(line)
                 else:
-                    self.config.global_options.append(opt)
+                    yield "option", opt
+            elif kind == tokenizer.INCLUDE:
+                yield "include", (idx, value)
                 continue
-
-            if in_host and current_host is not None:
-                current_host.raw_lines.append(line)
+            elif kind == tokenizer.HOST or kind == tokenizer.MATCH:
+                if current_host is not None:
+                    current_host.end_line = idx - 1
+                    yield "host", current_host
+                words = tokenizer.split_words(value)
+                if source is None:
+                    raw = [line]
+                if kind == tokenizer.HOST:
+                    current_host = SSHHost(
+                        patterns=words, start_line=idx, raw_lines=raw
+                    )
+                else:
+                    current_host = SSHMatch(
+                        criteria=words, start_line=idx, raw_lines=raw
+                    )
+                if source is not None:
+                    current_host._source = source
+                continue
+            if raw is not None:
+                raw.append(line)
 
         if current_host is not None:
-            current_host.end_line = len(lines) - 1
-            self.config.hosts.append(current_host)
+            current_host.end_line = idx
+            yield "host", current_host
 
+    @profiling.timed("parser.resolve_includes")
     def _resolve_includes(self) -> None:
-        resolved: Dict[Path, List[str]] = {}
-        base_dir = self.config_path.parent
-        for pattern in self.config.include_directives:
-            expanded = os.path.expanduser(pattern)
-            if not os.path.isabs(expanded):
-                expanded = str(base_dir / expanded)
+        """Builds the include graph of the config.
 
+        Every file reachable through Include directives (nested ones too) is
+        parsed into hosts tagged with ``source_file``. Parsed files are cached
+        by ``(inode, mtime, size)`` so unchanged fragments are not read again,
+        and the files discovered at each nesting level are loaded in a thread
+        pool. ``include_graph`` maps each file to ``{line_no: [paths]}`` for
+        its directives; ``included_hosts`` lists included hosts in the order
+        OpenSSH would see them, skipping include cycles.
+        """
+        root = self.config_path
+        graph: Dict[Path, Dict[int, List[Path]]] = {}
+        files: Dict[Path, IncludedFile] = {}
+        self._include_patterns = {}
+        directives = {root: self._include_lines}
+        depth = 0
+        while directives and depth < _MAX_INCLUDE_DEPTH:
+            wanted: List[Path] = []
+            for path, includes in directives.items():
+                edges: Dict[int, List[Path]] = {}
+                for line_no, arg in includes:
+                    targets = self._expand_include(arg)
+                    edges.setdefault(line_no, []).extend(targets)
+                    wanted.extend(
+                        t for t in targets if t not in files and t not in graph
+                    )
+                graph[path] = edges
+            loaded = self._load_included_files(list(dict.fromkeys(wanted)))
+            files.update(loaded)
+            directives = {
+                path: inc.includes for path, inc in loaded.items() if path not in graph
+            }
+            depth += 1
+
+        self._include_cache = {
+            path: entry
+            for path, entry in self._include_cache.items()
+            if path in files
+        }
+        previous = self.config.included_files
+        if (
+            graph == self.config.include_graph
+            and files.keys() == previous.keys()
+            and all(files[path] is previous[path] for path in files)
+        ):
+            return
+        self.config.included_files = files
+        self.config.include_graph = graph
+        self.config.includes_resolved = {path: inc.lines for path, inc in files.items()}
+        self.config._matcher = None
+        self.config.included_hosts = [
+            host
+            for source, host, _ in self.config._walk_include_graph(
+                root, self.config.hosts
+            )
+            if host is not None and source is not root
+        ]
+
+    def _expand_include(self, pattern: str) -> List[Path]:
+        matches: List[str] = []
+        for word in pattern.split():
+            expanded = os.path.expanduser(word)
+            if not os.path.isabs(expanded):
+                expanded = str(self.config_path.parent / expanded)
+            self._include_patterns[expanded] = None
             try:
-                matches = glob.glob(expanded, recursive=False)
-                if not matches and "**" in expanded:
-                    matches = glob.glob(expanded, recursive=True)
+                found = glob.glob(expanded, recursive=False)
+                if not found and "**" in expanded:
+                    found = glob.glob(expanded, recursive=True)
             except Exception:
-                matches = []
+                found = []
+            matches.extend(sorted(found))
+        return [Path(m) for m in matches if os.path.isfile(m)]
 
-            for path_str in matches:
-                p = Path(path_str)
+    def _load_included_files(self, paths: List[Path]) -> Dict[Path, IncludedFile]:
+        loaded: Dict[Path, IncludedFile] = {}
+        misses: List[Tuple[Path, Tuple[int, int, int]]] = []
+        for path in paths:
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            key = _stat_key(st)
+            cached = self._include_cache.get(path)
+            if cached is not None and cached[0] == key:
+                loaded[path] = cached[1]
+            else:
+                misses.append((path, key))
+
+        if len(misses) > 1:
+            workers = min(_INCLUDE_WORKERS, len(misses))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(lambda m: self._read_included(*m), misses))
+        else:
+            results = [self._read_included(path, key) for path, key in misses]
+
+        for (path, key), included in zip(misses, results):
+            if included is None:
+                continue
+            self._include_cache[path] = (key, included)
+            loaded[path] = included
+        return loaded
+
+    def _read_included(
+        self, path: Path, key: Optional[Tuple[int, int, int]] = None
+    ) -> Optional[IncludedFile]:
+        cache = self.parse_cache
+        if cache is not None and key is not None:
+            payload = cache.load(path, key)
+            if payload is not None:
                 try:
-                    with p.open("r", encoding="utf-8") as f:
-                        resolved[p] = f.readlines()
-                except Exception:
-                    continue
+                    lines, digest, global_options, hosts, includes = _decode_parsed(
+                        payload, source_file=path
+                    )
+                except (TypeError, ValueError):
+                    pass
+                else:
+                    self._unconfirmed[path] = digest
+                    return IncludedFile(path, lines, global_options, hosts, includes)
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                text = f.read()
+        except Exception as e:
+            logger.warning("Failed to read included file %s: %s", path, e)
+            return None
+        lines = text.split("\n")
+        if lines[-1] == "":
+            lines.pop()
+        global_options, hosts, includes = self._parse_span(lines, 0, len(lines))
+        for host in hosts:
+            host.source_file = path
+        if cache is not None and key is not None:
+            cache.store(
+                path,
+                key,
+                _encode_parsed(lines, _digest(text), global_options, hosts, includes),
+            )
+        return IncludedFile(path, lines, global_options, hosts, includes)
+
+    @property
+    def backup_store(self) -> BackupStore:
+        """The store backups go to: ``backup_dir`` when set, otherwise the
+        default directory under the user config dir. Follows changes of
+        ``backup_dir`` and of the retention settings."""
+        directory = (
+            Path(self.backup_dir).expanduser()
+            if self.backup_dir
+            else default_backup_dir()
+        )
+        store = self._backup_store
+        if store is None or store.directory != directory:
+            store = self._backup_store = BackupStore(directory)
+        store.max_count = self.backup_max_count
+        store.max_age_days = self.backup_max_age_days
+        return store
+
+    def list_backups(self) -> List[Snapshot]:
+        """Returns the backups of the main config, newest first."""
+        return self.backup_store.snapshots(self.config_path)
+
+    def read_backup(self, snapshot: Snapshot) -> str:
+        return self.backup_store.read(snapshot).decode("utf-8")
 
-        self.config.includes_resolved = resolved
+    def restore_backup(self, snapshot: Snapshot) -> SSHConfig:
+        """Replaces the main config with the content of ``snapshot`` and
+        reloads it incrementally. The current content is backed up first, so
+        a restore can itself be undone."""
+        content = self.read_backup(snapshot)
+        if self.config_path.exists():
+            self._backup_file()
+        self._atomic_write(content)
+        return self.parse(incremental=True)
 
     def _backup_file(self) -> None:
-        ts = datetime.now().strftime("%Y%m%d-%H%M%S")
-        if self.backup_dir:
-            target_dir = Path(self.backup_dir).expanduser()
-        else:
-            target_dir = self.config_path.parent
-        try:
-            target_dir.mkdir(parents=True, exist_ok=True)
-        except Exception:
-            target_dir = self.config_path.parent
-        backup = (target_dir / self.config_path.name).with_suffix(f".{ts}.bak")
         try:
-            shutil.copy2(self.config_path, backup)
-            logger.info("Backup created: %s", backup)
+            snapshot = self.backup_store.add(self.config_path)
+            logger.info("Backup recorded: %s", snapshot.digest[:12])
         except Exception as e:
             logger.warning("Failed to create backup: %s", e)
 
     def _generate_content(self) -> str:
-        lines: List[str] = []
-        for opt in self.config.global_options:
-            lines.append(str(opt))
-        if self.config.global_options and (not lines or lines[-1] != ""):
-            lines.append("")
-        for host in self.config.hosts:
-            lines.append(f"Host {' '.join(host.patterns)}")
-            for opt in host.options:
-                lines.append(str(opt))
-            lines.append("")
-        while lines and lines[-1] == "":
-            lines.pop()
-        for inc in self.config.include_directives:
-            lines.append(f"Include {inc}")
-        return "\n".join(lines) + "\n"
+        """Renders the config by splicing edits into ``original_lines``.
+
+        Hosts parsed from the file that are unchanged are copied verbatim,
+        with their comments, blank lines and Include directives. Edited
+        hosts and the global options are patched option by option so the
+        lines around them stay in place, and only new hosts are rendered
+        from scratch. Blocks are emitted in ``config.hosts`` order, so
+        removing or moving a host removes or moves its whole line range,
+        including the comment lines directly above its Host line.
+
+        Include directives are not part of a host and stay where they were:
+        those inside the range of a removed or moved block are written
+        after the nearest preceding block that kept its place (or after the
+        global options). Directives dropped from ``include_directives`` are
+        left out, and new ones are appended at the end.
+        """
+        config = self.config
+        original = config.original_lines
+        blocks = self._blocks
+        leads = []
+        for block in blocks:
+            lead = block.start_line
+            while lead > 0 and original[lead - 1].lstrip().startswith("#"):
+                lead -= 1
+            leads.append(lead)
+        leads.append(len(original))
+        first = leads[0]
+        # Hosts are matched to their block by identity only: undo puts the
+        # parsed objects themselves back, and any other host is new.
+        by_id = {id(b): k for k, b in enumerate(blocks)}
+        plan: List[Tuple[SSHHost, Optional[int]]] = [
+            (host, by_id.get(id(host))) for host in config.hosts
+        ]
+        in_place: Optional[Set[int]] = None
+
+        wanted = Counter(config.include_directives)
+        dropped = set()
+        # Include lines of removed or moved blocks, by the in-place block
+        # (-1 for the global options) they now follow.
+        anchored: Dict[int, List[str]] = {}
+        for idx, arg in self._include_lines:
+            if wanted[arg] <= 0:
+                dropped.add(idx)
+                continue
+            wanted[arg] -= 1
+            owner = bisect.bisect_right(leads, idx) - 1 if idx >= first else -1
+            if owner == -1:
+                continue
+            if in_place is None:
+                order = [k for _, k in plan if k is not None]
+                if all(a < b for a, b in zip(order, order[1:])):
+                    in_place = set(order)
+                else:
+                    in_place = _longest_increasing(order)
+            if owner in in_place:
+                continue
+            dropped.add(idx)
+            anchor = owner - 1
+            while anchor >= 0 and anchor not in in_place:
+                anchor -= 1
+            anchored.setdefault(anchor, []).append(original[idx])
+
+        def chunk(start: int, end: int) -> List[str]:
+            if dropped and any(start <= i < end for i in dropped):
+                return [
+                    line
+                    for i, line in enumerate(original[start:end], start)
+                    if i not in dropped
+                ]
+            return original[start:end]
+
+        out: List[str] = []
+        previous: Optional[int] = None
+
+        def emit(lines: List[str], block: Optional[int]) -> None:
+            nonlocal previous
+            adjacent = block is not None and previous == block - 1
+            if lines and out and out[-1].strip() and not adjacent:
+                out.append("")
+            out.extend(lines)
+            previous = block
 
-    def _atomic_write(self, content: str) -> None:
+        preamble, changed = self._splice(chunk(0, first), None, config.global_options)
+        emit(preamble, None if changed else -1)
+        out.extend(anchored.get(-1, ()))
+
+        for host, k in plan:
+            if k is None:
+                emit([host.header] + [str(o) for o in host.options], None)
+                continue
+            block = k
+            start = blocks[k].start_line
+            if host is blocks[k] and host._fingerprint() == host._parsed_fingerprint:
+                emit(chunk(leads[k], leads[k + 1]), k)
+            else:
+                lead = chunk(leads[k], start)
+                lines = chunk(start, leads[k + 1])
+                spliced, changed = self._splice(lines, host.header, host.options)
+                if host._raw is not None and self._raw_matches(host):
+                    spliced = host._raw + [l for l in lines if _is_include_line(l)]
+                    k = None
+                emit(lead + spliced, k)
+            if anchored and block in anchored:
+                out.extend(anchored[block])
+
+        out.extend(f"Include {arg}" for arg in wanted.elements())
+        # A removed last block leaves the separator that preceded it behind.
+        def blank_tail(lines: List[str]) -> int:
+            n = 0
+            while n < len(lines) and not lines[-1 - n].strip():
+                n += 1
+            return n
+
+        for _ in range(blank_tail(out) - blank_tail(original)):
+            out.pop()
+        return "\n".join(out) + "\n"
+
+    def _splice(
+        self, lines: List[str], header: Optional[str], options: List[SSHOption]
+    ) -> Tuple[List[str], bool]:
+        """Rewrites the option lines of ``lines`` to match ``options``.
+
+        ``lines`` is a block's original text starting at its Host/Match line,
+        or the preamble when ``header`` is ``None``. Options are diffed against
+        the ones found in the text: matching lines are kept as they are,
+        changed ones are replaced where they stood and new ones follow the
+        last option, indented like the block's existing options. Returns the
+        lines and whether anything changed.
+        """
+        result: List[str] = []
+        changed = False
+        body = 0
+        if header is not None:
+            first = lines[0] if lines else ""
+            _, key, value, _ = tokenizer.tokenize(first)
+            wanted = header.split()
+            if (
+                key.lower() == wanted[0].lower()
+                and tokenizer.split_words(value) == wanted[1:]
+            ):
+                result.append(first)
+            else:
+                result.append(first[: len(first) - len(first.lstrip())] + header)
+                changed = True
+            body = 1
+
+        positions: List[int] = []
+        found: List[Tuple[str, str, str]] = []
+        for i in range(body, len(lines)):
+            kind, key, value, indentation = tokenizer.tokenize(lines[i])
+            if kind == tokenizer.OPTION:
+                positions.append(i)
+                found.append((key, value, indentation))
+        current = [(o.key, o.value, o.indentation) for o in options]
+        if found == current:
+            result.extend(lines[body:])
+            return result, changed
+
+        indent = found[0][2] if found else None
+
+        def render(option: SSHOption) -> str:
+            if indent is None:
+                return str(option)
+            return f"{indent}{option.key} {option.value}".rstrip()
+
+        before: Dict[int, List[str]] = {}
+        removed = set()
+        matcher = SequenceMatcher(None, found, current, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                continue
+            removed.update(range(i1, i2))
+            before.setdefault(i1, []).extend(render(o) for o in options[j1:j2])
+        appended = before.pop(len(found), [])
+        anchor = positions[-1] if positions else body - 1
+        at = {line_no: n for n, line_no in enumerate(positions)}
+
+        if anchor < body:
+            result.extend(appended)
+        for i in range(body, len(lines)):
+            n = at.get(i)
+            if n is not None:
+                result.extend(before.get(n, ()))
+                if n not in removed:
+                    result.append(lines[i])
+            else:
+                result.append(lines[i])
+            if i == anchor:
+                result.extend(appended)
+        return result, True
+
+    def _raw_matches(self, host: SSHHost) -> bool:
+        try:
+            parsed = SSHHost.from_raw_lines(host._raw)
+        except ValueError:
+            return False
+        return parsed.header == host.header and [
+            (o.key, o.value) for o in parsed.options
+        ] == [(o.key, o.value) for o in host.options]
+
+    def _atomic_write(self, content: str, verify: bool = False) -> None:
+        """Replaces the config file with ``content`` through a temporary file.
+
+        With ``verify`` the temporary file is read back after its fsync and
+        compared by digest before it replaces the config, and the directory
+        is synced after the rename; a mismatch raises ``OSError`` and leaves
+        the config untouched.
+        """
+        digest = _digest(content)
         tmp = tempfile.NamedTemporaryFile(
             mode="w",
             encoding="utf-8",
@@ -343,12 +2214,24 @@ class SSHConfigParser:
             tmp.flush()
             os.fsync(tmp.fileno())
             tmp.close()
+            if verify:
+                with tmp_path.open("r", encoding="utf-8") as f:
+                    if _digest(f.read()) != digest:
+                        raise OSError(f"Verification failed writing {self.config_path}")
             if self.config_path.exists():
                 st = self.config_path.stat()
                 os.chmod(tmp_path, stat.S_IMODE(st.st_mode))
             else:
                 os.chmod(tmp_path, 0o600)
             os.replace(tmp_path, self.config_path)
+            if verify:
+                dir_fd = os.open(self.config_path.parent, os.O_RDONLY)
+                try:
+                    os.fsync(dir_fd)
+                finally:
+                    os.close(dir_fd)
+            self._disk_key = _stat_key(self.config_path.stat())
+            self._disk_digest = digest
         except Exception:
             try:
                 tmp.close()
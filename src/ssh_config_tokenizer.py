@@ -0,0 +1,122 @@
+"""Splits ssh_config lines into a kind, a keyword and its value."""
+
+from __future__ import annotations
+
+import sys
+from typing import Dict, List, Tuple
+
+BLANK = 0
+COMMENT = 1
+HOST = 2
+MATCH = 3
+INCLUDE = 4
+OPTION = 5
+# A keyword with nothing after it (or only a comment); ignored by the parser.
+INVALID = 6
+
+_KEYWORD_KINDS = {"host": HOST, "match": MATCH, "include": INCLUDE}
+
+# ``(kind, key, value, indentation)``; key, value and indentation are empty
+# for blank and comment lines.
+Token = Tuple[int, str, str, str]
+
+_BLANK: Token = (BLANK, "", "", "")
+_COMMENT: Token = (COMMENT, "", "", "")
+_KINDS: Dict[str, int] = {}
+
+# Tokens of recently seen lines. Configs repeat many lines verbatim
+# ("    User deploy", "    ForwardAgent yes"), and tokens are immutable, so
+# repeats share one tuple. Cleared when full rather than evicted one by one.
+_CACHE_SIZE = 8192
+_cache: Dict[str, Token] = {}
+
+
+def tokenize(line: str) -> Token:
+    """Classifies one line and splits it into keyword and value.
+
+    The keyword is separated from the value by whitespace and/or a single
+    ``=`` (``Port 22``, ``Port=22``, ``Port = 22``). The value is kept as
+    written, quotes included, minus an unquoted trailing ``#`` comment that
+    starts a word.
+    """
+    token = _cache.get(line)
+    if token is None:
+        if len(_cache) >= _CACHE_SIZE:
+            _cache.clear()
+        token = _cache[line] = _tokenize(line)
+    return token
+
+
+def _tokenize(line: str) -> Token:
+    stripped = line.strip()
+    if not stripped:
+        return _BLANK
+    first = stripped[0]
+    if first == "#":
+        return _COMMENT
+    indentation = "" if line[0] == first else line[: line.index(first)]
+
+    parts = stripped.split(None, 1)
+    key = parts[0]
+    if len(parts) == 2:
+        rest = parts[1]
+        if "=" in key:
+            key, _, tail = key.partition("=")
+            rest = (tail + " " + rest).lstrip()
+        elif rest[0] == "=":
+            rest = rest[1:].lstrip()
+    elif "=" in key:
+        key, _, rest = key.partition("=")
+        rest = rest.lstrip()
+    else:
+        return (INVALID, key, "", indentation)
+
+    if "#" in rest:
+        rest = _strip_comment(rest)
+    if not key or not rest:
+        return (INVALID, key, "", indentation)
+    kind = _KINDS.get(key)
+    if kind is None:
+        kind = _KINDS[sys.intern(key)] = _KEYWORD_KINDS.get(key.lower(), OPTION)
+    return (kind, key, rest, indentation)
+
+
+def _strip_comment(value: str) -> str:
+    quote = ""
+    previous = " "
+    for i, ch in enumerate(value):
+        if quote:
+            if ch == quote:
+                quote = ""
+        elif ch == '"' or ch == "'":
+            quote = ch
+        elif ch == "#" and previous in " \t":
+            return value[:i].rstrip()
+        previous = ch
+    return value
+
+
+def split_words(value: str) -> List[str]:
+    """Splits a value on whitespace outside quotes; quotes are kept."""
+    if '"' not in value and "'" not in value:
+        return value.split()
+    words: List[str] = []
+    word: List[str] = []
+    quote = ""
+    for ch in value:
+        if quote:
+            word.append(ch)
+            if ch == quote:
+                quote = ""
+        elif ch == '"' or ch == "'":
+            quote = ch
+            word.append(ch)
+        elif ch in " \t":
+            if word:
+                words.append("".join(word))
+                word = []
+        else:
+            word.append(ch)
+    if word:
+        words.append("".join(word))
+    return words
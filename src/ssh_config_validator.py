@@ -0,0 +1,278 @@
+"""Validates SSH configurations incrementally."""
+
+from __future__ import annotations
+
+import getpass
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    from ssh_config_parser import SSHConfig, SSHHost
+
+SEVERITY_ERROR = "error"
+SEVERITY_WARNING = "warning"
+
+_STAT_WORKERS = 16
+
+
+def _local_user() -> str:
+    try:
+        return getpass.getuser()
+    except Exception:
+        return ""
+
+
+_IDENTITY_PATHS: Dict[str, Optional[Path]] = {}
+
+
+def _identity_path(value: str) -> Optional[Path]:
+    """Returns the file an IdentityFile value points to, or ``None`` when it
+    cannot be checked (``none`` or tokens only known at connect time)."""
+    try:
+        return _IDENTITY_PATHS[value]
+    except KeyError:
+        path = _IDENTITY_PATHS[value] = _resolve_identity_path(value)
+        return path
+
+
+def _resolve_identity_path(value: str) -> Optional[Path]:
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        value = value[1:-1]
+    if not value or value.lower() == "none":
+        return None
+    value = value.replace("%d", str(Path.home())).replace("%u", _local_user())
+    if "%" in value.replace("%%", "") or "${" in value:
+        return None
+    value = value.replace("%%", "%")
+    path = Path(value).expanduser()
+    if not path.is_absolute():
+        path = Path.home() / ".ssh" / value
+    return path
+
+
+class IdentityFileCache:
+    """Remembers for the session whether IdentityFile paths exist.
+
+    Unknown paths are deduplicated and stat-ed concurrently in a bounded
+    thread pool. Entries stay valid until :meth:`invalidate` is called for
+    the path or its directory, which the UI does from a directory monitor on
+    :meth:`directories`. ``generation`` counts invalidations so that users
+    of the cache know when to look again.
+    """
+
+    def __init__(self, workers: int = _STAT_WORKERS) -> None:
+        self.workers = workers
+        self.generation = 0
+        self._exists: Dict[Path, bool] = {}
+        self._by_dir: Dict[Path, set] = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, paths: Iterable[Path]) -> Dict[Path, bool]:
+        wanted = list(dict.fromkeys(paths))
+        with self._lock:
+            missing = [p for p in wanted if p not in self._exists]
+        if len(missing) > 1:
+            with ThreadPoolExecutor(
+                max_workers=min(self.workers, len(missing))
+            ) as pool:
+                found = list(pool.map(os.path.exists, missing))
+        else:
+            found = [os.path.exists(p) for p in missing]
+        with self._lock:
+            for path, exists in zip(missing, found):
+                self._exists[path] = exists
+                self._by_dir.setdefault(path.parent, set()).add(path)
+            return {p: self._exists.get(p, False) for p in wanted}
+
+    def invalidate(self, path: Optional[Path] = None) -> None:
+        """Forgets ``path`` and, if it is a watched directory, everything in
+        it; forgets everything when ``path`` is ``None``."""
+        with self._lock:
+            self.generation += 1
+            if path is None:
+                self._exists.clear()
+                self._by_dir.clear()
+                return
+            self._exists.pop(path, None)
+            siblings = self._by_dir.get(path.parent)
+            if siblings is not None:
+                siblings.discard(path)
+            for child in self._by_dir.pop(path, ()):
+                self._exists.pop(child, None)
+
+    def directories(self) -> List[Path]:
+        with self._lock:
+            return list(self._by_dir)
+
+
+@dataclass(slots=True)
+class Diagnostic:
+    """A validation finding. ``host`` is ``None`` for config-wide findings
+    and ``option`` names the offending option, if any."""
+
+    host: Optional["SSHHost"]
+    option: Optional[str]
+    severity: str
+    message: str
+
+    def __str__(self) -> str:
+        return self.message
+
+
+def _label(host: "SSHHost") -> str:
+    return host.patterns[0] if host.patterns else host.header
+
+
+class ConfigValidator:
+    """Keeps the diagnostics of a config up to date incrementally.
+
+    The validator listens to the config's change notifications. Each call to
+    :meth:`diagnostics` re-checks only the hosts that were modified or added
+    since the previous call, and recomputes duplicate-alias findings only
+    for the aliases those hosts had or have now, using the config's alias
+    index as the alias to hosts multimap. Hosts whose fingerprint did not
+    change are skipped, so re-parsing an unchanged file costs no checks.
+    """
+
+    def __init__(self, config: "SSHConfig", identity_cache: IdentityFileCache) -> None:
+        self.config = config
+        self.identity_cache = identity_cache
+        self._known: Dict[int, Tuple["SSHHost", int, Tuple[str, ...]]] = {}
+        self._host_diagnostics: Dict[int, List[Diagnostic]] = {}
+        self._alias_diagnostics: Dict[str, List[Diagnostic]] = {}
+        self._touched: Dict[int, "SSHHost"] = {}
+        self._structure_changed = True
+        self._identity_generation: Optional[int] = None
+        config.add_listener(self._on_change)
+
+    def _on_change(self, host: Optional["SSHHost"]) -> None:
+        if host is None:
+            self._structure_changed = True
+        else:
+            self._touched[id(host)] = host
+
+    def diagnostics(self) -> List[Diagnostic]:
+        self._update()
+        result = [d for ds in self._alias_diagnostics.values() for d in ds]
+        per_host = [d for ds in self._host_diagnostics.values() for d in ds]
+        result.extend(d for d in per_host if d.option == "Port")
+        result.extend(d for d in per_host if d.option != "Port")
+        return result
+
+    def _update(self) -> None:
+        config = self.config
+        changed: Dict[int, "SSHHost"] = {}
+        aliases: Set[str] = set()
+
+        if self._structure_changed:
+            self._structure_changed = False
+            current = {id(h): h for h in config.hosts}
+            for key in [k for k in self._known if k not in current]:
+                _, _, patterns = self._known.pop(key)
+                self._host_diagnostics.pop(key, None)
+                aliases.update(patterns)
+            for key, host in current.items():
+                if key not in self._known:
+                    changed[key] = host
+
+        touched, self._touched = self._touched, {}
+        for key, host in touched.items():
+            if host._owner is config:
+                changed[key] = host
+
+        forced: Set[int] = set()
+        if self.identity_cache.generation != self._identity_generation:
+            self._identity_generation = self.identity_cache.generation
+            for key, (host, _, _) in self._known.items():
+                if "identityfile" in host._index():
+                    forced.add(key)
+                    changed.setdefault(key, host)
+
+        pending: List[Tuple[int, "SSHHost"]] = []
+        for key, host in changed.items():
+            fingerprint = host._fingerprint()
+            patterns = tuple(host.patterns)
+            previous = self._known.get(key)
+            if previous is not None:
+                if previous[1] == fingerprint and key not in forced:
+                    continue
+                if previous[2] != patterns:
+                    aliases.update(previous[2])
+                    aliases.update(patterns)
+            else:
+                aliases.update(patterns)
+            self._known[key] = (host, fingerprint, patterns)
+            pending.append((key, host))
+
+        self._check_hosts(pending)
+        self._check_aliases(aliases)
+
+    def _check_hosts(self, hosts: List[Tuple[int, "SSHHost"]]) -> None:
+        identities: List[Tuple[int, "SSHHost", str, Path]] = []
+        for key, host in hosts:
+            found: List[Diagnostic] = []
+            port = host.get_option("Port")
+            if port:
+                try:
+                    p = int(port)
+                    if p < 1 or p > 65535:
+                        found.append(
+                            Diagnostic(
+                                host,
+                                "Port",
+                                SEVERITY_ERROR,
+                                f"Invalid port for host {_label(host)}: {port}",
+                            )
+                        )
+                except ValueError:
+                    found.append(
+                        Diagnostic(
+                            host,
+                            "Port",
+                            SEVERITY_ERROR,
+                            f"Port is not an integer for host {_label(host)}: {port}",
+                        )
+                    )
+            if found:
+                self._host_diagnostics[key] = found
+            else:
+                self._host_diagnostics.pop(key, None)
+            for position in host._index().get("identityfile", ()):
+                ident = host.options[position].value
+                path = _identity_path(ident)
+                if path is not None:
+                    identities.append((key, host, ident, path))
+
+        exists = self.identity_cache.lookup(path for _, _, _, path in identities)
+        for key, host, ident, path in identities:
+            if not exists[path]:
+                self._host_diagnostics.setdefault(key, []).append(
+                    Diagnostic(
+                        host,
+                        "IdentityFile",
+                        SEVERITY_WARNING,
+                        f"IdentityFile not found for host {_label(host)}: {ident}",
+                    )
+                )
+
+    def _check_aliases(self, aliases: Iterable[str]) -> None:
+        index = self.config._aliases()
+        for alias in aliases:
+            bucket = [h for h in index.get(alias, ()) if alias in h.patterns]
+            if len(bucket) > 1:
+                self._alias_diagnostics[alias] = [
+                    Diagnostic(
+                        host,
+                        None,
+                        SEVERITY_WARNING,
+                        f"Duplicate host alias: {alias}",
+                    )
+                    for host in bucket[1:]
+                ]
+            else:
+                self._alias_diagnostics.pop(alias, None)
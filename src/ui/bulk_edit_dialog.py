@@ -0,0 +1,87 @@
+import gi
+
+gi.require_version("Gtk", "4.0")
+gi.require_version("Adw", "1")
+from gi.repository import Gtk, Adw, Gdk
+from gettext import gettext as _, ngettext
+
+try:
+    from ssh_studio.ssh_config_parser import BatchEdit
+except ImportError:
+    from ssh_config_parser import BatchEdit
+
+_OPS = ("set", "remove", "rename")
+
+
+@Gtk.Template(resource_path="/io/github/BuddySirJava/SSH-Studio/ui/bulk_edit_dialog.ui")
+class BulkEditDialog(Adw.Dialog):
+    """Sets, removes or renames one option on several hosts at once."""
+
+    __gtype_name__ = "BulkEditDialog"
+
+    toast_overlay = Gtk.Template.Child()
+    group = Gtk.Template.Child()
+    op_row = Gtk.Template.Child()
+    key_row = Gtk.Template.Child()
+    value_row = Gtk.Template.Child()
+    cancel_btn = Gtk.Template.Child()
+    apply_btn = Gtk.Template.Child()
+
+    def __init__(self, parent, hosts):
+        super().__init__()
+        self._parent = parent
+        self.hosts = list(hosts)
+        self.group.set_description(
+            ngettext(
+                "Applies to {n} selected host", "Applies to {n} selected hosts",
+                len(self.hosts),
+            ).format(n=len(self.hosts))
+        )
+        self.op_row.set_model(
+            Gtk.StringList.new([_("Set Value"), _("Remove Option"), _("Rename Option")])
+        )
+        self.op_row.set_selected(0)
+        self.cancel_btn.connect("clicked", lambda *_: self.close())
+        self.op_row.connect("notify::selected", self._on_changed)
+        self.key_row.connect("changed", self._on_changed)
+        self.value_row.connect("changed", self._on_changed)
+
+        key_controller = Gtk.EventControllerKey.new()
+        key_controller.connect("key-pressed", self._on_key_pressed)
+        self.add_controller(key_controller)
+        self._on_changed()
+
+    def _on_key_pressed(self, controller, keyval, keycode, state):
+        if keyval == Gdk.KEY_Escape:
+            self.close()
+            return True
+        return False
+
+    def _on_changed(self, *args):
+        op = self._selected_op()
+        self.value_row.set_visible(op != "remove")
+        self.value_row.set_title(_("New Name") if op == "rename" else _("Value"))
+        self.apply_btn.set_sensitive(self.get_edit() is not None)
+
+    def _selected_op(self) -> str:
+        index = self.op_row.get_selected()
+        return _OPS[index] if index < len(_OPS) else _OPS[0]
+
+    def get_edit(self):
+        """The edit described by the form, or ``None`` while incomplete."""
+        op = self._selected_op()
+        key = self.key_row.get_text().strip()
+        value = self.value_row.get_text().strip() if op != "remove" else ""
+        if not key or any(c.isspace() for c in key):
+            return None
+        if op != "remove" and not value:
+            return None
+        if op == "rename" and any(c.isspace() for c in value):
+            return None
+        return BatchEdit(op=op, key=key, value=value)
+
+    def show_error(self, message: str):
+        try:
+            self.toast_overlay.add_toast(Adw.Toast.new(message))
+        except Exception:
+            pass
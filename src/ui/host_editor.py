@@ -5,13 +5,19 @@ gi.require_version("GtkSource", "5")
 from gi.repository import Gtk, GObject, Gdk, GLib, Adw, GtkSource
 
 try:
-    from ssh_studio.ssh_config_parser import SSHHost, SSHOption
+    from ssh_studio.ssh_config_parser import SSHHost, SSHMatch, SSHOption
     from ssh_studio.ui.test_connection_dialog import TestConnectionDialog
 except ImportError:
-    from ssh_config_parser import SSHHost, SSHOption
+    from ssh_config_parser import SSHHost, SSHMatch, SSHOption
     from ui.test_connection_dialog import TestConnectionDialog
+
+try:
+    from ssh_studio import profiling
+    from ssh_studio.edit_history import HostState
+except ImportError:
+    import profiling
+    from edit_history import HostState
 import difflib
-import copy
 from gettext import gettext as _
 import os
 
@@ -77,6 +83,7 @@ class HostEditor(Gtk.Box):
         self.set_visible(False)
         self.app = None
         self.current_host = None
+        self.original_host_state = None
         self.is_loading = False
         self._programmatic_raw_update = False
         self._editor_valid = True
@@ -134,7 +141,7 @@ class HostEditor(Gtk.Box):
             return True
 
         if keyval == Gdk.KEY_z and (state & Gdk.ModifierType.CONTROL_MASK):
-            # TODO: Implement undo functionality (Im bored)
+            # Undo and redo are handled by the main window's history.
             return False
 
         if keyval == Gdk.KEY_Escape:
@@ -453,11 +460,23 @@ class HostEditor(Gtk.Box):
         except Exception:
             pass
 
+    def rebind_host(self, host: SSHHost):
+        """Swap the edited host for an equal object, e.g. the one a re-parse
+        after saving produced, without reloading the fields."""
+        if host is None or host is self.current_host:
+            return
+        self.current_host = host
+        self.original_host_state = HostState.of(host)
+
     def load_host(self, host: SSHHost):
         self.is_loading = True
         self._touched_options.clear()
+        history = getattr(self.app, "history", None)
+        if history is not None:
+            history.commit()
+            history.track(host)
         self.current_host = host
-        self.original_host_state = copy.deepcopy(host)
+        self.original_host_state = HostState.of(host) if host else None
 
         if not host:
             self._clear_all_fields()
@@ -820,8 +839,8 @@ class HostEditor(Gtk.Box):
         """Generates raw lines for the current host based on its structured data."""
         lines = []
         if self.current_host:
-            if self.current_host.patterns:
-                lines.append(f"Host {' '.join(self.current_host.patterns)}")
+            if self.current_host.patterns or isinstance(self.current_host, SSHMatch):
+                lines.append(self.current_host.header)
 
             for opt in self.current_host.options:
                 lines.append(str(opt))
@@ -831,6 +850,7 @@ class HostEditor(Gtk.Box):
 
         return lines
 
+    @profiling.timed("host_editor.raw_text_changed")
     def _on_raw_text_changed(self, buffer):
         """Handle changes in the raw text view, parse, validate, and apply diff highlighting."""
         if self.is_loading or not self.current_host:
@@ -863,6 +883,10 @@ class HostEditor(Gtk.Box):
         try:
             temp_host = SSHHost.from_raw_lines(current_lines)
             self.current_host.patterns = temp_host.patterns
+            if isinstance(self.current_host, SSHMatch) and isinstance(
+                temp_host, SSHMatch
+            ):
+                self.current_host.criteria = temp_host.criteria
             self.current_host.options = temp_host.options
             self.current_host.raw_lines = current_lines
             self.emit("host-changed", self.current_host)
@@ -1407,7 +1431,7 @@ class HostEditor(Gtk.Box):
             opt.key.lower(): opt.value for opt in self.current_host.options
         }
         original_options_dict = {
-            opt.key.lower(): opt.value for opt in self.original_host_state.options
+            key.lower(): value for key, value, _ in self.original_host_state.options
         }
 
         if current_options_dict != original_options_dict:
@@ -1425,7 +1449,7 @@ class HostEditor(Gtk.Box):
         self._clear_field_errors()
 
         patterns_text = self.patterns_entry.get_text().strip()
-        if not patterns_text:
+        if not patterns_text and not isinstance(self.current_host, SSHMatch):
             errors["patterns"] = _("Host name (patterns) is required.")
 
         port_value = self.port_entry.get_value()
@@ -1512,6 +1536,7 @@ class HostEditor(Gtk.Box):
         GLib.idle_add(lambda: (self._update_raw_text_from_host(), False)[1])
         self._update_button_sensitivity()
 
+    @profiling.timed("host_editor.save")
     def _on_save_clicked(self, button):
         """Handle save button click."""
         if not self.current_host:
@@ -1540,6 +1565,10 @@ class HostEditor(Gtk.Box):
             current_lines = current_text.splitlines()
             temp_host = SSHHost.from_raw_lines(current_lines)
             self.current_host.patterns = temp_host.patterns
+            if isinstance(self.current_host, SSHMatch) and isinstance(
+                temp_host, SSHMatch
+            ):
+                self.current_host.criteria = temp_host.criteria
             self.current_host.options = temp_host.options
             self.current_host.raw_lines = current_lines
         except Exception as e:
@@ -1605,7 +1634,7 @@ class HostEditor(Gtk.Box):
                 except Exception:
                     pass
                 try:
-                    parser.write(backup=True)
+                    parser.write(backup=True, verify=True)
                 except Exception as e:
                     try:
                         self.app._show_error(
@@ -1614,32 +1643,7 @@ class HostEditor(Gtk.Box):
                     except Exception:
                         pass
                     return
-                try:
-                    expected_content = parser._generate_content()
-                    try:
-                        with open(parser.config_path, "r", encoding="utf-8") as f:
-                            on_disk = f.read()
-                    except FileNotFoundError:
-                        on_disk = ""
-                    if on_disk != expected_content:
-                        parser._atomic_write(expected_content)
-                        try:
-                            with open(parser.config_path, "r", encoding="utf-8") as f:
-                                verify = f.read()
-                        except Exception:
-                            verify = None
-                        if verify != expected_content:
-                            try:
-                                self.app._show_error(
-                                    _(
-                                        f"Failed to persist changes to {parser.config_path}. Check permissions / sandbox."
-                                    )
-                                )
-                            except Exception:
-                                pass
-                except Exception:
-                    pass
-                self.original_host_state = copy.deepcopy(self.current_host)
+                self.original_host_state = HostState.of(self.current_host)
                 self.original_raw_content = "\n".join(self.current_host.raw_lines)
                 self._ensure_buffer_initialized()
                 if self.buffer is not None:
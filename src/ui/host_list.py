@@ -2,28 +2,69 @@ import gi
 
 gi.require_version("Gtk", "4.0")
 gi.require_version("Adw", "1")
-from gi.repository import Gtk, GObject, Adw, Gdk, GLib
-from gettext import gettext as _
+from gi.repository import Gtk, GObject, Adw, Gdk, GLib, Gio
+from difflib import SequenceMatcher
+from gettext import gettext as _, ngettext
 
 try:
-    from ssh_studio.ssh_config_parser import SSHHost, SSHOption
+    from ssh_studio.ssh_config_parser import SSHHost, SSHMatch, SSHOption
 except ImportError:
-    from ssh_config_parser import SSHHost, SSHOption
+    from ssh_config_parser import SSHHost, SSHMatch, SSHOption
+
+try:
+    from ssh_studio import host_search
+except ImportError:
+    import host_search
+
+try:
+    from ssh_studio import profiling
+except ImportError:
+    import profiling
+
+# Typing into the search entry filters lists at least this long on a worker
+# thread; shorter lists are filtered in place.
+_BACKGROUND_SEARCH_MIN_HOSTS = 5000
+
+# A changed stretch of rows longer than this on either side is replaced in
+# one splice instead of being diffed row by row.
+_DIFF_MAX_ROWS = 2000
+
+
+class HostItem(GObject.Object):
+    """A host in the list model."""
+
+    __gtype_name__ = "HostItem"
+
+    def __init__(self, host: SSHHost):
+        super().__init__()
+        self.host = host
 
 
 @Gtk.Template(resource_path="/io/github/BuddySirJava/SSH-Studio/ui/host_list.ui")
 class HostList(Gtk.Box):
+    """The sidebar host list.
+
+    Hosts live in a ``Gio.ListStore`` shown by a ``Gtk.ListView``, so only
+    the rows in view are realized; the factory rebinds them as the list
+    scrolls or the filter changes.
+    """
 
     __gtype_name__ = "HostList"
 
-    list_box = Gtk.Template.Child()
+    list_view = Gtk.Template.Child()
+    list_scroller = Gtk.Template.Child()
     host_stack = Gtk.Template.Child()
     empty_page = Gtk.Template.Child()
     add_bottom_button = Gtk.Template.Child()
     search_button = Gtk.Template.Child()
     undo_button = Gtk.Template.Child()
+    redo_button = Gtk.Template.Child()
     search_bar = Gtk.Template.Child()
     search_entry = Gtk.Template.Child()
+    select_button = Gtk.Template.Child()
+    bulk_bar = Gtk.Template.Child()
+    bulk_label = Gtk.Template.Child()
+    bulk_edit_button = Gtk.Template.Child()
 
     __gsignals__ = {
         "host-selected": (GObject.SignalFlags.RUN_LAST, None, (object,)),
@@ -31,6 +72,8 @@ class HostList(Gtk.Box):
         "host-deleted": (GObject.SignalFlags.RUN_LAST, None, (object,)),
         "hosts-reordered": (GObject.SignalFlags.RUN_LAST, None, (object,)),
         "undo-clicked": (GObject.SignalFlags.RUN_LAST, None, ()),
+        "redo-clicked": (GObject.SignalFlags.RUN_LAST, None, ()),
+        "bulk-edit-requested": (GObject.SignalFlags.RUN_LAST, None, (object,)),
     }
 
     def __init__(self):
@@ -41,64 +84,54 @@ class HostList(Gtk.Box):
         self.current_filter = ""
         self._selected_host = None
         self._dragging_host = None
-        self._order_before_drag = None
-        self._dnd_hover_row = None
+        self._restoring_selection = False
+        self._multi_select = False
+        # One item per host, kept across filter changes so a keystroke
+        # re-splices existing items instead of allocating new ones.
+        self._items = {}
+        # The items in ``store``, in order, and the list items bound to a
+        # row widget (those in view).
+        self._shown = []
+        self._bound = set()
+        self._search = host_search.SearchIndex()
+        self._search_worker = host_search.SearchWorker(self._on_search_results)
+        self._running_search = None
+
+        self.store = Gio.ListStore(item_type=HostItem)
+        self.single_selection = Gtk.SingleSelection(
+            model=self.store, autoselect=False, can_unselect=True
+        )
+        self.multi_selection = Gtk.MultiSelection(model=self.store)
+
+        factory = Gtk.SignalListItemFactory()
+        factory.connect("setup", self._on_factory_setup)
+        factory.connect("bind", self._on_factory_bind)
+        factory.connect("unbind", self._on_factory_unbind)
+        self.list_view.set_factory(factory)
+        self.list_view.set_model(self.single_selection)
 
         self._connect_signals()
-
-        self.list_store = Gtk.ListStore(str, str, str, str, str, object)
-        if hasattr(self, "tree_view") and self.tree_view is not None:
-            self.tree_view.set_model(self.list_store)
-            self._setup_columns()
-        self._rebuild_listbox_rows()
-
         self._update_bottom_toolbar_sensitivity()
 
-    def _setup_columns(self):
-        def add_text_column(
-            title: str,
-            col_index: int,
-            expand: bool = False,
-            min_width: int | None = None,
-        ):
-            renderer = Gtk.CellRendererText()
-            renderer.set_property("ypad", 6)
-            renderer.set_property("xpad", 8)
-            column = Gtk.TreeViewColumn(title, renderer, text=col_index)
-            if expand:
-                column.set_expand(True)
-            if min_width is not None:
-                column.set_min_width(min_width)
-            self.tree_view.append_column(column)
-
-        add_text_column(_("Host"), 0, True, 120)
-        add_text_column(_("HostName"), 1, True, 150)
-        add_text_column(_("User"), 2, False, 80)
-        add_text_column(_("Port"), 3, False, 60)
-        add_text_column(_("Identity"), 4, True, 120)
-
     def _connect_signals(self):
-        if hasattr(self, "tree_view") and self.tree_view is not None:
-            selection = self.tree_view.get_selection()
-            selection.connect("changed", self._on_selection_changed)
-        if hasattr(self, "list_box") and self.list_box is not None:
-            self.list_box.connect("row-selected", self._on_row_selected)
+        self.single_selection.connect("selection-changed", self._on_selection_changed)
+        self.multi_selection.connect(
+            "selection-changed", self._on_selected_rows_changed
+        )
+        try:
+            drop_target = Gtk.DropTarget.new(GObject.TYPE_STRING, Gdk.DragAction.MOVE)
+            drop_target.connect("drop", self._on_list_drop)
             try:
-                drop_target = Gtk.DropTarget.new(
-                    GObject.TYPE_STRING, Gdk.DragAction.MOVE
-                )
-                drop_target.connect("drop", self._on_listbox_drop)
-                try:
-                    drop_target.connect("motion", self._on_listbox_motion)
-                except Exception:
-                    pass
-                try:
-                    drop_target.connect("accept", lambda *args: True)
-                except Exception:
-                    pass
-                self.list_box.add_controller(drop_target)
+                drop_target.connect("motion", self._on_list_motion)
+            except Exception:
+                pass
+            try:
+                drop_target.connect("accept", lambda *args: True)
             except Exception:
                 pass
+            self.list_view.add_controller(drop_target)
+        except Exception:
+            pass
 
         try:
             if self.add_bottom_button:
@@ -118,6 +151,11 @@ class HostList(Gtk.Box):
                     "clicked", lambda *_: self.emit("undo-clicked")
                 )
                 self.undo_button.set_sensitive(False)
+            if self.redo_button:
+                self.redo_button.connect(
+                    "clicked", lambda *_: self.emit("redo-clicked")
+                )
+                self.redo_button.set_sensitive(False)
         except Exception:
             pass
 
@@ -127,90 +165,317 @@ class HostList(Gtk.Box):
         except Exception:
             pass
 
+        try:
+            self.select_button.connect("toggled", self._on_select_toggled)
+            self.bulk_edit_button.connect("clicked", self._on_bulk_edit_clicked)
+        except Exception:
+            pass
+
+    @profiling.timed("host_list.load_hosts")
     def load_hosts(self, hosts: list):
-        self.hosts = hosts
+        self._set_hosts(hosts)
         self.filtered_hosts = hosts.copy()
         self._refresh_view()
         self._update_empty_state()
 
+    def update_hosts(self, hosts: list):
+        """Replace the hosts, keeping the search filter and the selected row.
+
+        The selection moves to the same host object, or to the host with the
+        same header when it was re-parsed, without emitting
+        ``host-selected``. Returns the host selected afterwards, if any.
+        """
+        selected = self.get_selected_host()
+        self._set_hosts(hosts)
+        target = None
+        self._restoring_selection = True
+        try:
+            self.filter_hosts(self.current_filter)
+            if selected is not None:
+                target = next((h for h in self.filtered_hosts if h is selected), None)
+                if target is None:
+                    target = next(
+                        (
+                            h
+                            for h in self.filtered_hosts
+                            if h.header == selected.header
+                        ),
+                        None,
+                    )
+            if target is not None:
+                self.select_host(target)
+        finally:
+            self._restoring_selection = False
+        return target
+
+    def _set_hosts(self, hosts: list):
+        """Point the list at ``hosts`` and drop items of hosts that are gone."""
+        self.hosts = hosts
+        self._search.set_hosts(hosts)
+        items = {}
+        for host in hosts:
+            item = self._items.get(id(host))
+            if item is not None and item.host is host:
+                items[id(host)] = item
+        self._items = items
+
+    def _item_for(self, host: SSHHost) -> HostItem:
+        item = self._items.get(id(host))
+        if item is None or item.host is not host:
+            item = self._items[id(host)] = HostItem(host)
+        return item
+
+    @profiling.timed("host_list.filter")
     def filter_hosts(self, query: str):
         self.current_filter = query.lower()
-
-        if not query:
-            self.filtered_hosts = self.hosts.copy()
-        else:
-            self.filtered_hosts = []
-            for host in self.hosts:
-                searchable_text = (
-                    " ".join(host.patterns)
-                    + " "
-                    + (host.get_option("HostName") or "")
-                    + " "
-                    + (host.get_option("User") or "")
-                    + " "
-                    + (host.get_option("IdentityFile") or "")
-                ).lower()
-
-                if self.current_filter in searchable_text:
-                    self.filtered_hosts.append(host)
+        self.filtered_hosts = self._search.filter(query)
 
         self._refresh_view()
         self._update_empty_state()
 
+    @profiling.timed("host_list.refresh_model")
     def _refresh_view(self):
-        if hasattr(self, "tree_view") and self.tree_view is not None:
-            selection = self.tree_view.get_selection()
-            model, selected_iter = selection.get_selected()
-        else:
-            model = self.list_store
-            selected_iter = None
-        previously_selected_host = None
-        if selected_iter:
-            previously_selected_host = model.get_value(selected_iter, 5)
-
-        self.list_store.clear()
-
-        for host in self.filtered_hosts:
-            host_patterns = ", ".join(host.patterns)
-            hostname = host.get_option("HostName") or ""
-            user = host.get_option("User") or ""
-            port = host.get_option("Port") or ""
-            identity_file = host.get_option("IdentityFile") or ""
-
-            self.list_store.append(
-                [host_patterns, hostname, user, port, identity_file, host]
-            )
+        # Results still streaming in from the worker would overwrite these.
+        self._search_worker.cancel()
+        self._show_items([self._item_for(host) for host in self.filtered_hosts])
+        # Hosts edited in place keep their item; redraw the rows in view.
+        for list_item in list(self._bound):
+            self._bind_row(list_item)
+
+    def _show_items(self, items: list):
+        """Make the store hold ``items`` with as few changes as possible.
+
+        The selected host stays selected (without ``host-selected``) when it
+        is still listed, and rows outside the changed stretch are left
+        alone, so the scroll position and focus survive.
+        """
+        old = self._shown
+        self._shown = items
+        if old == items:
+            return
+        selected = self.single_selection.get_selected_item()
+        restoring = self._restoring_selection
+        self._restoring_selection = True
+        try:
+            self._splice_changes(old, items)
+            if (
+                selected is not None
+                and not self._multi_select
+                and self.single_selection.get_selected_item() is None
+            ):
+                found, position = self.store.find(selected)
+                if found:
+                    self.single_selection.set_selected(position)
+        finally:
+            self._restoring_selection = restoring
+
+    def _splice_changes(self, old: list, new: list):
+        start = 0
+        limit = min(len(old), len(new))
+        while start < limit and old[start] is new[start]:
+            start += 1
+        old_end = len(old)
+        new_end = len(new)
+        while (
+            old_end > start
+            and new_end > start
+            and old[old_end - 1] is new[new_end - 1]
+        ):
+            old_end -= 1
+            new_end -= 1
+        old_rows = old[start:old_end]
+        new_rows = new[start:new_end]
+
+        # One row moved, as after a drag and drop.
+        if len(old_rows) == len(new_rows) > 1:
+            if old_rows[0] is new_rows[-1] and old_rows[1:] == new_rows[:-1]:
+                self.store.remove(start)
+                self.store.insert(old_end - 1, old_rows[0])
+                return
+            if old_rows[-1] is new_rows[0] and old_rows[:-1] == new_rows[1:]:
+                self.store.remove(old_end - 1)
+                self.store.insert(start, new_rows[0])
+                return
+
+        if len(old_rows) > _DIFF_MAX_ROWS or len(new_rows) > _DIFF_MAX_ROWS:
+            self.store.splice(start, len(old_rows), new_rows)
+            return
+        matcher = SequenceMatcher(
+            None, [id(i) for i in old_rows], [id(i) for i in new_rows], autojunk=False
+        )
+        # From the end, so earlier positions stay valid.
+        for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+            if tag != "equal":
+                self.store.splice(start + i1, i2 - i1, new_rows[j1:j2])
 
-        if hasattr(self, "list_box") and self.list_box is not None:
-            self._rebuild_listbox_rows()
-        if previously_selected_host:
-            self.select_host(previously_selected_host)
+    def _update_empty_state(self):
+        try:
+            if self.hosts:
+                self.host_stack.set_visible_child(self.list_scroller)
+            else:
+                self.host_stack.set_visible_child(self.empty_page)
+        except Exception:
+            pass
 
+    def _on_factory_setup(self, factory, list_item):
+        action_row = Adw.ActionRow()
+        action_row.set_use_markup(False)
+        action_row.set_activatable(False)
+        action_row._host_ref = None
 
-    def _update_empty_state(self):
         try:
-            has_hosts = bool(self.hosts)
-            if self.empty_page:
-                self.empty_page.set_visible(not has_hosts)
-            if self.list_box:
-                self.list_box.set_visible(has_hosts)
+            button_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+        except Exception:
+            button_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL)
+
+        grip_button = Gtk.Button()
+        try:
+            grip_button.set_icon_name("list-drag-handle-symbolic")
+        except Exception:
+            grip_button.set_icon_name("open-menu-symbolic")
+        grip_button.set_tooltip_text(_("Drag to reorder"))
+        grip_button.set_margin_top(8)
+        grip_button.set_margin_bottom(8)
+        grip_button.add_css_class("flat")
+        grip_button.set_visible(False)
+
+        try:
+            drag_source = Gtk.DragSource()
+            drag_source.set_actions(Gdk.DragAction.MOVE)
+
+            def _on_drag_begin(src, drag):
+                self._dragging_host = action_row._host_ref
+                try:
+                    icon = Gtk.DragIcon.get_for_drag(drag)
+                    preview = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=2)
+                    lbl_title = Gtk.Label(label=action_row.get_title())
+                    lbl_title.set_xalign(0)
+                    lbl_title.add_css_class("title-4")
+                    lbl_sub = Gtk.Label(label=action_row.get_subtitle() or "")
+                    lbl_sub.set_xalign(0)
+                    lbl_sub.add_css_class("dim-label")
+                    preview.append(lbl_title)
+                    preview.append(lbl_sub)
+                    preview.set_margin_start(8)
+                    preview.set_margin_end(8)
+                    preview.set_margin_top(6)
+                    preview.set_margin_bottom(6)
+                    preview.add_css_class("card")
+                    icon.set_child(preview)
+                    try:
+                        icon.set_hotspot(8, 8)
+                    except Exception:
+                        pass
+                except Exception:
+                    pass
+
+            def _on_drag_end(src, drag, delete_data):
+                self._dragging_host = None
+
+            def _on_prepare(src, x, y):
+                host_ref = action_row._host_ref
+                if host_ref is None:
+                    return None
+                alias = ", ".join(host_ref.patterns) or "host"
+                try:
+                    return Gdk.ContentProvider.new_for_value(alias)
+                except Exception:
+                    try:
+                        bytes_utf8 = GLib.Bytes.new(alias.encode("utf-8"))
+                        return Gdk.ContentProvider.new_for_bytes(
+                            "text/plain;charset=utf-8", bytes_utf8
+                        )
+                    except Exception:
+                        return None
+
+            drag_source.connect("drag-begin", _on_drag_begin)
+            drag_source.connect("drag-end", _on_drag_end)
+            drag_source.connect("prepare", _on_prepare)
+            grip_button.add_controller(drag_source)
         except Exception:
             pass
 
-    def _on_selection_changed(self, selection):
-        model, tree_iter = selection.get_selected()
-        if tree_iter:
-            host = model.get_value(tree_iter, 5)
-            self.emit("host-selected", host)
-        self._update_bottom_toolbar_sensitivity()
+        action_row.add_prefix(grip_button)
+        action_row._grip_button = grip_button
+
+        duplicate_button = Gtk.Button()
+        duplicate_button.set_icon_name("edit-copy-symbolic")
+        duplicate_button.set_tooltip_text(_("Duplicate Host"))
+        duplicate_button.add_css_class("flat")
+        duplicate_button.set_margin_top(8)
+        duplicate_button.set_margin_bottom(8)
+        duplicate_button.set_visible(False)
+        duplicate_button.connect(
+            "clicked",
+            lambda b: self._on_duplicate_host_clicked(b, action_row._host_ref),
+        )
+
+        delete_button = Gtk.Button()
+        delete_button.set_icon_name("edit-delete-symbolic")
+        delete_button.set_tooltip_text(_("Delete Host"))
+        delete_button.add_css_class("flat")
+        delete_button.add_css_class("destructive-action")
+        delete_button.set_margin_top(8)
+        delete_button.set_margin_bottom(8)
+        delete_button.set_visible(False)
+        delete_button.connect(
+            "clicked",
+            lambda b: self._on_delete_host_clicked(b, action_row._host_ref),
+        )
+
+        button_box.append(duplicate_button)
+        button_box.append(delete_button)
+
+        action_row._duplicate_button = duplicate_button
+        action_row._delete_button = delete_button
+
+        action_row.add_suffix(button_box)
+        list_item.set_child(action_row)
+        list_item.connect("notify::selected", self._on_list_item_selected)
+
+    def _on_factory_bind(self, factory, list_item):
+        self._bound.add(list_item)
+        self._bind_row(list_item)
+
+    def _bind_row(self, list_item):
+        action_row = list_item.get_child()
+        host = list_item.get_item().host
+        action_row._host_ref = host
+        action_row.set_title(", ".join(host.patterns) or host.header)
+        hostname = host.get_option("HostName") or ""
+        user = host.get_option("User") or ""
+        action_row.set_subtitle(f"{user}@{hostname}" if (hostname or user) else "")
+        self._sync_row_buttons(list_item)
+
+    def _on_factory_unbind(self, factory, list_item):
+        self._bound.discard(list_item)
+        action_row = list_item.get_child()
+        action_row._host_ref = None
+
+    def _on_list_item_selected(self, list_item, pspec):
+        self._sync_row_buttons(list_item)
+
+    def _sync_row_buttons(self, list_item):
+        """Show the row's grip, duplicate and delete buttons only while it is
+        the single selected row. Search results may be ranked rather than in
+        file order, so the grip stays hidden while searching."""
+        action_row = list_item.get_child()
+        if action_row is None:
+            return
+        visible = list_item.get_selected() and not self._multi_select
+        action_row._grip_button.set_visible(visible and not self.current_filter)
+        action_row._duplicate_button.set_visible(visible)
+        action_row._delete_button.set_visible(visible)
 
     def _on_duplicate_host_clicked(self, button, host):
         """Handle duplicate host button click from an ActionRow."""
-        self.duplicate_host(host)
+        if host is not None:
+            self.duplicate_host(host)
 
     def _on_delete_host_clicked(self, button, host):
         """Handle delete host button click from an ActionRow."""
-        self.delete_host(host)
+        if host is not None:
+            self.delete_host(host)
 
     def add_host(self):
         """Add a new host."""
@@ -240,7 +505,8 @@ class HostList(Gtk.Box):
             host_to_delete = self._get_selected_host()
         if host_to_delete is not None:
             title = _("Delete host?")
-            body = _(f"Delete host '{', '.join(host_to_delete.patterns)}'?")
+            name = ", ".join(host_to_delete.patterns) or host_to_delete.header
+            body = _(f"Delete host '{name}'?")
             dialog = Adw.AlertDialog.new(title, body)
             dialog.add_response("cancel", _("Cancel"))
             dialog.add_response("delete", _("Delete"))
@@ -269,7 +535,10 @@ class HostList(Gtk.Box):
                 dialog.present(None)
 
     def _duplicate_host(self, original_host: SSHHost) -> SSHHost:
-        duplicated_host = SSHHost()
+        if isinstance(original_host, SSHMatch):
+            duplicated_host = SSHMatch(criteria=list(original_host.criteria))
+        else:
+            duplicated_host = SSHHost()
 
         duplicated_host.patterns = [
             f"{pattern}-copy" for pattern in original_host.patterns
@@ -283,40 +552,30 @@ class HostList(Gtk.Box):
 
         return duplicated_host
 
+    def _position_of(self, host: SSHHost) -> int | None:
+        """The row of ``host`` in the filtered list, compared by identity."""
+        item = self._items.get(id(host))
+        if item is None or item.host is not host:
+            return None
+        found, position = self.store.find(item)
+        return position if found else None
+
     def select_host(self, host: SSHHost):
-        for index, row in enumerate(self.list_store):
-            if row[5] == host:
-                if hasattr(self, "tree_view") and self.tree_view is not None:
-                    tree_iter = self.list_store.iter_nth_child(None, index)
-                    if tree_iter is None:
-                        return
-                    selection = self.tree_view.get_selection()
-                    selection.select_iter(tree_iter)
-                    path = self.list_store.get_path(tree_iter)
-                    if path is not None:
-                        self.tree_view.scroll_to_cell(path, None, False, 0, 0)
-                elif hasattr(self, "list_box") and self.list_box is not None:
-                    row_widget = self.list_box.get_row_at_index(index)
-                    if row_widget is not None:
-                        self.list_box.select_row(row_widget)
-                        try:
-                            row_widget.grab_focus()
-                        except Exception:
-                            pass
-                break
+        position = self._position_of(host)
+        if position is None:
+            return
+        self.list_view.get_model().select_item(position, True)
+        try:
+            self.list_view.scroll_to(position, Gtk.ListScrollFlags.FOCUS, None)
+        except (AttributeError, TypeError):
+            pass
 
     def get_selected_host(self) -> SSHHost | None:
         """Get the currently selected host."""
-        if hasattr(self, "tree_view") and self.tree_view is not None:
-            selection = self.tree_view.get_selection()
-            model, tree_iter = selection.get_selected()
-            if tree_iter is not None:
-                return model[tree_iter][5]
-        elif hasattr(self, "list_box") and self.list_box is not None:
-            selected_row = self.list_box.get_selected_row()
-            if selected_row is not None and hasattr(selected_row, "_host_ref"):
-                return selected_row._host_ref
-        return None
+        if self._multi_select:
+            return None
+        item = self.single_selection.get_selected_item()
+        return item.host if item is not None else None
 
     def navigate_with_key(self, keyval, state):
         """Handle keyboard navigation in the host list."""
@@ -353,195 +612,34 @@ class HostList(Gtk.Box):
 
     def _get_current_selection_index(self) -> int | None:
         """Get the index of the currently selected host in filtered_hosts."""
-        selected_host = self.get_selected_host()
-        if selected_host is None:
+        if self._multi_select:
             return None
-
-        try:
-            return self.filtered_hosts.index(selected_host)
-        except ValueError:
+        position = self.single_selection.get_selected()
+        if position == Gtk.INVALID_LIST_POSITION:
             return None
+        return position
 
-    def _rebuild_listbox_rows(self):
-        if not hasattr(self, "list_box") or self.list_box is None:
-            return
-        while (child := self.list_box.get_first_child()) is not None:
-            self.list_box.remove(child)
-
-        for row in self.list_store:
-            host = row[5]
-            patterns = row[0]
-            hostname = row[1]
-            user = row[2]
-            action_row = Adw.ActionRow()
-            action_row.set_title(patterns)
-            secondary = (
-                f"{user}@{hostname}" if (hostname or user) else ("")
-            )
-            action_row.set_subtitle(secondary)
-
-            action_row.set_selectable(True)
-            action_row.set_activatable(True)
-            action_row._host_ref = host
-
-            try:
-                button_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
-            except Exception:
-                button_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL)
-
-            grip_button = Gtk.Button()
-            try:
-                grip_button.set_icon_name("list-drag-handle-symbolic")
-            except Exception:
-                grip_button.set_icon_name("open-menu-symbolic")
-            grip_button.set_tooltip_text(_("Drag to reorder"))
-            grip_button.set_margin_top(8)
-            grip_button.set_margin_bottom(8)
-            grip_button.add_css_class("flat")
-            try:
-                grip_button.set_visible(False)
-            except Exception:
-                pass
-
-            try:
-                drag_source = Gtk.DragSource()
-                drag_source.set_actions(Gdk.DragAction.MOVE)
-
-                def _on_drag_begin(
-                    src,
-                    drag,
-                    host_ref=host,
-                    patterns_text=patterns,
-                    secondary_text=secondary,
-                ):
-                    self._dragging_host = host_ref
-                    self._order_before_drag = list(self.hosts)
-                    try:
-                        icon = Gtk.DragIcon.get_for_drag(drag)
-                        preview = Gtk.Box(
-                            orientation=Gtk.Orientation.VERTICAL, spacing=2
-                        )
-                        lbl_title = Gtk.Label(label=patterns_text)
-                        lbl_title.set_xalign(0)
-                        try:
-                            lbl_title.add_css_class("title-4")
-                        except Exception:
-                            pass
-                        lbl_sub = Gtk.Label(label=secondary_text)
-                        lbl_sub.set_xalign(0)
-                        try:
-                            lbl_sub.add_css_class("dim-label")
-                        except Exception:
-                            pass
-                        preview.append(lbl_title)
-                        preview.append(lbl_sub)
-                        preview.set_margin_start(8)
-                        preview.set_margin_end(8)
-                        preview.set_margin_top(6)
-                        preview.set_margin_bottom(6)
-                        try:
-                            preview.add_css_class("card")
-                        except Exception:
-                            pass
-                        icon.set_child(preview)
-                        try:
-                            icon.set_hotspot(8, 8)
-                        except Exception:
-                            pass
-                    except Exception:
-                        pass
-
-                def _on_drag_end(src, drag, delete_data):
-                    self._dragging_host = None
-
-                def _on_prepare(src, x, y, host_ref=host):
-                    try:
-                        alias = ", ".join(host_ref.patterns) or "host"
-                        return Gdk.ContentProvider.new_for_value(alias)
-                    except Exception:
-                        try:
-                            bytes_utf8 = GLib.Bytes.new(
-                                (", ".join(host_ref.patterns) or "host").encode("utf-8")
-                            )
-                            return Gdk.ContentProvider.new_for_bytes(
-                                "text/plain;charset=utf-8", bytes_utf8
-                            )
-                        except Exception:
-                            return None
-
-                drag_source.connect("drag-begin", _on_drag_begin)
-                drag_source.connect("drag-end", _on_drag_end)
-                drag_source.connect("prepare", _on_prepare)
-                grip_button.add_controller(drag_source)
-            except Exception:
-                pass
-
-            try:
-                action_row.add_prefix(grip_button)
-            except Exception:
-                pass
-            action_row._grip_button = grip_button
-
-            duplicate_button = Gtk.Button()
-            duplicate_button.set_icon_name("edit-copy-symbolic")
-            duplicate_button.set_tooltip_text(_("Duplicate Host"))
-            duplicate_button.add_css_class("flat")
-            duplicate_button.set_margin_top(8)
-            duplicate_button.set_margin_bottom(8)
-            duplicate_button.set_visible(False)
-            duplicate_button.connect("clicked", self._on_duplicate_host_clicked, host)
-
-            delete_button = Gtk.Button()
-            delete_button.set_icon_name("edit-delete-symbolic")
-            delete_button.set_tooltip_text(_("Delete Host"))
-            delete_button.add_css_class("flat")
-            delete_button.add_css_class("destructive-action")
-            delete_button.set_margin_top(8)
-            delete_button.set_margin_bottom(8)
-            delete_button.set_visible(False)
-            delete_button.connect("clicked", self._on_delete_host_clicked, host)
-
-            button_box.append(duplicate_button)
-            button_box.append(delete_button)
-
-            action_row._duplicate_button = duplicate_button
-            action_row._delete_button = delete_button
-
-            action_row.add_suffix(button_box)
-            self.list_box.append(action_row)
-
-    def _on_listbox_drop(self, drop_target, value, x, y):
+    def _on_list_drop(self, drop_target, value, x, y):
         source_host = self._dragging_host
-        if source_host is None:
+        if source_host is None or self.current_filter:
             return False
 
         try:
-            y_int = int(y)
-            target_row = None
-            try:
-                target_row = self.list_box.get_row_at_y(y_int)
-            except Exception:
-                target_row = None
-
-            if target_row is not None:
-                row_idx = self._get_row_index_from_widget(target_row)
-                alloc = target_row.get_allocation()
-                row_top = getattr(alloc, "y", 0)
-                row_height = getattr(alloc, "height", 0)
-                after = (y_int - row_top) >= int(row_height * 0.55)
-                dest_index_filtered = row_idx + (1 if after else 0)
-            else:
-                dest_index_filtered = self._get_insert_index_from_y(y_int)
+            dest_index_filtered = self._get_insert_index_at(x, y)
 
             if dest_index_filtered >= len(self.filtered_hosts):
                 dest_index_base = len(self.hosts)
             else:
                 dest_host_at_pos = self.filtered_hosts[dest_index_filtered]
-                dest_index_base = self.hosts.index(dest_host_at_pos)
+                dest_index_base = next(
+                    i for i, h in enumerate(self.hosts) if h is dest_host_at_pos
+                )
 
-            if source_host not in self.hosts:
+            source_index_base = next(
+                (i for i, h in enumerate(self.hosts) if h is source_host), None
+            )
+            if source_index_base is None:
                 return False
-            source_index_base = self.hosts.index(source_host)
 
             if (
                 dest_index_base == source_index_base
@@ -549,54 +647,55 @@ class HostList(Gtk.Box):
             ):
                 return True
 
-            host_obj = self.hosts.pop(source_index_base)
             if dest_index_base > source_index_base:
                 dest_index_base -= 1
-            self.hosts.insert(dest_index_base, host_obj)
+            # The handler moves the host in the model; ``self.hosts`` is the
+            # config's own list.
+            self.emit("hosts-reordered", (source_index_base, dest_index_base))
 
             self.filter_hosts(self.current_filter)
             try:
                 self.select_host(source_host)
             except Exception:
                 pass
-            prev = self._order_before_drag or []
-            self._order_before_drag = None
-            self.emit("hosts-reordered", prev)
             return True
         except Exception:
             return False
 
-    def _get_row_index_from_widget(self, row_widget) -> int:
-        try:
-            idx = 0
-            child = self.list_box.get_first_child()
-            while child is not None:
-                if child is row_widget:
-                    return idx
-                idx += 1
-                child = child.get_next_sibling()
-            return idx
-        except Exception:
-            return 0
+    def _row_at(self, x: float, y: float):
+        """The host row under a point of the list view, if any."""
+        widget = self.list_view.pick(x, y, Gtk.PickFlags.DEFAULT)
+        while widget is not None and widget is not self.list_view:
+            if getattr(widget, "_host_ref", None) is not None:
+                return widget
+            widget = widget.get_parent()
+        return None
 
-    def _on_listbox_motion(self, drop_target, x, y):
+    def _get_insert_index_at(self, x: float, y: float) -> int:
+        """Return the filtered index at which to insert a row dropped at
+        (x, y): before the row under the point, or after it when the point
+        is in its lower half. Appends when no row is under the point.
+        """
+        row = self._row_at(x, y)
+        if row is None:
+            return len(self.filtered_hosts)
+        index = self._position_of(row._host_ref)
+        if index is None:
+            return len(self.filtered_hosts)
+        ok, bounds = row.compute_bounds(self.list_view)
+        if not ok:
+            return index
+        after = (y - bounds.get_y()) >= bounds.get_height() * 0.55
+        return index + (1 if after else 0)
+
+    def _on_list_motion(self, drop_target, x, y):
         try:
-            scroller = self._find_scroller()
-            if not scroller:
-                return Gdk.DragAction.MOVE
-            vadj = scroller.get_vadjustment()
+            vadj = self.list_scroller.get_vadjustment()
             if not vadj:
                 return Gdk.DragAction.MOVE
-            height = scroller.get_allocated_height()
+            height = self.list_scroller.get_height()
             edge = 28
-            step = max(
-                12,
-                (
-                    int(vadj.get_page_increment() * 0.15)
-                    if hasattr(vadj, "get_page_increment")
-                    else 20
-                ),
-            )
+            step = max(12, int(vadj.get_page_increment() * 0.15))
             y_int = int(y)
             new_val = vadj.get_value()
             if y_int < edge:
@@ -610,95 +709,72 @@ class HostList(Gtk.Box):
             pass
         return Gdk.DragAction.MOVE
 
-    def _find_scroller(self):
-        try:
-            w = self.list_box
-            while w is not None and not isinstance(w, Gtk.ScrolledWindow):
-                w = w.get_parent()
-            return w
-        except Exception:
-            return None
-
-    def _get_insert_index_from_y(self, y: int) -> int:
-        """Return the filtered index at which to insert based on y position.
-        Inserts before the row whose midpoint is below y; append at end otherwise.
-        """
-        try:
-            index = 0
-            child = self.list_box.get_first_child()
-            while child is not None:
-                alloc = child.get_allocation()
-                row_top = getattr(alloc, "y", 0)
-                row_height = getattr(alloc, "height", 0)
-                row_mid = row_top + (row_height // 2)
-                if y < row_mid:
-                    return index
-                index += 1
-                child = child.get_next_sibling()
-            return index
-        except Exception:
-            return len(self.filtered_hosts)
-
-    def _on_row_selected(self, listbox, row):
-        self._hide_all_row_buttons()
-
-        if row is None:
+    def _on_selection_changed(self, selection, position, n_items):
+        if self._multi_select:
+            return
+        item = selection.get_selected_item()
+        if item is None:
             self._update_bottom_toolbar_sensitivity()
             return
-        host = getattr(row, "_host_ref", None)
-        if host is not None:
-            self._selected_host = host
-            self.emit("host-selected", host)
-            self._show_row_buttons(row)
+        self._selected_host = item.host
+        if not self._restoring_selection:
+            self.emit("host-selected", item.host)
         self._update_bottom_toolbar_sensitivity()
 
-    def _hide_all_row_buttons(self):
-        """Hide buttons on all ActionRows."""
-        if not hasattr(self, "list_box") or self.list_box is None:
-            return
-        child = self.list_box.get_first_child()
-        while child is not None:
-            if hasattr(child, "_duplicate_button") and hasattr(child, "_delete_button"):
-                child._duplicate_button.set_visible(False)
-                child._delete_button.set_visible(False)
-            if hasattr(child, "_grip_button"):
-                try:
-                    child._grip_button.set_visible(False)
-                except Exception:
-                    pass
-            child = child.get_next_sibling()
-
-    def _show_row_buttons(self, row):
-        """Show buttons on the specified ActionRow."""
-        if hasattr(row, "_duplicate_button") and hasattr(row, "_delete_button"):
-            row._duplicate_button.set_visible(True)
-            row._delete_button.set_visible(True)
-        if hasattr(row, "_grip_button"):
-            try:
-                row._grip_button.set_visible(True)
-            except Exception:
-                pass
-
     def _get_selected_host(self):
-        if hasattr(self, "list_box") and self.list_box is not None:
-            try:
-                row = self.list_box.get_selected_row()
-            except Exception:
-                row = None
-            if row is not None:
-                host = getattr(row, "_host_ref", None)
-                if host is not None:
-                    return host
-        if hasattr(self, "tree_view") and self.tree_view is not None:
-            selection = self.tree_view.get_selection()
-            model, tree_iter = selection.get_selected()
-            if tree_iter:
-                return model.get_value(tree_iter, 5)
-        return self._selected_host
+        return self.get_selected_host() or self._selected_host
 
     def _update_bottom_toolbar_sensitivity(self):
         pass
 
+    def set_multi_select(self, enabled: bool):
+        """Switch between single selection and picking several hosts for a
+        bulk edit."""
+        enabled = bool(enabled)
+        if self.select_button.get_active() != enabled:
+            self.select_button.set_active(enabled)
+            return
+        self._multi_select = enabled
+        self.single_selection.unselect_all()
+        self.multi_selection.unselect_all()
+        # Swapping the model rebinds the visible rows, which hides or
+        # restores their buttons.
+        self.list_view.set_model(
+            self.multi_selection if enabled else self.single_selection
+        )
+        self.bulk_bar.set_revealed(enabled)
+        self._on_selected_rows_changed(self.multi_selection, 0, 0)
+
+    def get_selected_hosts(self) -> list:
+        """The hosts whose rows are selected, in list order."""
+        selection = self.multi_selection.get_selection()
+        return [
+            self.store.get_item(selection.get_nth(i)).host
+            for i in range(selection.get_size())
+        ]
+
+    def _on_select_toggled(self, button):
+        self.set_multi_select(button.get_active())
+
+    def _on_selected_rows_changed(self, selection, position, n_items):
+        if not self._multi_select:
+            return
+        count = self.multi_selection.get_selection().get_size()
+        if count:
+            self.bulk_label.set_label(
+                ngettext("{n} host selected", "{n} hosts selected", count).format(
+                    n=count
+                )
+            )
+        else:
+            self.bulk_label.set_label(_("No hosts selected"))
+        self.bulk_edit_button.set_sensitive(count > 0)
+
+    def _on_bulk_edit_clicked(self, button):
+        hosts = self.get_selected_hosts()
+        if hosts:
+            self.emit("bulk-edit-requested", hosts)
+
     def set_undo_enabled(self, enabled: bool):
         """Enable or disable the header undo button."""
         try:
@@ -707,6 +783,14 @@ class HostList(Gtk.Box):
         except Exception:
             pass
 
+    def set_redo_enabled(self, enabled: bool):
+        """Enable or disable the header redo button."""
+        try:
+            if self.redo_button:
+                self.redo_button.set_sensitive(bool(enabled))
+        except Exception:
+            pass
+
     def _on_search_button_clicked(self, button):
         """Toggle search bar visibility when search button is clicked."""
         if self.search_bar:
@@ -727,4 +811,35 @@ class HostList(Gtk.Box):
             text = entry.get_text()
         except Exception:
             text = ""
-        self.filter_hosts(text)
+        if len(self.hosts) >= _BACKGROUND_SEARCH_MIN_HOSTS:
+            self._filter_in_background(text)
+        else:
+            self.filter_hosts(text)
+
+    def _filter_in_background(self, query: str):
+        """Filter on the search worker; results replace the list as they
+        arrive, starting with a small first chunk."""
+        self.current_filter = query.lower()
+        self._running_search = self._search.prepare(query)
+        self._search_worker.submit(self._running_search)
+
+    def _on_search_results(self, generation, hosts, first, done):
+        # Called on the worker thread.
+        GLib.idle_add(self._apply_search_results, generation, hosts, first, done)
+
+    @profiling.timed("host_list.apply_search_results")
+    def _apply_search_results(self, generation, hosts, first, done):
+        if not self._search_worker.is_current(generation):
+            return False
+        items = [self._item_for(host) for host in hosts]
+        if first:
+            self.filtered_hosts = list(hosts)
+            self._show_items(items)
+        else:
+            self.filtered_hosts.extend(hosts)
+            self._shown.extend(items)
+            self.store.splice(self.store.get_n_items(), 0, items)
+        if done and self._running_search is not None:
+            self._search.remember(self._running_search)
+            self._running_search = None
+        return False
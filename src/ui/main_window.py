@@ -4,13 +4,28 @@ gi.require_version("Gtk", "4.0")
 gi.require_version("Adw", "1")
 from gi.repository import Gtk, Gio, Gdk, Adw, GLib
 from pathlib import Path
-from gettext import gettext as _
+from gettext import gettext as _, ngettext
 import sys
 from .host_list import HostList
 from .host_editor import HostEditor
 from .welcome_view import WelcomeView
 from gi.repository import Gio as _Gio
 
+try:
+    from ssh_studio.config_monitor import ConfigMonitor
+except ImportError:
+    from config_monitor import ConfigMonitor
+
+try:
+    from ssh_studio import profiling
+except ImportError:
+    import profiling
+
+try:
+    from ssh_studio.edit_history import EditHistory
+except ImportError:
+    from edit_history import EditHistory
+
 
 @Gtk.Template(resource_path="/io/github/BuddySirJava/SSH-Studio/ui/main_window.ui")
 class MainWindow(Adw.ApplicationWindow):
@@ -37,7 +52,10 @@ class MainWindow(Adw.ApplicationWindow):
         self._raw_wrap_lines = False
         self._original_width = -1
         self._original_height = -1
-        self._last_reorder_previous = None
+        self.history = EditHistory(lambda: self.parser.config)
+        self.history.edit_label = _("Edit host")
+        self._config_monitor = None
+        self._external_change_toast = None
 
         try:
             if hasattr(self, "host_editor") and self.host_editor is not None:
@@ -96,6 +114,7 @@ class MainWindow(Adw.ApplicationWindow):
                 self._prefer_dark_theme = bool(prefs["prefer_dark_theme"])
             if "raw_wrap_lines" in prefs:
                 self._raw_wrap_lines = bool(prefs["raw_wrap_lines"])
+            profiling.set_enabled(bool(prefs.get("enable_profiling", False)))
 
             if hasattr(self, "_prefer_dark_theme") and self._prefer_dark_theme:
                 try:
@@ -169,6 +188,8 @@ class MainWindow(Adw.ApplicationWindow):
         self.host_list.connect("host-deleted", self._on_host_deleted)
         self.host_list.connect("hosts-reordered", self._on_hosts_reordered)
         self.host_list.connect("undo-clicked", self._on_undo_clicked)
+        self.host_list.connect("redo-clicked", self._on_redo_clicked)
+        self.host_list.connect("bulk-edit-requested", self._on_bulk_edit_requested)
 
         self.host_editor.connect("host-changed", self._on_host_changed)
         self.host_editor.connect("host-save", self._on_host_save)
@@ -249,6 +270,10 @@ class MainWindow(Adw.ApplicationWindow):
         keyboard_shortcuts_action.connect("activate", self._on_keyboard_shortcuts)
         actions.add_action(keyboard_shortcuts_action)
 
+        profiling_action = Gio.SimpleAction.new("profiling", None)
+        profiling_action.connect("activate", self._on_profiling)
+        actions.add_action(profiling_action)
+
         self.insert_action_group("app", actions)
 
     def _on_search_action(self, action, param):
@@ -259,7 +284,14 @@ class MainWindow(Adw.ApplicationWindow):
         ctrl_pressed = bool(state & Gdk.ModifierType.CONTROL_MASK)
 
         if ctrl_pressed:
-            if keyval == Gdk.KEY_o:
+            shift_pressed = bool(state & Gdk.ModifierType.SHIFT_MASK)
+            if keyval in (Gdk.KEY_z, Gdk.KEY_Z) and not shift_pressed:
+                self._on_undo_clicked()
+                return True
+            elif keyval in (Gdk.KEY_z, Gdk.KEY_Z, Gdk.KEY_y):
+                self._on_redo_clicked()
+                return True
+            elif keyval == Gdk.KEY_o:
                 self._on_open_config(None, None)
                 return True
             elif keyval == Gdk.KEY_s:
@@ -390,13 +422,7 @@ class MainWindow(Adw.ApplicationWindow):
             selected = None
             if self.parser and self.parser.config and self.parser.config.hosts:
                 if target_alias:
-                    for h in self.parser.config.hosts:
-                        try:
-                            if target_alias in h.patterns:
-                                selected = h
-                                break
-                        except Exception:
-                            continue
+                    selected = self.parser.config.get_host(target_alias)
                 if selected is None:
                     selected = self.parser.config.hosts[0]
                 self.host_list.select_host(selected)
@@ -482,6 +508,7 @@ class MainWindow(Adw.ApplicationWindow):
     def on_status_bar_close_clicked(self, button):
         pass
 
+    @profiling.timed("window.save")
     def _on_save_clicked(self, button):
         if not self.parser:
             return
@@ -497,15 +524,16 @@ class MainWindow(Adw.ApplicationWindow):
                 )
                 dialog.connect("response", lambda d, r: d.destroy())
                 dialog.present()
+            self._watch_identity_dirs()
+            self.history.commit()
             self.parser.write(backup=True)
-            self.parser.parse()
+            self.parser.parse(incremental=True)
+            self._reattach_edited_host()
 
             self.host_list.load_hosts(self.parser.config.hosts)
+            self._watch_config_files()
             self.is_dirty = False
-            try:
-                self.host_list.set_undo_enabled(False)
-            except Exception:
-                pass
+            self._update_history_buttons()
             self._update_status(_("Configuration saved successfully"))
         except Exception as e:
             self._show_error(f"Failed to save configuration: {e}")
@@ -515,19 +543,162 @@ class MainWindow(Adw.ApplicationWindow):
         if not self.parser:
             return
         try:
+            self.history.commit()
             self.parser.write(backup=True)
-            self.parser.parse()
+            self.parser.parse(incremental=True)
+            self._reattach_edited_host()
             self.host_list.load_hosts(self.parser.config.hosts)
+            self._watch_config_files()
             self.is_dirty = False
-            try:
-                self.host_list.set_undo_enabled(False)
-            except Exception:
-                pass
+            self._update_history_buttons()
+            self._watch_identity_dirs()
             if show_status:
                 self._update_status(_("Configuration saved"))
         except Exception as e:
             self._show_error(f"Failed to save configuration: {e}")
 
+    def _on_bulk_edit_requested(self, host_list, hosts):
+        """Apply one option edit to the selected hosts with a single write."""
+        if not self.parser:
+            return
+        from .bulk_edit_dialog import BulkEditDialog
+
+        dialog = BulkEditDialog(self, hosts)
+
+        def on_apply(button):
+            edit = dialog.get_edit()
+            if edit is None:
+                return
+            editing = getattr(self.host_editor, "current_host", None)
+            try:
+                changed = self.parser.apply_batch(dialog.hosts, [edit])
+            except Exception as e:
+                dialog.show_error(_("Failed to update hosts: {error}").format(error=e))
+                return
+            dialog.close()
+            self.host_list.set_multi_select(False)
+            hosts_now = self.parser.config.hosts
+            selected = self.host_list.update_hosts(hosts_now)
+            self._watch_config_files()
+            self.is_dirty = False
+            # The batch is not recorded, so earlier steps may no longer apply.
+            self.history.clear()
+            self._update_history_buttons()
+            if editing is not None and not any(h is editing for h in hosts_now):
+                if selected is not None:
+                    self.host_editor.load_host(selected)
+                else:
+                    self._set_host_editor_visible(False)
+            self.show_toast(
+                ngettext("Updated {n} host", "Updated {n} hosts", len(changed)).format(
+                    n=len(changed)
+                )
+            )
+
+        dialog.apply_btn.connect("clicked", on_apply)
+        dialog.present(self)
+
+    def _watch_identity_dirs(self):
+        """Monitor the directories of checked IdentityFiles so validation
+        re-checks keys that are created, removed or renamed."""
+        monitors = getattr(self, "_identity_monitors", None)
+        if monitors is None:
+            monitors = self._identity_monitors = {}
+        for directory in self.parser.identity_cache.directories():
+            if directory in monitors:
+                continue
+            try:
+                monitor = Gio.File.new_for_path(str(directory)).monitor_directory(
+                    Gio.FileMonitorFlags.WATCH_MOVES, None
+                )
+                monitor.connect("changed", self._on_identity_dir_changed)
+                monitors[directory] = monitor
+            except Exception:
+                pass
+
+    def _on_identity_dir_changed(self, monitor, file, other_file, event_type):
+        for changed in (file, other_file):
+            try:
+                if changed is not None and changed.get_path():
+                    self.parser.identity_cache.invalidate(Path(changed.get_path()))
+            except Exception:
+                pass
+
+    def _watch_config_files(self):
+        """Start or update monitoring of the config and its included files."""
+        if not self.parser:
+            return
+        try:
+            if self._config_monitor is None:
+                self._config_monitor = ConfigMonitor(
+                    self.parser, self._on_config_files_changed
+                )
+            self._config_monitor.sync()
+        except Exception:
+            pass
+
+    def _on_config_files_changed(self, paths):
+        """Apply changes other programs made to the config files.
+
+        Changes to included files are applied right away. A change to the
+        main config would discard unsaved edits, so in that case the user is
+        offered a reload instead.
+        """
+        if not self.parser:
+            return
+        if self.parser.config_path in paths:
+            try:
+                unsaved = (
+                    self.parser.config.is_dirty() or self.host_editor.is_host_dirty()
+                )
+            except Exception:
+                unsaved = False
+            if unsaved:
+                self._show_external_change_toast()
+                return
+        self._apply_external_changes()
+
+    def _show_external_change_toast(self):
+        try:
+            if self._external_change_toast is not None:
+                self._external_change_toast.dismiss()
+            toast = Adw.Toast.new(_("The SSH config was changed by another program"))
+            toast.set_button_label(_("Reload"))
+            toast.set_timeout(0)
+            toast.connect("button-clicked", lambda t: self._apply_external_changes())
+            self._external_change_toast = toast
+            self.toast_overlay.add_toast(toast)
+        except Exception:
+            self.show_toast(_("The SSH config was changed by another program"))
+
+    def _apply_external_changes(self):
+        """Re-read the changed config files and update the host list in place,
+        keeping the selection, the search filter and the editor when the host
+        being edited did not change."""
+        self._external_change_toast = None
+        editing = getattr(self.host_editor, "current_host", None)
+        try:
+            changed = self.parser.refresh()
+        except Exception as e:
+            self._show_error(f"Failed to reload configuration: {e}")
+            return
+        self._watch_config_files()
+        if not changed:
+            return
+        self.history.clear()
+        self._update_history_buttons()
+        hosts = self.parser.config.hosts
+        selected = self.host_list.update_hosts(hosts)
+        if editing is not None and not any(h is editing for h in hosts):
+            if selected is not None:
+                self.host_editor.load_host(selected)
+            else:
+                self._set_host_editor_visible(False)
+        try:
+            self.host_editor._update_button_sensitivity()
+        except Exception:
+            pass
+
     def _on_host_selected(self, host_list, host):
         """Handle host selection from the list."""
         self.host_editor.load_host(host)
@@ -586,33 +757,19 @@ class MainWindow(Adw.ApplicationWindow):
             base_pattern = "new-host"
             i = 0
             new_pattern = base_pattern
-            existing_patterns = {
-                p for h in self.parser.config.hosts for p in h.patterns
-            }
-            while new_pattern in existing_patterns:
+            while self.parser.config.get_host(new_pattern) is not None:
                 i += 1
                 new_pattern = f"{base_pattern}-{i}"
             host.patterns = [new_pattern]
             host.raw_lines = [f"Host {new_pattern}"]
 
-            self.parser.config.add_host(host)
+            self.history.insert_host(
+                len(self.parser.config.hosts), host, _("Add host")
+            )
             self.is_dirty = True
+            self._update_history_buttons()
 
-            def undo_add():
-                try:
-                    if host in self.parser.config.hosts:
-                        self.parser.config.remove_host(host)
-                    self.is_dirty = self.parser.config.is_dirty()
-                    self.host_list.load_hosts(self.parser.config.hosts)
-                    try:
-                        if not self.parser.config.hosts:
-                            self._set_host_editor_visible(False)
-                    except Exception:
-                        pass
-                except Exception:
-                    pass
-
-            self._show_undo_toast(_("Host added"), undo_add)
+            self._show_undo_toast(_("Host added"), self._on_undo_clicked)
             self._set_host_editor_visible(True)
             self.host_editor.load_host(host)
             try:
@@ -623,30 +780,13 @@ class MainWindow(Adw.ApplicationWindow):
     def _on_host_deleted(self, host_list, host):
         """Handle host deletion."""
         if self.parser:
-            try:
-                original_index = self.parser.config.hosts.index(host)
-            except ValueError:
-                original_index = None
-            self.parser.config.remove_host(host)
+            if self.history.remove_host(host, _("Delete host")) < 0:
+                return
+            if self.host_editor.current_host is host:
+                self.host_editor.current_host = None
             self._write_and_reload(show_status=False)
 
-            def undo_delete():
-                try:
-                    if original_index is None:
-                        self.parser.config.add_host(host)
-                    else:
-                        self.parser.config.hosts.insert(original_index, host)
-                    self._write_and_reload(show_status=False)
-                    try:
-                        self.host_list.select_host(host)
-                        self._set_host_editor_visible(True)
-                        self.host_editor.load_host(host)
-                    except Exception:
-                        pass
-                except Exception:
-                    pass
-
-            self._show_undo_toast(_("Host deleted"), undo_delete)
+            self._show_undo_toast(_("Host deleted"), self._on_undo_clicked)
 
             if not self.parser.config.hosts:
                 self.host_editor.current_host = None
@@ -666,57 +806,84 @@ class MainWindow(Adw.ApplicationWindow):
                 self.host_list.select_host(self.parser.config.hosts[0])
 
     def _on_host_changed(self, editor, host):
+        self.history.commit()
         self.is_dirty = self.parser.config.is_dirty()
         try:
             self.host_editor._update_button_sensitivity()
         except Exception:
             pass
-        try:
-            self.host_list.set_undo_enabled(True)
-        except Exception:
-            pass
+        self._update_history_buttons()
 
     def _on_editor_validity_changed(self, editor, is_valid: bool):
         pass
 
-    def _on_hosts_reordered(self, host_list, previous_order):
+    def _on_hosts_reordered(self, host_list, move):
         """Handle drag-and-drop reordering from the host list."""
         if not self.parser:
             return
         try:
+            source, dest = move
+            self.history.move_host(source, dest, _("Move host"))
             self.is_dirty = self.parser.config.is_dirty()
-            self._last_reorder_previous = (
-                list(previous_order) if previous_order else None
-            )
+            self._update_history_buttons()
+        except Exception:
+            pass
+
+    def _on_undo_clicked(self, *_args):
+        """Revert the last recorded change."""
+        self._step_history(self.history.undo)
+
+    def _on_redo_clicked(self, *_args):
+        """Re-apply the last undone change."""
+        self._step_history(self.history.redo)
+
+    def _step_history(self, step):
+        """Run ``step`` (undo or redo) and bring the UI in line with the model.
+
+        The result is never written: undoing an action that was saved right
+        away (like deleting a host) leaves unsaved changes for the user to
+        save or discard.
+        """
+        if not self.parser:
+            return
+        try:
+            txn = step()
+            if txn is None:
+                return
+            self.host_list.load_hosts(self.parser.config.hosts)
+            self.is_dirty = self.parser.config.is_dirty()
+            hosts = self.parser.config.hosts
+            if hosts:
+                host = hosts[min(max(txn.index, 0), len(hosts) - 1)]
+                self.host_list.select_host(host)
+                self.host_editor.load_host(host)
+                self._set_host_editor_visible(True)
+            else:
+                self.host_editor.load_host(None)
+                self._set_host_editor_visible(False)
+            self._update_history_buttons()
             try:
-                self.host_list.set_undo_enabled(True)
+                self.host_editor._update_button_sensitivity()
             except Exception:
                 pass
-        except Exception:
-            pass
+        except Exception as e:
+            self._show_error(f"Failed to undo: {e}")
 
-    def _on_undo_clicked(self, *_):
-        """Undo button in header clicked: revert to last saved state."""
+    def _update_history_buttons(self):
         try:
-            if self._last_reorder_previous is not None:
-                self.parser.config.hosts = list(self._last_reorder_previous)
-                self._last_reorder_previous = None
-                self.host_list.load_hosts(self.parser.config.hosts)
-                try:
-                    self._reselect_current_host()
-                except Exception:
-                    pass
-            elif self.parser:
-                self.parser.parse()
-                self.host_list.load_hosts(self.parser.config.hosts)
-                try:
-                    self._reselect_current_host()
-                except Exception:
-                    pass
-            self.host_list.set_undo_enabled(False)
+            self.host_list.set_undo_enabled(self.history.can_undo())
+            self.host_list.set_redo_enabled(self.history.can_redo())
         except Exception:
             pass
 
+    def _reattach_edited_host(self):
+        """After a re-parse, point the editor at the object that replaced the
+        host it edits."""
+        editing = getattr(self.host_editor, "current_host", None)
+        tracked = self.history.reattach()
+        if tracked is not None and editing is not None and editing is not tracked:
+            self.host_editor.rebind_host(tracked)
+
     def _on_show_toast(self, editor, message: str):
         """Handle show-toast signal from host editor."""
         self.show_toast(message)
@@ -774,6 +941,7 @@ class MainWindow(Adw.ApplicationWindow):
             "editor_font_size": getattr(self, "_editor_font_size", 12),
             "prefer_dark_theme": getattr(self, "_prefer_dark_theme", False),
             "raw_wrap_lines": getattr(self, "_raw_wrap_lines", False),
+            "enable_profiling": profiling.is_enabled(),
         }
         dialog.set_preferences(current_prefs)
 
@@ -819,6 +987,7 @@ class MainWindow(Adw.ApplicationWindow):
                 self.host_editor.set_wrap_mode(raw_wrap)
             except Exception:
                 pass
+            profiling.set_enabled(bool(prefs.get("enable_profiling", False)))
             if self.parser:
                 self._load_config()
             self._update_status(_("Preferences saved"))
@@ -834,6 +1003,13 @@ class MainWindow(Adw.ApplicationWindow):
         dialog = KeyboardShortcutsDialog(self)
         dialog.present()
 
+    def _on_profiling(self, action, param):
+        """Open the performance panel."""
+        from .profiling_dialog import ProfilingDialog
+
+        dialog = ProfilingDialog(self)
+        dialog.present(self)
+
     def _on_about(self, action, param):
         """Show the about dialog using Adwaita's AboutWindow."""
         about_window = Adw.AboutWindow(
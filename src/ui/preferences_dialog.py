@@ -23,6 +23,7 @@ class PreferencesDialog(Adw.PreferencesDialog):
     editor_font_spin = Gtk.Template.Child()
     dark_theme_switch = Gtk.Template.Child()
     raw_wrap_switch = Gtk.Template.Child()
+    profiling_switch = Gtk.Template.Child()
 
     def __init__(self, parent):
         super().__init__()
@@ -47,6 +48,7 @@ class PreferencesDialog(Adw.PreferencesDialog):
         self.auto_backup_switch.connect("notify::active", self._on_switch_toggled)
         self.dark_theme_switch.connect("notify::active", self._on_switch_toggled)
         self.raw_wrap_switch.connect("notify::active", self._on_switch_toggled)
+        self.profiling_switch.connect("notify::active", self._on_switch_toggled)
         self.editor_font_spin.connect("notify::value", self._on_spin_changed)
 
         self.editor_font_spin.get_adjustment().connect(
@@ -129,6 +131,7 @@ class PreferencesDialog(Adw.PreferencesDialog):
         self.auto_backup_switch.set_active(True)
         self.dark_theme_switch.set_active(False)
         self.raw_wrap_switch.set_active(True)
+        self.profiling_switch.set_active(False)
 
         self.editor_font_spin.set_value(12.0)
 
@@ -189,6 +192,7 @@ class PreferencesDialog(Adw.PreferencesDialog):
             "editor_font_size": int(self.editor_font_spin.get_value()),
             "prefer_dark_theme": self.dark_theme_switch.get_active(),
             "raw_wrap_lines": self.raw_wrap_switch.get_active(),
+            "enable_profiling": self.profiling_switch.get_active(),
         }
 
     def set_preferences(self, prefs: dict):
@@ -207,3 +211,5 @@ class PreferencesDialog(Adw.PreferencesDialog):
             self.dark_theme_switch.set_active(bool(prefs["prefer_dark_theme"]))
         if "raw_wrap_lines" in prefs:
             self.raw_wrap_switch.set_active(bool(prefs["raw_wrap_lines"]))
+        if "enable_profiling" in prefs:
+            self.profiling_switch.set_active(bool(prefs["enable_profiling"]))
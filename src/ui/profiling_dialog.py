@@ -0,0 +1,126 @@
+import gi
+
+gi.require_version("Gtk", "4.0")
+gi.require_version("Adw", "1")
+from gi.repository import Gtk, Adw, Gdk, GLib
+from gettext import gettext as _
+
+try:
+    from ssh_studio import profiling
+except ImportError:
+    import profiling
+
+
+@Gtk.Template(resource_path="/io/github/BuddySirJava/SSH-Studio/ui/profiling_dialog.ui")
+class ProfilingDialog(Adw.Dialog):
+    """Recent span timings, with trace export and cProfile capture."""
+
+    __gtype_name__ = "ProfilingDialog"
+
+    toast_overlay = Gtk.Template.Child()
+    disabled_page = Gtk.Template.Child()
+    timings_list = Gtk.Template.Child()
+    operation_row = Gtk.Template.Child()
+    profile_row = Gtk.Template.Child()
+    profile_button = Gtk.Template.Child()
+    export_button = Gtk.Template.Child()
+    clear_button = Gtk.Template.Child()
+
+    def __init__(self, parent=None):
+        super().__init__()
+        self._parent = parent
+        self._operations = profiling.known_spans()
+        self.operation_row.set_model(Gtk.StringList.new(self._operations))
+        self._connect_signals()
+        self._refresh()
+        self._refresh_source = GLib.timeout_add_seconds(1, self._on_refresh_tick)
+
+    def _connect_signals(self):
+        self.profile_button.connect("clicked", self._on_profile_clicked)
+        self.export_button.connect("clicked", self._on_export_clicked)
+        self.clear_button.connect("clicked", self._on_clear_clicked)
+        self.connect("closed", self._on_closed)
+
+        key_controller = Gtk.EventControllerKey.new()
+        key_controller.connect("key-pressed", self._on_key_pressed)
+        self.add_controller(key_controller)
+
+    def _on_key_pressed(self, controller, keyval, keycode, state):
+        if keyval == Gdk.KEY_Escape:
+            self.close()
+            return True
+        return False
+
+    def _on_refresh_tick(self):
+        self._refresh()
+        return True
+
+    def _on_closed(self, dialog):
+        if self._refresh_source:
+            GLib.source_remove(self._refresh_source)
+            self._refresh_source = 0
+
+    def _refresh(self):
+        self.disabled_page.set_visible(not profiling.is_enabled())
+        while (child := self.timings_list.get_first_child()) is not None:
+            self.timings_list.remove(child)
+        stats = profiling.summary()
+        if not stats:
+            row = Adw.ActionRow(title=_("No timings recorded yet"))
+            row.add_css_class("dim-label")
+            self.timings_list.append(row)
+        for item in stats:
+            row = Adw.ActionRow(
+                title=item.name,
+                subtitle=_(
+                    "p50 {p50:.1f} · p90 {p90:.1f} · p99 {p99:.1f} · max {max:.1f}"
+                ).format(
+                    p50=item.p50 * 1000,
+                    p90=item.p90 * 1000,
+                    p99=item.p99 * 1000,
+                    max=item.max * 1000,
+                ),
+            )
+            last = Gtk.Label(
+                label=_("{last:.1f} ms · {count}×").format(
+                    last=item.last * 1000, count=item.count
+                )
+            )
+            last.add_css_class("numeric")
+            row.add_suffix(last)
+            self.timings_list.append(row)
+
+        if profiling.last_profile is not None:
+            self.profile_row.set_subtitle(str(profiling.last_profile))
+        pending = profiling.armed()
+        self.profile_button.set_label(_("Armed") if pending else _("Arm"))
+        self.profile_button.set_sensitive(
+            profiling.is_enabled() and not pending and bool(self._operations)
+        )
+
+    def _on_profile_clicked(self, button):
+        index = self.operation_row.get_selected()
+        if index == Gtk.INVALID_LIST_POSITION or index >= len(self._operations):
+            return
+        name = self._operations[index]
+        profiling.profile_next(name)
+        self._show_toast(_("The next run of {name} will be profiled").format(name=name))
+        self._refresh()
+
+    def _on_export_clicked(self, button):
+        try:
+            path = profiling.export_trace()
+        except OSError as e:
+            self._show_toast(_("Failed to export trace: {error}").format(error=e))
+            return
+        self._show_toast(_("Trace written to {path}").format(path=path))
+
+    def _on_clear_clicked(self, button):
+        profiling.clear()
+        self._refresh()
+
+    def _show_toast(self, message: str):
+        try:
+            self.toast_overlay.add_toast(Adw.Toast.new(message))
+        except Exception:
+            pass
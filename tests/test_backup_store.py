@@ -0,0 +1,96 @@
+"""Deduplication and retention of config backups."""
+
+import gzip
+import json
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from backup_store import BackupStore  # noqa: E402
+
+
+class BackupStoreTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self._tmp.name)
+        self.store = BackupStore(self.dir / "backups", max_count=3)
+        self.source = self.dir / "config"
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _objects(self):
+        return sorted(p.name for p in self.store.directory.glob("*/objects/*/*.gz"))
+
+    def test_identical_content_is_recorded_once(self):
+        first = self.store.add(self.source, b"Host a\n")
+        self.assertIs(self.store.add(self.source, b"Host a\n"), first)
+        self.assertEqual(len(self.store.snapshots(self.source)), 1)
+        self.assertEqual(self.store.read(first), b"Host a\n")
+
+    def test_repeated_content_shares_one_object(self):
+        self.store.add(self.source, b"Host a\n")
+        self.store.add(self.source, b"Host b\n")
+        self.store.add(self.source, b"Host a\n")
+        self.assertEqual(len(self.store.snapshots(self.source)), 3)
+        self.assertEqual(len(self._objects()), 2)
+
+    def test_max_count_drops_oldest_snapshots_and_their_objects(self):
+        for i in range(5):
+            self.store.add(self.source, f"Host h{i}\n".encode())
+        kept = self.store.snapshots(self.source)
+        self.assertEqual(
+            [self.store.read(s) for s in kept],
+            [b"Host h4\n", b"Host h3\n", b"Host h2\n"],
+        )
+        self.assertEqual(len(self._objects()), 3)
+
+    def test_sources_are_kept_apart(self):
+        other = self.dir / "other"
+        self.store.add(self.source, b"Host a\n")
+        self.store.add(other, b"Host a\n")
+        for i in range(4):
+            self.store.add(other, f"Host o{i}\n".encode())
+        self.assertEqual(len(self.store.snapshots(self.source)), 1)
+        self.assertEqual(len(self.store.snapshots(other)), 3)
+        self.assertEqual(len(self.store.snapshots()), 4)
+
+    def test_index_is_read_back_by_a_new_store(self):
+        self.store.add(self.source, b"Host a\n")
+        self.store.add(self.source, b"Host b\n")
+        reopened = BackupStore(self.store.directory)
+        self.assertEqual(
+            [reopened.read(s) for s in reopened.snapshots()],
+            [b"Host b\n", b"Host a\n"],
+        )
+
+    def test_corrupted_object_is_refused(self):
+        snapshot = self.store.add(self.source, b"Host a\n")
+        (obj,) = self.store.directory.glob("*/objects/*/*.gz")
+        obj.write_bytes(gzip.compress(b"Host evil\n"))
+        with self.assertRaises(ValueError):
+            self.store.read(snapshot)
+
+    def test_prune_drops_old_snapshots_but_keeps_the_newest(self):
+        for i in range(3):
+            self.store.add(self.source, f"Host h{i}\n".encode())
+        (index,) = self.store.directory.glob("*/index.json")
+        data = json.loads(index.read_text())
+        for entry in data["snapshots"]:
+            entry["timestamp"] = time.time() - 10 * 86400
+        index.write_text(json.dumps(data))
+
+        store = BackupStore(self.store.directory, max_age_days=1)
+        dropped = store.prune()
+        self.assertEqual(len(dropped), 2)
+        (kept,) = store.snapshots(self.source)
+        self.assertEqual(store.read(kept), b"Host h2\n")
+        self.assertEqual(len(self._objects()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+"""Undo, redo and merging of recorded config edits."""
+
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from edit_history import EditHistory, HostState  # noqa: E402
+from ssh_config_parser import SSHConfigParser, SSHHost  # noqa: E402
+
+
+class EditHistoryTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        path = Path(self._tmp.name) / "config"
+        path.write_text("Host a\n  User x\nHost b\n  User y\n  Port 2\nHost c\n")
+        self.parser = SSHConfigParser(path)
+        self.parser.parse_cache = None
+        self.parser.auto_backup_enabled = False
+        self.parser.parse()
+        self.history = EditHistory(lambda: self.parser.config)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    @property
+    def hosts(self):
+        return self.parser.config.hosts
+
+    def _names(self):
+        return [h.patterns[0] for h in self.hosts]
+
+    def test_undo_delete_puts_back_the_same_host(self):
+        b = self.hosts[1]
+        self.assertEqual(self.history.remove_host(b, "Delete"), 1)
+        self.assertEqual(self._names(), ["a", "c"])
+        self.history.undo()
+        self.assertIs(self.hosts[1], b)
+        self.assertFalse(self.parser.config.is_dirty())
+        self.history.redo()
+        self.assertEqual(self._names(), ["a", "c"])
+
+    def test_undo_move(self):
+        self.history.move_host(0, 2, "Move")
+        self.assertEqual(self._names(), ["b", "c", "a"])
+        txn = self.history.undo()
+        self.assertEqual(self._names(), ["a", "b", "c"])
+        self.assertIsNotNone(txn)
+        self.history.redo()
+        self.assertEqual(self._names(), ["b", "c", "a"])
+
+    def test_undo_insert(self):
+        host = SSHHost(patterns=["new"])
+        self.history.insert_host(3, host, "Add")
+        self.history.undo()
+        self.assertEqual(self._names(), ["a", "b", "c"])
+        self.history.redo()
+        self.assertIs(self.hosts[3], host)
+
+    def test_tracked_option_edits_are_undone_exactly(self):
+        b = self.hosts[1]
+        before = HostState.of(b)
+        self.history.track(b)
+        b.remove_option("User")
+        b.set_option("Port", "22")
+        b.set_option("HostName", "10.0.0.2")
+        self.assertTrue(self.history.commit())
+        after = HostState.of(b)
+        self.history.undo()
+        self.assertEqual(HostState.of(b), before)
+        self.assertFalse(self.parser.config.is_dirty())
+        self.history.redo()
+        self.assertEqual(HostState.of(b), after)
+
+    def test_typing_a_value_merges_into_one_step(self):
+        a = self.hosts[0]
+        self.history.track(a)
+        for value in ("d", "de", "dep"):
+            a.set_option("User", value)
+            self.history.commit()
+        self.history.undo()
+        self.assertEqual(a.get_option("User"), "x")
+        self.assertFalse(self.history.can_undo())
+
+    def test_new_edit_clears_redo(self):
+        self.history.move_host(0, 1, "Move")
+        self.history.undo()
+        self.assertTrue(self.history.can_redo())
+        self.history.move_host(1, 2, "Move")
+        self.assertFalse(self.history.can_redo())
+
+    def test_trims_oldest_steps_beyond_the_limit(self):
+        self.history.max_transactions = 2
+        for _ in range(3):
+            self.history.move_host(0, 2, "Move")
+        self.history.undo()
+        self.history.undo()
+        self.assertIsNone(self.history.undo())
+        self.assertEqual(self._names(), ["b", "c", "a"])
+
+
+if __name__ == "__main__":
+    unittest.main()
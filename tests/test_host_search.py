@@ -0,0 +1,106 @@
+"""Query language and the cached search index of the host list."""
+
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from host_search import SearchIndex, compile_query  # noqa: E402
+from ssh_config_parser import SSHConfigParser, SSHHost  # noqa: E402
+
+_CONFIG = """\
+Host prod-db
+  HostName 10.0.0.5
+  User postgres
+  Port 5432
+Host web-1 web-1.example.com
+  HostName 10.0.1.1
+  User deploy
+  Tag old
+Host web-2
+  HostName 10.0.1.2
+  User deploy
+  Port 22
+  IdentityFile ~/.ssh/id_ed25519
+Host web
+  User root
+"""
+
+
+class SearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        path = Path(self._tmp.name) / "config"
+        path.write_text(_CONFIG)
+        self.parser = SSHConfigParser(path)
+        self.parser.parse_cache = None
+        self.parser.auto_backup_enabled = False
+        self.parser.parse()
+        self.index = SearchIndex()
+        self.index.set_hosts(self.parser.config.hosts)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _find(self, query, index=None):
+        return [h.patterns[0] for h in (index or self.index).filter(query)]
+
+    def _fresh(self, query):
+        index = SearchIndex()
+        index.set_hosts(self.parser.config.hosts)
+        return self._find(query, index)
+
+    def test_empty_query_keeps_list_order(self):
+        self.assertEqual(self._find(""), ["prod-db", "web-1", "web-2", "web"])
+
+    def test_plain_terms_rank_exact_alias_first(self):
+        self.assertEqual(self._find("web")[0], "web")
+        self.assertEqual(sorted(self._find("web")), ["web", "web-1", "web-2"])
+        self.assertEqual(self._find("postgres"), ["prod-db"])
+
+    def test_fuzzy_alias_match(self):
+        self.assertEqual(self._find("prdb"), ["prod-db"])
+
+    def test_field_terms(self):
+        self.assertEqual(self._find("user:deploy"), ["web-1", "web-2"])
+        self.assertEqual(self._find("port:22"), ["web-2"])
+        self.assertEqual(self._find("host:web-*"), ["web-1", "web-2"])
+        self.assertEqual(self._find("key:"), ["web-2"])
+        self.assertEqual(self._find("user:deploy -tag:old"), ["web-2"])
+        self.assertEqual(self._find("-web"), ["prod-db"])
+
+    def test_quoted_term_keeps_colon(self):
+        query = compile_query('"a:b" user:x')
+        self.assertEqual(
+            [(t.field, t.value) for t in query.terms], [("", "a:b"), ("user", "x")]
+        )
+
+    def test_refinement_and_deletion_match_a_fresh_search(self):
+        for query in ("w", "we", "web", "web-", "web-2", "web-", "we", "user:d"):
+            self.assertEqual(self._find(query), self._fresh(query), query)
+
+    def test_host_edits_update_the_index(self):
+        self.assertEqual(self._find("user:root"), ["web"])
+        hosts = self.parser.config.hosts
+        hosts[0].set_option("User", "root")
+        self.assertEqual(self._find("user:root"), ["prod-db", "web"])
+        hosts[3].patterns = ["bastion"]
+        self.assertEqual(self._find("bastion"), ["bastion"])
+        hosts.insert(0, SSHHost(patterns=["root-box"]))
+        del hosts[4]
+        for query in ("root", "user:root", "web", ""):
+            self.assertEqual(self._find(query), self._fresh(query), query)
+
+    def test_prepared_search_reads_its_snapshot(self):
+        search = self.index.prepare("user:deploy")
+        self.parser.config.hosts[1].set_option("User", "nobody")
+        found = [h.patterns[0] for chunk in search.run() for h in chunk]
+        self.assertEqual(found, ["web-1", "web-2"])
+        self.index.remember(search)
+        self.assertEqual(self._find("user:deploy"), ["web-2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+"""Caching of IdentityFile existence checks and its invalidation."""
+
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from ssh_config_parser import SSHConfigParser  # noqa: E402
+from ssh_config_validator import IdentityFileCache  # noqa: E402
+
+
+class IdentityFileCacheTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self._tmp.name)
+        self.cache = IdentityFileCache()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_answers_from_the_cache_until_invalidated(self):
+        key = self.dir / "id_a"
+        self.assertEqual(self.cache.lookup([key, key]), {key: False})
+        key.touch()
+        self.assertEqual(self.cache.lookup([key]), {key: False})
+        self.cache.invalidate(key)
+        self.assertEqual(self.cache.lookup([key]), {key: True})
+
+    def test_invalidating_a_directory_forgets_its_files(self):
+        keys = [self.dir / f"id_{i}" for i in range(3)]
+        self.cache.lookup(keys)
+        self.assertEqual(self.cache.directories(), [self.dir])
+        for key in keys:
+            key.touch()
+        generation = self.cache.generation
+        self.cache.invalidate(self.dir)
+        self.assertGreater(self.cache.generation, generation)
+        self.assertEqual(self.cache.directories(), [])
+        self.assertTrue(all(self.cache.lookup(keys).values()))
+
+
+class IdentityDiagnosticsTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self._tmp.name)
+        self.key = self.dir / "id_ed25519"
+        path = self.dir / "config"
+        path.write_text(f"Host a\n  IdentityFile {self.key}\nHost b\n  User x\n")
+        self.parser = SSHConfigParser(path)
+        self.parser.parse_cache = None
+        self.parser.auto_backup_enabled = False
+        self.parser.parse()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _missing(self):
+        return [
+            d.host.patterns[0]
+            for d in self.parser.diagnostics()
+            if d.option == "IdentityFile"
+        ]
+
+    def test_file_created_on_disk_clears_the_warning_after_invalidation(self):
+        self.assertEqual(self._missing(), ["a"])
+        self.key.touch()
+        self.assertEqual(self._missing(), ["a"])
+        self.parser.identity_cache.invalidate(self.dir)
+        self.assertEqual(self._missing(), [])
+
+    def test_host_edits_are_rechecked(self):
+        self.key.touch()
+        self.assertEqual(self._missing(), [])
+        hosts = self.parser.config.hosts
+        hosts[1].set_option("IdentityFile", str(self.dir / "id_rsa"))
+        self.assertEqual(self._missing(), ["b"])
+        hosts[1].set_option("IdentityFile", str(self.key))
+        self.assertEqual(self._missing(), [])
+        hosts[0].remove_option("IdentityFile")
+        self.assertEqual(self._missing(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
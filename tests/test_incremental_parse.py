@@ -0,0 +1,106 @@
+"""Incremental re-parsing must give the same model as parsing from scratch."""
+
+import random
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from ssh_config_parser import SSHConfigParser  # noqa: E402
+
+_LINES = [
+    "Host a",
+    "Host b c",
+    "Host *.example.com",
+    "Match host a",
+    "  User x",
+    "  Port 22",
+    "\tHostName 10.0.0.1",
+    "  IdentityFile ~/.ssh/id_ed25519",
+    "ServerAliveInterval 30",
+    "Include conf.d/*",
+    "# comment",
+    "",
+]
+
+
+def _model(parser: SSHConfigParser):
+    config = parser.config
+    return (
+        [str(o) for o in config.global_options],
+        [
+            (h.header, [str(o) for o in h.options], h.start_line, h.end_line)
+            for h in config.hosts
+        ],
+        list(config.include_directives),
+    )
+
+
+class IncrementalParseTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp.name) / "config"
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _parser(self) -> SSHConfigParser:
+        parser = SSHConfigParser(self.path)
+        parser.parse_cache = None
+        parser.auto_backup_enabled = False
+        return parser
+
+    def _full(self):
+        parser = self._parser()
+        parser.parse()
+        return _model(parser)
+
+    def test_matches_full_parse_after_random_edits(self):
+        rng = random.Random(7)
+        for _ in range(300):
+            lines = [rng.choice(_LINES) for _ in range(rng.randint(0, 15))]
+            self.path.write_text("\n".join(lines) + "\n")
+            parser = self._parser()
+            parser.parse()
+            for _ in range(3):
+                at = rng.randint(0, len(lines))
+                op = rng.random()
+                if op < 0.4:
+                    lines[at:at] = [rng.choice(_LINES)]
+                elif op < 0.7 and lines:
+                    del lines[min(at, len(lines) - 1)]
+                elif lines:
+                    lines[min(at, len(lines) - 1)] = rng.choice(_LINES)
+                self.path.write_text("\n".join(lines) + "\n")
+                parser.parse(incremental=True)
+                self.assertEqual(_model(parser), self._full(), lines)
+
+    def test_keeps_hosts_outside_the_changed_lines(self):
+        self.path.write_text("Host a\n  User x\nHost b\n  User y\nHost c\n  User z\n")
+        parser = self._parser()
+        parser.parse()
+        a, b, c = parser.config.hosts
+        self.path.write_text(
+            "Host a\n  User x\nHost b\n  User y\n  Port 2\nHost c\n  User z\n"
+        )
+        parser.parse(incremental=True)
+        hosts = parser.config.hosts
+        self.assertIs(hosts[0], a)
+        self.assertIsNot(hosts[1], b)
+        self.assertIs(hosts[2], c)
+        self.assertEqual((c.start_line, c.end_line), (5, 6))
+
+    def test_discards_unsaved_edits_of_unchanged_blocks(self):
+        self.path.write_text("Host a\n  User x\nHost b\n  User y\n")
+        parser = self._parser()
+        parser.parse()
+        parser.config.hosts[0].set_option("User", "edited")
+        parser.parse(incremental=True)
+        self.assertEqual(parser.config.hosts[0].get_option("User"), "x")
+        self.assertFalse(parser.config.is_dirty())
+
+
+if __name__ == "__main__":
+    unittest.main()
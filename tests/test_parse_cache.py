@@ -0,0 +1,102 @@
+"""The on-disk parse cache and loading the config from it."""
+
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from parse_cache import ParseCache  # noqa: E402
+from ssh_config_parser import PARSER_VERSION, SSHConfigParser  # noqa: E402
+
+
+class ParseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self._tmp.name)
+        self.cache = ParseCache(1, self.dir / "cache")
+        self.source = self.dir / "config"
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_returns_what_was_stored_for_the_same_key(self):
+        self.cache.store(self.source, (1, 2, 3), ("lines", (1, 2)))
+        self.assertEqual(self.cache.load(self.source, (1, 2, 3)), ("lines", (1, 2)))
+
+    def test_ignores_other_keys_versions_and_files(self):
+        self.cache.store(self.source, (1, 2, 3), "payload")
+        self.assertIsNone(self.cache.load(self.source, (1, 2, 4)))
+        newer = ParseCache(2, self.cache.directory)
+        self.assertIsNone(newer.load(self.source, (1, 2, 3)))
+        self.assertIsNone(self.cache.load(self.dir / "other", (1, 2, 3)))
+
+    def test_unreadable_entry_behaves_as_empty(self):
+        self.cache.store(self.source, (1, 2, 3), "payload")
+        for entry in self.cache.directory.iterdir():
+            entry.write_bytes(b"garbage")
+        self.assertIsNone(self.cache.load(self.source, (1, 2, 3)))
+
+    def test_discard(self):
+        self.cache.store(self.source, (1, 2, 3), "payload")
+        self.cache.discard(self.source)
+        self.assertIsNone(self.cache.load(self.source, (1, 2, 3)))
+
+
+class CachedParseTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self._tmp.name)
+        self.path = self.dir / "config"
+        self.path.write_text("Port 2\nHost a b\n  User x\nMatch host a\n  Port 3\n")
+        self._parser().parse()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _parser(self) -> SSHConfigParser:
+        parser = SSHConfigParser(self.path)
+        parser.parse_cache = ParseCache(PARSER_VERSION, self.dir / "cache")
+        parser.auto_backup_enabled = False
+        return parser
+
+    def _model(self, parser):
+        config = parser.config
+        return (
+            [str(o) for o in config.global_options],
+            [(h.header, [str(o) for o in h.options]) for h in config.hosts],
+        )
+
+    def test_cached_load_matches_a_parse(self):
+        parsed = self._parser()
+        parsed.parse()
+        cached = self._parser()
+        self.assertTrue(cached.load_cached())
+        self.assertEqual(self._model(cached), self._model(parsed))
+        self.assertFalse(cached.config.is_dirty())
+        self.assertEqual(cached.confirm_cached(), [])
+        self.assertEqual(cached._generate_content(), self.path.read_text())
+
+    def test_changed_file_is_not_loaded_from_the_cache(self):
+        self.path.write_text("Host c\n")
+        self.assertFalse(self._parser().load_cached())
+
+    def test_stale_entry_with_the_same_stat_key_is_reloaded(self):
+        st = self.path.stat()
+        with open(self.path, "r+") as f:
+            f.write("Port 9\nHost z b\n")
+        os.utime(self.path, ns=(st.st_atime_ns, st.st_mtime_ns))
+        parser = self._parser()
+        self.assertTrue(parser.load_cached())
+        stale = parser.confirm_cached()
+        self.assertEqual(stale, [self.path])
+        self.assertEqual(parser.config.hosts[0].patterns, ["a", "b"])
+        parser.discard_cached(stale)
+        self.assertEqual(parser.refresh(), [self.path])
+        self.assertEqual(parser.config.hosts[0].patterns, ["z", "b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,163 @@
+"""Round-trip tests for writing edited SSH configs back to disk."""
+
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from ssh_config_parser import SSHConfigParser, SSHHost, SSHOption  # noqa: E402
+
+_WITH_INCLUDE = "Host a\n  User x\nHost b\n  User y\nInclude ~/.ssh/config.d/*\n"
+
+
+class IncludeRoundTripTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp.name) / "config"
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _load(self, text: str) -> SSHConfigParser:
+        self.path.write_text(text)
+        parser = SSHConfigParser(self.path)
+        parser.parse_cache = None
+        parser.auto_backup_enabled = False
+        parser.parse()
+        return parser
+
+    def _write_and_reparse(self, parser: SSHConfigParser) -> SSHConfigParser:
+        parser.write()
+        return self._load(self.path.read_text())
+
+    def test_removing_host_keeps_following_include(self):
+        parser = self._load(_WITH_INCLUDE)
+        parser.config.hosts.remove(parser.config.hosts[1])
+        self.assertEqual(
+            parser._generate_content(), "Host a\n  User x\nInclude ~/.ssh/config.d/*\n"
+        )
+        reparsed = self._write_and_reparse(parser)
+        self.assertEqual(reparsed.config.include_directives, ["~/.ssh/config.d/*"])
+        self.assertEqual([h.patterns for h in reparsed.config.hosts], [["a"]])
+
+    def test_moving_host_leaves_include_in_place(self):
+        parser = self._load(_WITH_INCLUDE)
+        hosts = parser.config.hosts
+        hosts.insert(0, hosts.pop(1))
+        content = parser._generate_content()
+        self.assertTrue(content.endswith("Include ~/.ssh/config.d/*\n"))
+        reparsed = self._write_and_reparse(parser)
+        self.assertEqual(reparsed.config.include_directives, ["~/.ssh/config.d/*"])
+        self.assertEqual([h.patterns for h in reparsed.config.hosts], [["b"], ["a"]])
+
+    def test_removing_first_host_keeps_its_include(self):
+        parser = self._load("Host a\n  User x\nInclude one\nHost b\n  User y\n")
+        parser.config.hosts.remove(parser.config.hosts[0])
+        reparsed = self._write_and_reparse(parser)
+        self.assertEqual(reparsed.config.include_directives, ["one"])
+        self.assertEqual([h.patterns for h in reparsed.config.hosts], [["b"]])
+
+
+class RawEditRoundTripTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp.name) / "config"
+        self.path.write_text("Host a\n  User x\n\nHost b\n  User y\n")
+        self.parser = SSHConfigParser(self.path)
+        self.parser.parse_cache = None
+        self.parser.auto_backup_enabled = False
+        self.parser.parse()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_comment_only_raw_edit_is_written(self):
+        host = self.parser.config.hosts[0]
+        host.raw_lines = ["Host a", "  # important note", "  User x"]
+        self.assertTrue(self.parser.config.is_dirty())
+        self.parser.write()
+        self.assertEqual(
+            self.path.read_text(),
+            "Host a\n  # important note\n  User x\n\nHost b\n  User y\n",
+        )
+        self.parser.parse(incremental=True)
+        self.assertFalse(self.parser.config.is_dirty())
+
+
+_CONFIG = """\
+# Managed by hand
+ServerAliveInterval 30
+
+# Database
+Host db
+    HostName 10.0.0.5   # primary
+    User postgres
+    Port 5432
+
+Host web-*
+\tUser deploy
+\tForwardAgent yes
+"""
+
+
+class SpliceWriterTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp.name) / "config"
+        self.path.write_text(_CONFIG)
+        self.parser = SSHConfigParser(self.path)
+        self.parser.parse_cache = None
+        self.parser.auto_backup_enabled = False
+        self.parser.parse()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_unchanged_config_is_written_verbatim(self):
+        self.assertEqual(self.parser._generate_content(), _CONFIG)
+
+    def test_changed_option_keeps_its_place_and_the_rest_of_the_text(self):
+        self.parser.config.hosts[0].set_option("User", "admin")
+        self.assertEqual(
+            self.parser._generate_content(),
+            _CONFIG.replace("    User postgres", "    User admin"),
+        )
+
+    def test_new_option_follows_the_last_one_with_its_indentation(self):
+        self.parser.config.hosts[1].set_option("Port", "2222")
+        self.assertEqual(
+            self.parser._generate_content(),
+            _CONFIG.replace("yes\n", "yes\n\tPort 2222\n"),
+        )
+
+    def test_removed_option_drops_only_its_line(self):
+        self.parser.config.hosts[0].remove_option("Port")
+        self.assertEqual(
+            self.parser._generate_content(), _CONFIG.replace("    Port 5432\n", "")
+        )
+
+    def test_global_option_edit_stays_in_the_preamble(self):
+        self.parser.config.global_options[0] = SSHOption("ServerAliveInterval", "60")
+        self.assertEqual(
+            self.parser._generate_content(),
+            _CONFIG.replace("ServerAliveInterval 30", "ServerAliveInterval 60"),
+        )
+
+    def test_new_host_is_appended(self):
+        self.parser.config.hosts.append(SSHHost(patterns=["new"]))
+        content = self.parser._generate_content()
+        self.assertTrue(content.startswith(_CONFIG))
+        self.assertTrue(content.endswith("\nHost new\n"))
+
+    def test_removing_a_host_takes_its_leading_comment(self):
+        del self.parser.config.hosts[0]
+        content = self.parser._generate_content()
+        self.assertNotIn("# Database", content)
+        self.assertNotIn("Host db", content)
+        self.assertIn("# Managed by hand", content)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+"""Line classification and word splitting of the config tokenizer."""
+
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import ssh_config_tokenizer as tokenizer  # noqa: E402
+
+
+class TokenizeTest(unittest.TestCase):
+    def test_blank_and_comment_lines(self):
+        self.assertEqual(tokenizer.tokenize("   ")[0], tokenizer.BLANK)
+        self.assertEqual(tokenizer.tokenize("  # Host a")[0], tokenizer.COMMENT)
+
+    def test_keyword_separators(self):
+        for line in ("Port 22", "Port=22", "Port = 22", "Port =22", "Port\t22"):
+            self.assertEqual(
+                tokenizer.tokenize(line), (tokenizer.OPTION, "Port", "22", ""), line
+            )
+
+    def test_keeps_indentation_and_quotes(self):
+        self.assertEqual(
+            tokenizer.tokenize('\tProxyCommand "ssh -W %h:%p jump"'),
+            (tokenizer.OPTION, "ProxyCommand", '"ssh -W %h:%p jump"', "\t"),
+        )
+
+    def test_block_keywords_are_case_insensitive(self):
+        self.assertEqual(tokenizer.tokenize("HOST a b")[0], tokenizer.HOST)
+        self.assertEqual(tokenizer.tokenize("match all")[0], tokenizer.MATCH)
+        self.assertEqual(tokenizer.tokenize("Include a.conf")[0], tokenizer.INCLUDE)
+
+    def test_strips_trailing_comment_outside_quotes(self):
+        self.assertEqual(tokenizer.tokenize("User deploy # ops")[2], "deploy")
+        self.assertEqual(tokenizer.tokenize('User "a # b"')[2], '"a # b"')
+        self.assertEqual(tokenizer.tokenize("User a#b")[2], "a#b")
+
+    def test_keyword_without_value_is_invalid(self):
+        self.assertEqual(tokenizer.tokenize("Port")[0], tokenizer.INVALID)
+        self.assertEqual(tokenizer.tokenize("Port # none")[0], tokenizer.INVALID)
+
+
+class SplitWordsTest(unittest.TestCase):
+    def test_splits_on_whitespace_outside_quotes(self):
+        self.assertEqual(
+            tokenizer.split_words('a "b c"\td \'e f\''), ["a", '"b c"', "d", "'e f'"]
+        )
+
+    def test_plain_value(self):
+        self.assertEqual(tokenizer.split_words("  a  b "), ["a", "b"])
+
+
+if __name__ == "__main__":
+    unittest.main()